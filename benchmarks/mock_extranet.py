@@ -0,0 +1,460 @@
+import json
+import time
+import uuid
+import threading
+import datetime as dt
+from collections import Counter
+from html import escape
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, parse_qsl, urlencode, quote
+
+# Faux extranet D-Edge local, utilisé par les benchmarks (voir run_benchmarks.py) pour mesurer le pricing sans toucher au vrai site
+# Seuls les éléments utilisés par DedgeBot sont reproduits (mêmes ids, classes, textes et enchaînement des pages)
+# Exemple : python -m benchmarks.mock_extranet --latency-ms 100 (les URLs à mettre dans settings.json sont affichées au lancement)
+
+MONTHS = ["janv.", "févr.", "mars", "avr.", "mai", "juin", "juil.", "août", "sept.", "oct.", "nov.", "déc."]
+ROOM_TYPES = ["Chambre Double", "Chambre Twin"]
+PRICE_TYPES = ["Prix Public", "Prix Flexible"]
+SAVE_MESSAGE = "Les modifications ont bien été enregistrées. "
+SESSION_COOKIE = "mock_session"
+DEVICE_COOKIE = "mock_device"
+
+PAGE_TEMPLATE = Template(
+    """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>$title</title></head>
+<body>
+$body
+</body>
+</html>
+"""
+)
+
+LOGIN_BODY = """<form method="post" action="/login">
+    <input type="text" id="text-id-login" name="login">
+    <input type="password" id="input-password" name="password">
+    <input type="submit" value="Login">
+</form>"""
+
+DEVICE_BODY = """<form method="post" action="/extranet/Device">
+    <p>Veuillez entrer le code reçu par email</p>
+    <input type="text" id="device-code" name="code">
+    <input type="submit" id="device-submit" value="Valider">
+</form>"""
+
+HOME_BODY = Template(
+    """<div class="header-hotel-selector">
+    <a class="header-hotel-selector__value" href="#"
+        onclick="document.getElementById('hotel-list').style.display = 'block'; return false;">$hotel_name</a>
+    <div id="hotel-list" style="display: none">$hotel_links</div>
+</div>
+<a data-name="PriceAndPlanningSection" href="/extranet/planning/overview">Prix et Planning</a>"""
+)
+
+OVERVIEW_BODY = Template(
+    """<table class="room">
+    <tr class="price">
+        <td>$room_type</td>
+        <td>$price_type</td>
+        <td onclick="window.location.href = '/extranet/planning'">$price</td>
+    </tr>
+</table>"""
+)
+
+PLANNING_BODY = Template(
+    """<select id="roomSelector">$room_options</select>
+<select id="rateSelector">$rate_options</select>
+<div class="months">$month_links</div>
+<span class="dateLabel">$date_label</span>
+<span class="prevnext"><a href="$previous_url">14j. précédents</a> <a href="$next_url">14j. suivants</a></span>
+<table class="planning"><tr type="RatePrice">$price_cells</tr></table>
+<input type="button" name="savePlanning" value="Enregistrer" disabled="disabled">
+<div id="messages"></div>
+<script>
+var grids = $grids;
+var changes = {};
+var saveButton = document.getElementsByName("savePlanning")[0];
+
+function selectedText(id) {
+    var selector = document.getElementById(id);
+    return selector.options[selector.selectedIndex].text;
+}
+
+function priceInput(day) {
+    return document.querySelector('td[day="' + day + '"] input');
+}
+
+function setNavigationDisabled(disabled) {
+    document.querySelectorAll("div.months a, span.prevnext a").forEach(function (link) {
+        if (disabled) {
+            link.setAttribute("disabled", "disabled");
+        } else {
+            link.removeAttribute("disabled");
+        }
+    });
+}
+
+// Changement de grille sans rechargement : les liens de navigation et l'URL conservent la chambre et le prix choisis
+function showGrid() {
+    var room = selectedText("roomSelector"), rate = selectedText("rateSelector");
+    for (var day = 0; day < 14; day++) {
+        priceInput(day).value = grids[room][rate][day];
+    }
+    var links = [window.location].concat(Array.from(document.querySelectorAll("div.months a, span.prevnext a")));
+    links.forEach(function (link) {
+        var url = new URL(link.href);
+        url.searchParams.set("room", room);
+        url.searchParams.set("rate", rate);
+        if (link === window.location) {
+            history.replaceState(null, "", url.toString());
+        } else {
+            link.href = url.toString();
+        }
+    });
+    changes = {};
+}
+
+document.addEventListener("click", function (event) {
+    var link = event.target.closest("a");
+    if (link !== null && link.hasAttribute("disabled")) {
+        event.preventDefault();
+    }
+});
+
+document.addEventListener("change", function (event) {
+    if (event.target.tagName === "SELECT") {
+        showGrid();
+        return;
+    }
+    changes[event.target.parentNode.getAttribute("day")] = event.target.value;
+    saveButton.disabled = false;
+    setNavigationDisabled(true);
+    document.getElementById("messages").innerHTML = "";
+});
+
+saveButton.addEventListener("click", function () {
+    saveButton.disabled = true;
+    var room = selectedText("roomSelector"), rate = selectedText("rateSelector");
+    var body = JSON.stringify({room: room, rate: rate, start: "$start", changes: changes});
+    fetch("/extranet/planning/save", {method: "POST", headers: {"Content-Type": "application/json"}, body: body})
+        .then(function (response) {
+            return response.json();
+        })
+        .then(function () {
+            for (var day in changes) {
+                grids[room][rate][day] = changes[day];
+            }
+            changes = {};
+            var message = document.createElement("span");
+            message.textContent = "$save_message";
+            document.getElementById("messages").appendChild(message);
+            setNavigationDisabled(false);
+        });
+});
+</script>"""
+)
+
+
+def date_label(date: dt.date) -> str:
+    return "{} {} {}".format(date.day, MONTHS[date.month - 1], date.year)
+
+
+def add_months(date: dt.date, nb_months: int) -> dt.date:
+    month_idx = date.year * 12 + date.month - 1 + nb_months
+    return dt.date(month_idx // 12, month_idx % 12 + 1, 1)
+
+
+class MockExtranet:
+    """
+    Local HTTP server imitating the D-Edge login page, device validation, hotel selector and price grid
+
+    - 'accounts' maps each accepted username to its hotels (any password is accepted)
+    - every response is delayed by 'latency' seconds, and every save by 'save_latency' seconds (same as 'latency' by default)
+    - with 'device_validation', a browser without the device cookie is sent to the /Device page after the login
+    - prices are kept in memory, starting at initial_price(date): the price files of the benchmarks are built from it
+    """
+
+    def __init__(
+        self,
+        accounts: Dict[str, List[str]],
+        latency: float = 0.0,
+        save_latency: Optional[float] = None,
+        device_validation: bool = False,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.accounts = accounts
+        self.latency = latency
+        self.save_latency = save_latency if save_latency is not None else latency
+        self.device_validation = device_validation
+        self.lock = threading.Lock()  # Requêtes traitées en parallèle (une session de navigateur par bot du pool)
+        self.prices = {}  # (hotel, type de chambre, type de prix, date) -> prix enregistré
+        self.sessions = {}  # Identifiant de session -> {"username": ..., "hotel_name": ...}
+        self.stats = Counter()
+
+        handler_class = type("MockExtranetHandler", (MockExtranetHandler,), {"extranet": self})
+        self.server = ThreadingHTTPServer((host, port), handler_class)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return "http://{}:{}/".format(host, port)
+
+    @property
+    def login_url(self) -> str:
+        return self.base_url
+
+    @property
+    def extranet_url(self) -> str:
+        return self.base_url + "extranet/"
+
+    def start(self) -> "MockExtranet":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-extranet", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "MockExtranet":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> bool:
+        self.stop()
+        return False
+
+    def reset(self, accounts: Optional[Dict[str, List[str]]] = None) -> None:
+        """
+        Forget the saved prices, the sessions and the statistics (between two benchmark scenarios)
+        """
+        with self.lock:
+            if accounts is not None:
+                self.accounts = accounts
+            self.prices = {}
+            self.sessions = {}
+            self.stats = Counter()
+
+    @staticmethod
+    def initial_price(date: dt.date) -> str:
+        return str(100 + 5 * (date.toordinal() % 7))
+
+    def price(self, hotel_name: str, room_type: str, price_type: str, date: dt.date) -> str:
+        return self.prices.get((hotel_name, room_type, price_type, date), self.initial_price(date))
+
+    def grids(self, hotel_name: str, start: dt.date) -> dict:
+        dates = [start + dt.timedelta(days=day) for day in range(14)]
+        return {
+            room_type: {
+                price_type: [self.price(hotel_name, room_type, price_type, date) for date in dates]
+                for price_type in PRICE_TYPES
+            }
+            for room_type in ROOM_TYPES
+        }
+
+    def save(self, hotel_name: str, room_type: str, price_type: str, start: dt.date, changes: dict) -> None:
+        with self.lock:
+            for day, price in changes.items():
+                self.prices[(hotel_name, room_type, price_type, start + dt.timedelta(days=int(day)))] = price
+            self.stats["saves"] += 1
+            self.stats["saved_prices"] += len(changes)
+
+
+class MockExtranetHandler(BaseHTTPRequestHandler):
+    extranet: MockExtranet = None
+
+    def log_message(self, format, *args) -> None:
+        pass  # Pas de ligne par requête sur stderr : le registre du pricing reste lisible
+
+    # Réponses
+    def send_page(self, title: str, body: str, status: int = 200) -> None:
+        self.send_body(PAGE_TEMPLATE.substitute(title=title, body=body), "text/html; charset=utf-8", status)
+
+    def send_body(
+        self, content: str, content_type: str, status: int = 200, cookies: Optional[List[str]] = None
+    ) -> None:
+        data = content.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for cookie in cookies or []:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def redirect(self, location: str, cookies: Optional[List[str]] = None) -> None:
+        self.send_response(303)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        for cookie in cookies or []:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+
+    # Requêtes
+    def cookies(self) -> dict:
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return {name: morsel.value for name, morsel in cookie.items()}
+
+    def session(self) -> Optional[dict]:
+        return self.extranet.sessions.get(self.cookies().get(SESSION_COOKIE))
+
+    def form(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return dict(parse_qsl(self.rfile.read(length).decode("utf-8")))
+
+    def do_GET(self) -> None:
+        time.sleep(self.extranet.latency)
+        with self.extranet.lock:
+            self.extranet.stats["pages"] += 1
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query))
+
+        if url.path == "/":
+            return self.send_page("Login", LOGIN_BODY)
+
+        session = self.session()
+        if session is None:
+            return self.redirect("/")
+        if url.path == "/extranet/Device":
+            return self.send_page("Device", DEVICE_BODY)
+        if self.extranet.device_validation and DEVICE_COOKIE not in self.cookies():
+            return self.redirect("/extranet/Device")
+
+        if url.path == "/extranet/":
+            return self.send_home_page(session)
+        if url.path == "/extranet/hotel":
+            session["hotel_name"] = query.get("name", session["hotel_name"])
+            return self.redirect("/extranet/")
+        if url.path == "/extranet/planning/overview":
+            body = OVERVIEW_BODY.substitute(
+                room_type=escape(ROOM_TYPES[0]),
+                price_type=escape(PRICE_TYPES[0]),
+                price=self.extranet.price(session["hotel_name"], ROOM_TYPES[0], PRICE_TYPES[0], dt.date.today()),
+            )
+            return self.send_page("Prix et Planning", body)
+        if url.path == "/extranet/planning":
+            return self.send_planning_page(session, query)
+
+        self.send_page("Introuvable", "<p>Page introuvable</p>", status=404)
+
+    def do_POST(self) -> None:
+        time.sleep(self.extranet.latency)
+        url = urlsplit(self.path)
+
+        if url.path == "/login":
+            form = self.form()
+            username = form.get("login", "")
+            if username not in self.extranet.accounts:
+                return self.send_page("Login", "<p>Identifiant inconnu</p>" + LOGIN_BODY, status=401)
+            session_id = uuid.uuid4().hex
+            with self.extranet.lock:
+                self.extranet.sessions[session_id] = {
+                    "username": username,
+                    "hotel_name": self.extranet.accounts[username][0],
+                }
+                self.extranet.stats["logins"] += 1
+            cookie = "{}={}; Path=/; Max-Age=43200".format(SESSION_COOKIE, session_id)
+            return self.redirect("/extranet/", cookies=[cookie])
+
+        if url.path == "/extranet/Device":
+            self.form()
+            cookie = "{}=1; Path=/; Max-Age=31536000".format(DEVICE_COOKIE)
+            return self.redirect("/extranet/", cookies=[cookie])
+
+        if url.path == "/extranet/planning/save":
+            session = self.session()
+            if session is None:
+                return self.send_body(json.dumps({"error": "session expirée"}), "application/json", status=403)
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length).decode("utf-8"))
+            time.sleep(self.extranet.save_latency)
+            self.extranet.save(
+                session["hotel_name"],
+                payload["room"],
+                payload["rate"],
+                dt.date.fromisoformat(payload["start"]),
+                payload["changes"],
+            )
+            return self.send_body(json.dumps({"saved": len(payload["changes"])}), "application/json")
+
+        self.send_page("Introuvable", "<p>Page introuvable</p>", status=404)
+
+    # Pages
+    def send_home_page(self, session: dict) -> None:
+        hotel_links = "".join(
+            '<a class="header-hotel-selector__result__item" href="/extranet/hotel?name={}">{}</a>'.format(
+                quote(hotel_name), escape(hotel_name)
+            )
+            for hotel_name in self.extranet.accounts[session["username"]]
+        )
+        self.send_page(
+            "Accueil", HOME_BODY.substitute(hotel_name=escape(session["hotel_name"]), hotel_links=hotel_links)
+        )
+
+    def send_planning_page(self, session: dict, query: dict) -> None:
+        room_type = query.get("room", ROOM_TYPES[0])
+        price_type = query.get("rate", PRICE_TYPES[0])
+        start = dt.date.fromisoformat(query["date"]) if "date" in query else dt.date.today()
+
+        def planning_url(date: dt.date) -> str:
+            return "/extranet/planning?" + urlencode({"room": room_type, "rate": price_type, "date": date.isoformat()})
+
+        def options(values: List[str], selected_value: str) -> str:
+            return "".join(
+                "<option{}>{}</option>".format(" selected" if value == selected_value else "", escape(value))
+                for value in values
+            )
+
+        # Liens des mois : 5 mois avant et 6 mois après le mois de la page (chaque lien ouvre la page au 1er du mois)
+        month_links = "".join(
+            '<a href="{}">{}</a>'.format(planning_url(month), MONTHS[month.month - 1])
+            for month in (add_months(start, nb_months) for nb_months in range(-5, 7))
+        )
+        grids = self.extranet.grids(session["hotel_name"], start)
+        price_cells = "".join(
+            '<td day="{}"><input type="text" id="Price" value="{}"></td>'.format(day, price)
+            for day, price in enumerate(grids[room_type][price_type])
+        )
+        body = PLANNING_BODY.substitute(
+            room_options=options(ROOM_TYPES, room_type),
+            rate_options=options(PRICE_TYPES, price_type),
+            month_links=month_links,
+            date_label=date_label(start),
+            previous_url=planning_url(start - dt.timedelta(days=14)),
+            next_url=planning_url(start + dt.timedelta(days=14)),
+            price_cells=price_cells,
+            grids=json.dumps(grids, ensure_ascii=False),
+            start=start.isoformat(),
+            save_message=SAVE_MESSAGE,
+        )
+        self.send_page("Prix et Planning", body)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Faux extranet D-Edge local (benchmarks et tests manuels du pricing)")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Délai ajouté à chaque requête")
+    parser.add_argument("--save-latency-ms", type=float, help="Délai de chaque enregistrement (latence par défaut)")
+    parser.add_argument("--device", action="store_true", help="Demander le code de validation de l'appareil")
+    parser.add_argument("--hotels", type=int, default=3, help="Nombre d'hôtels du compte 'demo'")
+    args = parser.parse_args()
+
+    extranet = MockExtranet(
+        {"demo": ["Hôtel démo {:03d}".format(idx) for idx in range(1, args.hotels + 1)]},
+        latency=args.latency_ms / 1000,
+        save_latency=args.save_latency_ms / 1000 if args.save_latency_ms is not None else None,
+        device_validation=args.device,
+        port=args.port,
+    )
+    print('"login_url": "{}", "extranet_url": "{}"'.format(extranet.login_url, extranet.extranet_url))
+    try:
+        extranet.server.serve_forever()
+    except KeyboardInterrupt:
+        extranet.server.server_close()
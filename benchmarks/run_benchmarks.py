@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import itertools
+import subprocess
+import datetime as dt
+from typing import Dict, List, Optional
+from src.dedge_bot import DedgeBot
+from src.bot_pool import BotPool
+from src.cookie_store import CookieStore
+from src import pricing
+from src import tracing
+from constants import ROOT_PATH
+from benchmarks.mock_extranet import MockExtranet, ROOM_TYPES, PRICE_TYPES
+
+# Benchmarks de bout en bout du pricing (check_prices compris) contre le faux extranet local, dans un vrai navigateur Edge
+# Lancement depuis la racine du projet : python -m benchmarks.run_benchmarks [--hotels 1 10] [--days 14 90] [--latency-ms 50]
+# Chaque scénario est ajouté à benchmarks/results.jsonl (date, commit, durées et résumé des spans) pour suivre les performances
+# d'une version à l'autre : la durée de la précédente exécution du même scénario est affichée à côté de la nouvelle
+
+RESULTS_PATH = os.path.join(ROOT_PATH, "benchmarks", "results.jsonl")
+HOTELS_PER_ACCOUNT = 10
+CHANGED_PRICE_PERIOD = 7  # Un prix Excel sur 7 diffère du prix du faux extranet (méthode "edit" : 2 prix écrits par page)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmarks du pricing contre un faux extranet D-Edge local")
+    parser.add_argument("--hotels", type=int, nargs="+", default=[1, 10, 50], help="Nombres d'hôtels à pricer")
+    parser.add_argument("--days", type=int, nargs="+", default=[14, 90, 365], help="Nombres de jours à pricer")
+    parser.add_argument(
+        "--methods", nargs="+", choices=["edit", "no-edit"], default=["no-edit", "edit"], help="Méthodes de pricing"
+    )
+    parser.add_argument("--latency-ms", type=float, default=50, help="Délai ajouté à chaque requête du faux extranet")
+    parser.add_argument("--save-latency-ms", type=float, help="Délai de chaque enregistrement (latence par défaut)")
+    parser.add_argument("--pool-size", type=int, default=1, help="Nombre de sessions en parallèle")
+    parser.add_argument("--window", action="store_true", help="Afficher le navigateur (sans fenêtre par défaut)")
+    parser.add_argument("--label", default="", help="Libellé de la série (ex : nom de la branche testée)")
+    parser.add_argument("--results", default=RESULTS_PATH, help="Historique des résultats (JSON lines)")
+    parser.add_argument("--verbose", action="store_true", help="Afficher le registre du pricing sur stderr")
+    return parser
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_PATH, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_accounts(nb_hotels: int) -> Dict[str, List[str]]:
+    """
+    Spread the hotels over accounts of HOTELS_PER_ACCOUNT hotels (one login per account, as with real multi-hotel accounts)
+    """
+    accounts = {}
+    for idx in range(nb_hotels):
+        username = "bench{:02d}".format(idx // HOTELS_PER_ACCOUNT)
+        # Noms de longueur fixe : la sélection de l'hôtel se fait par "contains" (Hôtel 1 serait trouvé dans Hôtel 10)
+        accounts.setdefault(username, []).append("Hôtel benchmark {:03d}".format(idx + 1))
+    return accounts
+
+
+def write_price_file(path: str, beg_date: dt.date, end_date: dt.date) -> None:
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Date", "Price"])
+    date = beg_date
+    while date <= end_date:
+        price = int(MockExtranet.initial_price(date))
+        if date.toordinal() % CHANGED_PRICE_PERIOD == 0:
+            price += 10
+        sheet.append([dt.datetime.combine(date, dt.time()), price])
+        date += dt.timedelta(days=1)
+    workbook.save(path)
+
+
+def build_information_list(accounts: Dict[str, List[str]], beg_date: dt.date, end_date: dt.date, work_dir: str) -> list:
+    # Un même fichier de prix pour tous les hôtels d'une même période (les prix du faux extranet ne dépendent que de la date)
+    prices_path = os.path.join(work_dir, "prices_{}_{}.xlsx".format(beg_date.isoformat(), end_date.isoformat()))
+    if not os.path.exists(prices_path):
+        write_price_file(prices_path, beg_date, end_date)
+
+    return [
+        (username, "password", hotel_name, False, ROOM_TYPES[0], PRICE_TYPES[0], beg_date, end_date, prices_path)
+        for username, hotel_names in accounts.items()
+        for hotel_name in hotel_names
+    ]
+
+
+def load_history(results_path: str) -> List[dict]:
+    if not os.path.exists(results_path):
+        return []
+    with open(results_path, encoding="utf-8") as results_file:
+        return [json.loads(line) for line in results_file if line.strip()]
+
+
+def scenario_key(result: dict) -> tuple:
+    return result["nb_hotels"], result["nb_days"], result["method"], result["latency_ms"], result["pool_size"]
+
+
+def run_scenario(
+    extranet: MockExtranet, bot_pool: BotPool, nb_hotels: int, nb_days: int, method: str, args, work_dir: str, stream
+) -> dict:
+    accounts = build_accounts(nb_hotels)
+    extranet.reset(accounts)
+    beg_date = dt.date.today()
+    end_date = beg_date + dt.timedelta(days=nb_days - 1)
+    information_list = build_information_list(accounts, beg_date, end_date, work_dir)
+
+    result = {
+        "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "label": args.label,
+        "nb_hotels": nb_hotels,
+        "nb_days": nb_days,
+        "method": method,
+        "latency_ms": args.latency_ms,
+        "pool_size": args.pool_size,
+        "headless": not args.window,
+    }
+
+    tracing.TRACER.start(os.path.join(work_dir, "traces"), "benchmark")
+    reporter = pricing.ConsoleReporter(stream=stream)
+    hotel_results = []
+    start_time = time.perf_counter()
+    try:
+        pricing.run(bot_pool, information_list, method, reporter, results=hotel_results)
+        result["status"] = "ok"
+    except KeyboardInterrupt:
+        reporter.stop_event.set()
+        raise
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    finally:
+        result["duration_s"] = round(time.perf_counter() - start_time, 2)
+        result["spans"] = tracing.TRACER.stop()
+
+    result["nb_priced_hotels"] = sum(hotel_result["status"] == "ok" for hotel_result in hotel_results)
+    for counter in ["nb_visited_pages", "nb_changed_prices", "nb_differences"]:
+        result[counter] = sum(hotel_result.get(counter, 0) for hotel_result in hotel_results)
+    result["requests"] = dict(extranet.stats)
+    return result
+
+
+def format_result(result: dict, previous_result: Optional[dict]) -> str:
+    line = "{:>3} hôtel(s) x {:>3} jours  {:<8} {:>9.1f} s  {}".format(
+        result["nb_hotels"], result["nb_days"], result["method"], result["duration_s"], result["status"]
+    )
+    if previous_result is not None and previous_result["status"] == "ok" and previous_result["duration_s"] > 0:
+        variation = 100 * (result["duration_s"] / previous_result["duration_s"] - 1)
+        line += "  (précédent : {:.1f} s, {:+.0f} %, commit {})".format(
+            previous_result["duration_s"], variation, previous_result.get("commit")
+        )
+    return line
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    history = load_history(args.results)
+    previous_results = {scenario_key(result): result for result in history}
+
+    extranet = MockExtranet(
+        {},
+        latency=args.latency_ms / 1000,
+        save_latency=args.save_latency_ms / 1000 if args.save_latency_ms is not None else None,
+    ).start()
+
+    # Navigateurs ouverts une seule fois pour toute la série : le démarrage du driver n'est pas compté dans les scénarios
+    bot = DedgeBot()
+    bot.headless = not args.window
+    bot.login_url = extranet.login_url
+    bot.extranet_url = extranet.extranet_url
+    work_dir = tempfile.mkdtemp(prefix="hpm_benchmarks_")
+    bot.cookie_store = CookieStore(os.path.join(work_dir, "cookies"))
+    bot.cookies_path = None
+    bot_pool = BotPool(bot, args.pool_size)
+    stream = sys.stderr if args.verbose else open(os.devnull, "w", encoding="utf-8")
+
+    exit_code = 0
+    try:
+        for nb_hotels, nb_days, method in itertools.product(args.hotels, args.days, args.methods):
+            result = run_scenario(extranet, bot_pool, nb_hotels, nb_days, method, args, work_dir, stream)
+            print(format_result(result, previous_results.get(scenario_key(result))), flush=True)
+            if result["status"] != "ok":
+                print("    {}".format(result["error"]), flush=True)
+                exit_code = 1
+
+            os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+            with open(args.results, "a", encoding="utf-8") as results_file:
+                results_file.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+    except KeyboardInterrupt:
+        exit_code = 130
+    finally:
+        bot_pool.close()
+        bot.close()
+        extranet.stop()
+        if stream is not sys.stderr:
+            stream.close()
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+import sys
+import os
+import json
+import time
+import signal
+import argparse
+import datetime as dt
+from src.dedge_bot import DedgeBot
+from src.bot_pool import BotPool
+from src.config_store import ConfigStore
+from src.price_cache import PriceCache
+from src.price_snapshots import PriceSnapshotStore
+from src.scheduler import JobQueue, Scheduler
+from src import pricing
+from src import tracing
+from constants import ROOT_PATH, SETTINGS_DICT
+
+# Pricing sans interface graphique (cron, serveurs) : le rapport JSON est écrit sur la sortie standard, le registre sur stderr
+# Exemple : python -m hpm price --hotel "Mon Hôtel" --from 2024-01-01 --to 2024-03-31 --method edit (ou python cli.py price ...)
+# Pricing planifié (jobs définis dans resources/jobs.json, voir scheduler.JobDefinition) : python -m hpm schedule
+
+# Codes de sortie (2 est déjà utilisé par argparse pour les erreurs d'arguments)
+EXIT_OK = 0
+EXIT_PRICING_ERROR = 1
+EXIT_USAGE_ERROR = 2
+EXIT_CONFIG_ERROR = 3
+EXIT_INTERRUPTED = 130
+
+
+def parse_date(value: str) -> dt.date:
+    try:
+        return dt.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("date invalide (format attendu : AAAA-MM-JJ) : {}".format(value))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="hpm", description="Hotel Pricing Manager en ligne de commande (sans interface)"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    price_parser = subparsers.add_parser("price", help="Pricer un ou plusieurs hôtels sur une période")
+    price_parser.add_argument(
+        "--ids", default=os.path.join(ROOT_PATH, SETTINGS_DICT["ids_path"]), help="Fichier Excel des ids"
+    )
+    price_parser.add_argument("--hotel", action="append", required=True, help="Nom de l'hôtel (option répétable)")
+    price_parser.add_argument("--username", help="Compte D-Edge, si le nom de l'hôtel existe sur plusieurs comptes")
+    price_parser.add_argument(
+        "--from", dest="beg_date", type=parse_date, required=True, help="Date de début (AAAA-MM-JJ)"
+    )
+    price_parser.add_argument("--to", dest="end_date", type=parse_date, required=True, help="Date de fin (AAAA-MM-JJ)")
+    price_parser.add_argument(
+        "--method", choices=["edit", "no-edit"], default="no-edit", help="Modifier ou vérifier les prix"
+    )
+    price_parser.add_argument(
+        "--full-pass", action="store_true", help="Visiter toutes les pages, même sans prix modifié"
+    )
+    price_parser.add_argument(
+        "--window", action="store_true", help="Afficher le navigateur (sans fenêtre par défaut en ligne de commande)"
+    )
+    price_parser.add_argument(
+        "--trace",
+        action="store_true",
+        default=SETTINGS_DICT.get("tracing", False),
+        help="Enregistrer la durée de chaque étape dans un fichier de trace (résumé sur stderr)",
+    )
+    price_parser.add_argument(
+        "--pool-size", type=int, default=SETTINGS_DICT.get("pool_size", 1), help="Nombre de sessions en parallèle"
+    )
+
+    schedule_parser = subparsers.add_parser("schedule", help="Exécuter les jobs planifiés (processus longue durée)")
+    schedule_parser.add_argument(
+        "--jobs", default=os.path.join(ROOT_PATH, SETTINGS_DICT["jobs_path"]), help="Fichier JSON des jobs"
+    )
+    schedule_parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=SETTINGS_DICT.get("max_concurrent_jobs", 1),
+        help="Nombre maximum de jobs exécutés en même temps",
+    )
+    schedule_parser.add_argument(
+        "--once", action="store_true", help="Exécuter uniquement les jobs dus au lancement, puis s'arrêter"
+    )
+
+    jobs_parser = subparsers.add_parser("jobs", help="Afficher l'historique des exécutions des jobs planifiés (JSON)")
+    jobs_parser.add_argument("--job", help="Nom du job (tous les jobs par défaut)")
+    jobs_parser.add_argument("--limit", type=int, default=20, help="Nombre d'exécutions affichées")
+    return parser
+
+
+def build_config_store(ids_path: str) -> ConfigStore:
+    return ConfigStore(os.path.join(ROOT_PATH, SETTINGS_DICT["ids_db_path"]), ids_path)
+
+
+def build_price_stores() -> tuple:
+    price_cache = PriceCache(
+        os.path.join(ROOT_PATH, SETTINGS_DICT["price_cache_dir"]), SETTINGS_DICT.get("price_cache_max_mb", 200)
+    )
+    price_snapshots = PriceSnapshotStore(os.path.join(ROOT_PATH, SETTINGS_DICT["price_snapshots_path"]))
+    return price_cache, price_snapshots
+
+
+def build_job_queue() -> JobQueue:
+    return JobQueue(os.path.join(ROOT_PATH, SETTINGS_DICT["job_queue_path"]))
+
+
+def interrupt(signum, frame):
+    raise KeyboardInterrupt("Programme interrompu (signal {})".format(signum))
+
+
+def price(args) -> int:
+    start_time = time.perf_counter()
+    report = {
+        "command": "price",
+        "method": args.method,
+        "beg_date": args.beg_date.isoformat(),
+        "end_date": args.end_date.isoformat(),
+        "status": None,
+        "hotels": [],
+    }
+
+    def finish(status: str, exit_code: int, error: str = None) -> int:
+        report["status"] = status
+        report["exit_code"] = exit_code
+        if error is not None:
+            report["error"] = error
+        report["duration_s"] = round(time.perf_counter() - start_time, 1)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return exit_code
+
+    # Configuration : toute erreur à ce stade est détectée avant l'ouverture du navigateur
+    try:
+        if args.beg_date > args.end_date:
+            raise ValueError("La date de début est supérieure à la date de fin")
+        config_store = build_config_store(args.ids)
+        config_store.load()
+        configs = [config_store.find(hotel_name, args.username) for hotel_name in args.hotel]
+    except Exception as e:
+        return finish("config_error", EXIT_CONFIG_ERROR, str(e))
+
+    information_list = [
+        (
+            config.username,
+            config.password,
+            config.hotel_name,
+            config.is_alone,
+            config.room_type,
+            config.price_type,
+            args.beg_date,
+            args.end_date,
+            config.path,
+        )
+        for config in configs
+    ]
+
+    bot = DedgeBot()
+    bot.headless = not args.window
+    bot_pool = BotPool(bot, args.pool_size)
+    reporter = pricing.ConsoleReporter()
+    price_cache, price_snapshots = build_price_stores()
+    results = []
+
+    if args.trace:
+        report["trace_path"] = tracing.TRACER.start(
+            os.path.join(ROOT_PATH, SETTINGS_DICT.get("trace_dir", "resources/traces")), "cli"
+        )
+
+    # Un arrêt demandé par cron/systemd (SIGTERM) est traité comme une interruption : les navigateurs sont fermés proprement
+    signal.signal(signal.SIGTERM, interrupt)
+
+    try:
+        pricing.run(
+            bot_pool,
+            information_list,
+            args.method,
+            reporter,
+            price_cache=price_cache,
+            price_snapshots=price_snapshots,
+            full_pass=args.full_pass,
+            results=results,
+        )
+        status, exit_code, error = "ok", EXIT_OK, None
+    except KeyboardInterrupt as e:
+        reporter.stop_event.set()
+        status, exit_code, error = "interrupted", EXIT_INTERRUPTED, str(e) or "Programme interrompu"
+    except Exception as e:
+        status, exit_code, error = "error", EXIT_PRICING_ERROR, str(e)
+    finally:
+        bot_pool.close()
+        bot.close()
+        if args.trace:
+            report["trace_summary"] = tracing.TRACER.stop()
+            print("\n".join(tracing.Tracer.summary_table(report["trace_summary"])), file=sys.stderr)
+
+    # Pages saisies dont l'enregistrement n'a pas été confirmé avant l'arrêt (prix à vérifier sur D-Edge)
+    unsaved_windows = bot_pool.unsaved_windows()
+    if unsaved_windows:
+        report["unsaved_windows"] = [
+            {"hotel_name": hotel_name, "window_start": window_start.isoformat(), "nb_prices": nb_prices}
+            for hotel_name, window_start, nb_prices in unsaved_windows
+        ]
+
+    # Les hôtels non traités (arrêt du pricing après une erreur) apparaissent aussi dans le rapport
+    report["hotels"] = results
+    processed_hotels = {(result["username"], result["hotel_name"]) for result in results}
+    for config in configs:
+        if (config.username, config.hotel_name) not in processed_hotels:
+            report["hotels"].append(
+                {"username": config.username, "hotel_name": config.hotel_name, "status": "not_run"}
+            )
+
+    return finish(status, exit_code, error)
+
+
+def schedule(args) -> int:
+    price_cache, price_snapshots = build_price_stores()
+    scheduler = Scheduler(
+        args.jobs,
+        build_job_queue(),
+        build_config_store(os.path.join(ROOT_PATH, SETTINGS_DICT["ids_path"])),
+        price_cache,
+        price_snapshots,
+        max_concurrent_jobs=args.max_concurrent,
+        journal_dir=os.path.join(ROOT_PATH, SETTINGS_DICT.get("scheduler_journal_dir", "resources/scheduler_journals")),
+    )
+
+    signal.signal(signal.SIGTERM, interrupt)
+    try:
+        scheduler.run(once=args.once)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    return EXIT_OK
+
+
+def jobs(args) -> int:
+    print(json.dumps(build_job_queue().history(args.job, args.limit), ensure_ascii=False, indent=2))
+    return EXIT_OK
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "price":
+        return price(args)
+    if args.command == "schedule":
+        return schedule(args)
+    if args.command == "jobs":
+        return jobs(args)
+    return EXIT_USAGE_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
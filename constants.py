@@ -4,7 +4,7 @@ from src.utils import fetch_json_data
 
 # Settings
 ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
-SETTINGS_PATH = os.path.join(ROOT_PATH, r"resources\settings.json")
+SETTINGS_PATH = os.path.join(ROOT_PATH, "resources", "settings.json")
 SETTINGS_DICT = fetch_json_data(SETTINGS_PATH)
 
 # Styles
@@ -21,4 +21,4 @@ class Version(Enum):
 
 
 # Web Browser
-EDGE_VERSION = None  # 105.0.1343.50
+EDGE_VERSION = None  # 105.0.1343.50 (utilisée seulement si la version installée ne peut pas être lue dans le registre)
@@ -0,0 +1,8 @@
+import sys
+from cli import main
+
+# Point d'entrée "python -m hpm", lancé depuis la racine du projet : équivalent de "python cli.py" (voir cli.py)
+# Exemple : python -m hpm price --hotel "Mon Hôtel" --from 2024-01-01 --to 2024-03-31 --method edit
+
+if __name__ == "__main__":
+    sys.exit(main())
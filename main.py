@@ -1,13 +1,34 @@
+import time
+
+STARTUP_TIME = time.perf_counter()  # Pris avant tous les autres imports pour mesurer le démarrage à froid (option --startup-profile)
+
 import sys
 import os
 from PySide2.QtWidgets import QApplication
 from PySide2.QtGui import QIcon
+from PySide2.QtCore import QTimer
 from src.dedge_bot import DedgeBot
 from src.hpm import Hpm
 from constants import ROOT_PATH, SETTINGS_DICT, Version
 
+# Modules lourds qui ne doivent plus être importés avant la construction de la fenêtre (le chargement des ids importe pandas en arrière-plan)
+HEAVY_MODULES = ["pandas", "openpyxl", "selenium", "webdriver_manager"]
+
+
+def print_startup_profile(steps, heavy_modules_at_display):
+    """
+    Print the time elapsed since the start of the program at each startup step
+    """
+    print("Profil de démarrage :")
+    for step_name, step_time in steps:
+        print("  {:<35} {:>8.0f} ms".format(step_name, (step_time - STARTUP_TIME) * 1000))
+    print("  Modules lourds chargés avant la fenêtre : {}".format(", ".join(heavy_modules_at_display) or "aucun"))
+
 
 def run_program():
+    startup_profile = "--startup-profile" in sys.argv
+    steps = [("Imports", time.perf_counter())]
+
     # Create app with icon
     app = QApplication(sys.argv)
     # app.setStyle("Fusion")
@@ -20,9 +41,22 @@ def run_program():
 
     # Create ui and run app
     ui = Hpm(bot, desktop_size, version=Version.PREMIUM)
+    # Relevé fait après la construction de la fenêtre (imports qu'elle déclencherait compris), mais avant le démarrage du
+    # chargement des ids qui importe pandas en arrière-plan (voir Hpm.load_ids)
+    heavy_modules_at_display = [module for module in HEAVY_MODULES if module in sys.modules]
+
+    if startup_profile:
+        # La fenêtre est affichée dès que la boucle d'évènements démarre ; le profil est imprimé une fois les ids chargés, puis le logiciel est fermé
+        steps.append(("Construction de la fenêtre", time.perf_counter()))
+        QTimer.singleShot(0, lambda: steps.append(("Fenêtre affichée", time.perf_counter())))
+        ui.ids_thread.finished.connect(lambda: steps.append(("Ids chargés", time.perf_counter())))
+        ui.ids_thread.finished.connect(lambda: print_startup_profile(steps, heavy_modules_at_display))
+        ui.ids_thread.finished.connect(app.quit)
+
     app.exec_()  # sys.exit(app.exec_())
 
-    # Close the browser when closing the software
+    # Close the browsers when closing the software
+    ui.bot_pool.close()
     if bot.driver_has_already_been_created:
         bot.destroy()
 
@@ -0,0 +1,116 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Iterable, List
+from .dedge_bot import DedgeBot
+
+# Délai laissé aux sessions pour s'arrêter d'elles-mêmes après une interruption, avant que leurs navigateurs ne soient tués (les
+# attentes explicites s'interrompent immédiatement, seule une commande WebDriver en cours peut bloquer, voir DedgeBot.abort)
+ABORT_GRACE_PERIOD = 0.5
+
+
+class BotPool:
+    """
+    Pool of independent DedgeBot sessions (one driver per bot) pricing several hotels at the same time
+
+    Cookies are stored in one jar per D-Edge account, shared by all the sessions through the main bot's 'cookie_store'
+
+    The first bot of the pool is always the main bot of the software, so that a pool of size 1 behaves exactly like the single bot
+    """
+
+    def __init__(self, main_bot: DedgeBot, size: int = 1) -> None:
+        self.main_bot = main_bot
+        self.bots = [main_bot]
+        self.resize(size)
+
+    def resize(self, size: int) -> None:
+        """
+        Add or close secondary sessions so that the pool contains exactly 'size' bots
+        """
+        size = max(1, int(size))
+        while len(self.bots) < size:
+            bot = DedgeBot(self.main_bot.desktop_size)
+            bot.headless = self.main_bot.headless  # Le mode sans fenêtre peut être forcé sur le bot principal (ligne de commande)
+            bot.login_url = self.main_bot.login_url  # Idem pour le site visé (faux extranet des benchmarks)
+            bot.extranet_url = self.main_bot.extranet_url
+            bot.cookie_store = self.main_bot.cookie_store
+            self.bots.append(bot)
+        for bot in self.bots[size:]:
+            bot.close()
+        del self.bots[size:]
+
+    def sessions_for(self, nb_tasks: int) -> List[DedgeBot]:
+        """
+        Return the bots that will actually be used for 'nb_tasks' tasks (no need to open more browsers than tasks)
+        """
+        return self.bots[: max(1, min(len(self.bots), nb_tasks))]
+
+    def run(self, tasks: Iterable, func: Callable, stop_event: threading.Event) -> None:
+        """
+        Execute func(bot, task) for every task, each session handling one task at a time
+
+        As soon as a session fails (error or interruption), 'stop_event' is set so that the other sessions stop too,
+        then the first error is raised again in the calling thread
+        """
+        for bot in self.bots:
+            bot.unsaved_window = None
+
+        tasks_queue = queue.Queue()
+        for task in tasks:
+            tasks_queue.put(task)
+
+        errors = []
+        errors_lock = threading.Lock()
+
+        def session_loop(bot: DedgeBot) -> None:
+            while not stop_event.is_set():
+                try:
+                    task = tasks_queue.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    func(bot, task)
+                except BaseException as e:
+                    with errors_lock:
+                        errors.append(e)
+                    stop_event.set()
+                    return
+
+        sessions = self.sessions_for(tasks_queue.qsize())
+        executor = ThreadPoolExecutor(max_workers=len(sessions))
+        futures = [executor.submit(session_loop, bot) for bot in sessions]
+        try:
+            wait(futures)
+        except BaseException:
+            # Interruption du thread appelant (Ctrl+C ou SIGTERM en ligne de commande) : les sessions sont arrêtées elles aussi
+            stop_event.set()
+            if wait(futures, timeout=ABORT_GRACE_PERIOD).not_done:
+                self.abort()
+            raise
+        finally:
+            executor.shutdown(wait=False)
+
+        if errors:
+            # On privilégie une véritable erreur plutôt que les interruptions qu'elle a provoquées dans les autres sessions
+            real_errors = [e for e in errors if not isinstance(e, KeyboardInterrupt)]
+            raise (real_errors or errors)[0]
+
+    def unsaved_windows(self) -> List[tuple]:
+        """
+        Return the (hotel_name, window_start, nb_prices) of the pages left edited but not confirmed as saved by the last run
+        """
+        return [bot.unsaved_window for bot in self.bots if bot.unsaved_window is not None]
+
+    def abort(self) -> None:
+        """
+        Kill the browsers of every session, including the main bot, to unblock the WebDriver calls in progress (see DedgeBot.abort)
+        """
+        for bot in self.bots:
+            bot.abort()
+
+    def close(self) -> None:
+        """
+        Close the browsers of the secondary sessions (the main bot is handled by the software itself)
+        """
+        for bot in self.bots[1:]:
+            bot.close()
@@ -0,0 +1,234 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from dataclasses import dataclass, astuple, fields
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class HotelConfig:
+    """
+    Configuration of a hotel on a D-Edge account (one line of the ids file)
+    """
+
+    abreviation: str
+    username: str
+    password: str
+    hotel_name: str
+    is_alone: bool
+    room_type: str
+    price_type: str
+    path: str
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.username, self.hotel_name
+
+    @classmethod
+    def columns(cls) -> List[str]:
+        return [field.name for field in fields(cls)]
+
+    @classmethod
+    def from_row(cls, row: dict) -> "HotelConfig":
+        """
+        Build a config from a line of the ids file or of the ids table (string values, is_alone being "yes"/"no")
+        """
+        values = {column: str(row.get(column, "")).strip() for column in cls.columns()}
+        values["is_alone"] = values["is_alone"].lower() == "yes"
+        return cls(**values)
+
+    def to_row(self) -> List[str]:
+        return ["yes" if value is True else "no" if value is False else value for value in astuple(self)]
+
+
+class ConfigStore:
+    """
+    Indexed store of the hotel configurations, keyed by (username, hotel_name)
+
+    - the ids Excel file stays the reference edited by the users: it is imported into a SQLite database only when it has
+      changed (path, size or modification time) since the last import, otherwise the configurations are read from the
+      database
+    - lookups are done in memory (dictionaries built once per load)
+    - saving only writes the added, modified and deleted configurations in the database, then exports the ids file
+    """
+
+    def __init__(self, db_path: str, ids_path: str, max_configs: Optional[int] = None) -> None:
+        self.db_path = db_path
+        self.ids_path = ids_path
+        self.max_configs = max_configs  # Nombre maximum de configurations accessibles (version gratuite)
+        self.lock = threading.Lock()  # Chargé dans un thread à part, puis lu par le worker
+
+        self.configs: List[HotelConfig] = []
+        self.configs_by_key: Dict[Tuple[str, str], HotelConfig] = {}
+        self.hotels_by_username: Dict[str, List[str]] = {}
+
+    def connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.db_path)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS hotels ("
+            "position INTEGER NOT NULL, abreviation TEXT, username TEXT NOT NULL, password TEXT, "
+            "hotel_name TEXT NOT NULL, is_alone INTEGER, room_type TEXT, price_type TEXT, path TEXT, "
+            "PRIMARY KEY (username, hotel_name))"
+        )
+        connection.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)")
+        return connection
+
+    def ids_file_signature(self) -> str:
+        # Le chemin du fichier fait partie de la signature : la base est partagée entre l'interface et la ligne de commande
+        # (option --ids), deux fichiers d'ids différents de même taille et même date ne doivent pas être confondus
+        stat = os.stat(self.ids_path)
+        return "{}:{}:{}".format(os.path.normcase(os.path.abspath(self.ids_path)), stat.st_size, stat.st_mtime_ns)
+
+    @staticmethod
+    def check_duplicates(configs: List[HotelConfig], source: str) -> None:
+        seen_keys, duplicated_keys = set(), []
+        for config in configs:
+            if config.key in seen_keys and config.key not in duplicated_keys:
+                duplicated_keys.append(config.key)
+            seen_keys.add(config.key)
+        if duplicated_keys:
+            raise ValueError(
+                "Les couples (username, hotel_name) suivants apparaissent plusieurs fois dans {} : {}".format(
+                    source, ", ".join("({}, {})".format(*key) for key in duplicated_keys)
+                )
+            )
+
+    def load(self) -> List[HotelConfig]:
+        """
+        Load the configurations, importing the ids file first if it has changed since the last import
+        """
+        with self.lock, closing(self.connect()) as connection:
+            signature = self.ids_file_signature()
+            row = connection.execute("SELECT value FROM metadata WHERE key = 'ids_file_signature'").fetchone()
+            if row is None or row[0] != signature:
+                configs = self.read_ids_file()
+                with connection:
+                    connection.execute("DELETE FROM hotels")
+                    self.write(connection, configs)
+                    self.set_signature(connection, signature)
+            else:
+                configs = [config for _, config in self.read(connection)]
+
+            self.index(configs)
+            return self.configs
+
+    def read_ids_file(self) -> List[HotelConfig]:
+        import pandas as pd
+
+        df_ids = pd.read_excel(self.ids_path, keep_default_na=False)
+        configs = [HotelConfig.from_row(row) for row in df_ids.to_dict("records")]
+        self.check_duplicates(configs, self.ids_path)
+        return configs
+
+    @staticmethod
+    def read(connection: sqlite3.Connection) -> List[Tuple[int, HotelConfig]]:
+        return [
+            (values[0], HotelConfig(*values[1:5], bool(values[5]), *values[6:]))
+            for values in connection.execute(
+                "SELECT position, abreviation, username, password, hotel_name, is_alone, room_type, price_type, path "
+                "FROM hotels ORDER BY position"
+            )
+        ]
+
+    @staticmethod
+    def write(
+        connection: sqlite3.Connection, configs: List[HotelConfig], positions: Optional[List[int]] = None
+    ) -> None:
+        positions = positions if positions is not None else list(range(len(configs)))
+        connection.executemany(
+            "INSERT OR REPLACE INTO hotels "
+            "(position, abreviation, username, password, hotel_name, is_alone, room_type, price_type, path) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(position, *astuple(config)) for position, config in zip(positions, configs)],
+        )
+
+    @staticmethod
+    def set_signature(connection: sqlite3.Connection, signature: str) -> None:
+        connection.execute(
+            "INSERT OR REPLACE INTO metadata (key, value) VALUES ('ids_file_signature', ?)", (signature,)
+        )
+
+    def index(self, configs: List[HotelConfig]) -> None:
+        if self.max_configs is not None:
+            configs = configs[: self.max_configs]
+
+        self.configs = configs
+        self.configs_by_key = {config.key: config for config in configs}
+        self.hotels_by_username = {}
+        for config in configs:
+            self.hotels_by_username.setdefault(config.username, []).append(config.hotel_name)
+
+    def get(self, username: str, hotel_name: str) -> HotelConfig:
+        try:
+            return self.configs_by_key[(username, hotel_name)]
+        except KeyError:
+            raise Exception("L'hôtel '{}' du compte '{}' n'est pas paramétré".format(hotel_name, username))
+
+    def find(self, hotel_name: str, username: Optional[str] = None) -> HotelConfig:
+        """
+        Get the configuration of a hotel from its name only (command line, scheduled jobs), the username being required
+        if the hotel is set on several accounts
+        """
+        matching_configs = [
+            config
+            for config in self.configs
+            if config.hotel_name == hotel_name and (username is None or config.username == username)
+        ]
+        if not matching_configs:
+            raise ValueError("L'hôtel '{}' n'est pas paramétré dans {}".format(hotel_name, self.ids_path))
+        if len(matching_configs) > 1:
+            raise ValueError(
+                "L'hôtel '{}' est paramétré sur plusieurs comptes ({}) : veuillez préciser le username".format(
+                    hotel_name, ", ".join(config.username for config in matching_configs)
+                )
+            )
+        return matching_configs[0]
+
+    def usernames(self) -> List[str]:
+        return sorted(self.hotels_by_username, key=str.lower)
+
+    def hotels_of(self, username: str) -> List[str]:
+        return self.hotels_by_username.get(username, [])
+
+    def save(self, configs: List[HotelConfig]) -> bool:
+        """
+        Replace the configurations by 'configs' and export the ids file (only the differences are written in the db)
+
+        Return False if nothing has changed
+        """
+        self.check_duplicates(configs, "le tableau des ids")
+        if configs == self.configs:
+            return False
+
+        with self.lock, closing(self.connect()) as connection:
+            old_positions = {config.key: (position, config) for position, config in self.read(connection)}
+            new_keys = {config.key for config in configs}
+            changed = [
+                (position, config)
+                for position, config in enumerate(configs)
+                if old_positions.get(config.key) != (position, config)
+            ]
+
+            with connection:
+                connection.executemany(
+                    "DELETE FROM hotels WHERE username = ? AND hotel_name = ?",
+                    [key for key in old_positions if key not in new_keys],
+                )
+                self.write(connection, [config for _, config in changed], [position for position, _ in changed])
+
+                # Export du fichier des ids, dont la nouvelle signature évite sa réimportation au prochain chargement
+                self.write_ids_file(configs)
+                self.set_signature(connection, self.ids_file_signature())
+
+            self.index(configs)
+            return True
+
+    def write_ids_file(self, configs: List[HotelConfig]) -> None:
+        import pandas as pd
+
+        df_ids = pd.DataFrame([config.to_row() for config in configs], columns=HotelConfig.columns())
+        df_ids.to_excel(self.ids_path, index=False)
@@ -0,0 +1,68 @@
+import os
+import time
+import pickle
+import hashlib
+import threading
+from typing import List, Optional
+
+# Verrou partagé par toutes les instances (toutes les sessions d'un pool de bots écrivent dans le même dossier)
+JARS_LOCK = threading.Lock()
+
+# Champs acceptés par la commande CDP 'Network.setCookies' (les autres champs renvoyés par 'Network.getAllCookies' sont ignorés)
+COOKIE_FIELDS = ["name", "value", "domain", "path", "expires", "httpOnly", "secure", "sameSite", "priority"]
+
+
+class CookieStore:
+    """
+    Persistent cookie jars keyed by D-Edge username (one pickle file per account)
+
+    A jar holds every availpro cookie of the browser (all domains, CDP 'Network.getAllCookies' format) with some metadata:
+    - saved_at: timestamp of the last save
+    - expires_at: latest expiry of the persistent cookies (None if the jar only holds session cookies)
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def jar_path(self, username: str) -> str:
+        key = hashlib.sha1(username.strip().lower().encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + ".pkl")
+
+    def load(self, username: str) -> Optional[dict]:
+        """
+        Return the jar of an account without its expired cookies, or None if the account has no jar
+        """
+        try:
+            with JARS_LOCK, open(self.jar_path(username), "rb") as jar_file:
+                jar = pickle.load(jar_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        now = time.time()
+        jar["cookies"] = [cookie for cookie in jar["cookies"] if not 0 < cookie.get("expires", -1) < now]
+        return jar
+
+    @staticmethod
+    def is_valid(jar: Optional[dict]) -> bool:
+        return jar is not None and len(jar["cookies"]) > 0
+
+    def save(self, username: str, cookies: List[dict]) -> None:
+        """
+        Replace the jar of an account by the given cookies (atomic write)
+        """
+        cookies = [{field: cookie[field] for field in COOKIE_FIELDS if field in cookie} for cookie in cookies]
+        persistent_expiries = [cookie["expires"] for cookie in cookies if cookie.get("expires", -1) > 0]
+        jar = {
+            "username": username,
+            "saved_at": time.time(),
+            "expires_at": max(persistent_expiries) if persistent_expiries else None,
+            "cookies": cookies,
+        }
+
+        os.makedirs(self.directory, exist_ok=True)
+        jar_path = self.jar_path(username)
+        temp_path = "{}.{}.tmp".format(jar_path, threading.get_ident())
+        with JARS_LOCK:
+            with open(temp_path, "wb") as jar_file:
+                pickle.dump(jar, jar_file)
+            os.replace(temp_path, jar_path)
@@ -1,5 +1,5 @@
+from __future__ import annotations
 import datetime as dt
-import pandas as pd
 from PySide2.QtWidgets import (
     QWidget,
     QTableWidget,
@@ -20,7 +20,10 @@ from PySide2.QtWidgets import (
 )
 from PySide2.QtCore import Qt, QDate
 from PySide2.QtGui import QIcon, QPixmap
-from typing import Callable, List
+from typing import Callable, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 # Constant
@@ -72,12 +75,19 @@ class CustomTable(QTableWidget):
         df: pd.DataFrame = None,
         add_icon_path: str = None,
         remove_icon_path: str = None,
+        columns: List[str] = None,
     ) -> None:
         super().__init__(parent)
         self.columns = []
         self.add_icon_path = add_icon_path
         self.remove_icon_path = remove_icon_path
 
+        # Headers of an empty table, when the df is filled later (e.g. loaded in the background)
+        if columns is not None:
+            self.columns = list(columns)
+            self.setColumnCount(len(self.columns))
+            self.setHorizontalHeaderLabels(self.columns)
+
         # Resize the table to its content dynamically
         self.horizontalHeader().setSectionResizeMode(
             QHeaderView.ResizeToContents
@@ -93,39 +103,49 @@ class CustomTable(QTableWidget):
         # Connect to a method that displays a custom context menu
         self.customContextMenuRequested.connect(lambda pos: self.show_context_menu(pos))
 
+    def to_rows(self) -> List[List[str]]:
+        """
+        Export QTableWidget to a list of rows (one string per column, in the order of self.columns)
+        """
+        rows = []
+        for i in range(self.rowCount()):
+            row = []
+            for j in range(self.columnCount()):
+                table_item = self.item(i, j)
+                row.append(table_item.text() if table_item is not None else "")
+            rows.append(row)
+        return rows
+
     def to_df(self) -> pd.DataFrame:
         """
         Export QTableWidget to a pandas Dataframe
         """
-        nb_rows, nb_columns = self.rowCount(), self.columnCount()
-        columns = [self.horizontalHeaderItem(j).text() for j in range(nb_columns)]
-
-        table_dict = {column_name: [self.item(i, j) for i in range(nb_rows)] for j, column_name in enumerate(columns)}
-        str_dict = {
-            column_name: [table_item.text() if table_item is not None else "" for table_item in table_dict[column_name]]
-            for column_name in table_dict
-        }
-        df = pd.DataFrame(str_dict)
+        import pandas as pd
 
-        # Keep column order
-        return df[columns]
+        columns = [self.horizontalHeaderItem(j).text() for j in range(self.columnCount())]
+        return pd.DataFrame(self.to_rows(), columns=columns)
 
-    def fill(self, df: pd.DataFrame) -> None:
+    def fill_rows(self, rows: List[List[str]], columns: List[str] = None) -> None:
         """
-        Fill the table from a pandas Dataframe
+        Fill the table from a list of rows (the current columns are kept if no columns are given)
         """
-        nb_rows, nb_columns = df.shape
-        self.setRowCount(nb_rows)
-        self.setColumnCount(nb_columns)
-        self.columns = list(df.columns)
+        if columns is not None:
+            self.columns = list(columns)
+        self.setRowCount(len(rows))
+        self.setColumnCount(len(self.columns))
         self.setHorizontalHeaderLabels(self.columns)
 
-        for i in range(nb_rows):
-            for j in range(nb_columns):
-                item = df.iloc[i, j]
+        for i, row in enumerate(rows):
+            for j, item in enumerate(row):
                 table_item = QTableWidgetItem(item)
                 self.setItem(i, j, table_item)
 
+    def fill(self, df: pd.DataFrame) -> None:
+        """
+        Fill the table from a pandas Dataframe
+        """
+        self.fill_rows(df.values.tolist(), list(df.columns))
+
     def add_row(self) -> None:
         """
         Insert a row at the end of the table
@@ -1,26 +1,137 @@
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
-from selenium.webdriver import Edge
-from selenium.webdriver.edge.options import Options
-from selenium.webdriver.edge.service import Service
-from subprocess import CREATE_NO_WINDOW
-from selenium.webdriver.common.keys import Keys
+import subprocess
 import datetime as dt
+import bisect
+import math
 import sys
 import time
 import pickle
 import os
+import signal
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit, urlunsplit, urljoin, parse_qsl, urlencode
 from constants import ROOT_PATH, SETTINGS_DICT, EDGE_VERSION
+from . import utils
+from . import tracing
+from .cookie_store import CookieStore
+from .driver_resolver import DriverResolver
 
 # Idée : au lieu de créer plusieurs "if worker is not None", on peut en mettre un seul au début pour créer un alias (appelé display par ex) des fonctions print ou emit selon le cas
 # -> une unique fonction pour les 2 cas
 # Essayer d'avoir un seul tronc commun avec des if dans la méthode check_prices
 
+# Lecture de la grille de prix de la page en cours (date de début + 14 prix) en une seule requête JS
+# Renvoie null tant que la page n'est pas entièrement chargée (libellé de la date ou un des 14 prix absent)
+PRICE_GRID_READ_SCRIPT = """
+var label = document.getElementsByClassName("dateLabel")[0];
+if (label === undefined || document.readyState === "loading") {
+    return null;
+}
+var prices = [];
+for (var day = 0; day < 14; day++) {
+    var input = document.evaluate(
+        '//tr[@type="RatePrice"]/td[@day="' + day + '"]//input[@id="Price"]',
+        document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+    if (input === null) {
+        return null;
+    }
+    prices.push(input.value);
+}
+return {dateLabel: label.innerText.trim(), prices: prices};
+"""
+
+# Ecriture groupée des prix modifiés d'une page (arguments[0] : dictionnaire indice du jour -> prix) en une seule requête JS
+# Pour chaque prix, on reproduit les événements d'une saisie clavier (focus, input, keyup, change, blur) afin que le formulaire
+# de planning prenne en compte les modifications et active le bouton 'savePlanning'. Renvoie le nombre de prix effectivement écrits
+PRICE_GRID_WRITE_SCRIPT = """
+var changes = arguments[0];
+var valueSetter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, "value").set;
+var written = 0;
+for (var day in changes) {
+    var input = document.evaluate(
+        '//tr[@type="RatePrice"]/td[@day="' + day + '"]//input[@id="Price"]',
+        document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+    if (input === null) {
+        continue;
+    }
+    input.dispatchEvent(new FocusEvent("focus"));
+    input.dispatchEvent(new FocusEvent("focusin", {bubbles: true}));
+    valueSetter.call(input, changes[day]);
+    input.dispatchEvent(new Event("input", {bubbles: true}));
+    input.dispatchEvent(new KeyboardEvent("keyup", {bubbles: true}));
+    input.dispatchEvent(new Event("change", {bubbles: true}));
+    if (window.jQuery) {
+        window.jQuery(input).trigger("change");
+    }
+    input.dispatchEvent(new FocusEvent("blur"));
+    input.dispatchEvent(new FocusEvent("focusout", {bubbles: true}));
+    if (input.value === changes[day]) {
+        written++;
+    }
+}
+return written;
+"""
+
+# Etat de la page de planning en une seule requête JS : URL, liens de navigation (mois et 14 jours), libellé de la date de début
+# et types de chambre/prix sélectionnés. Renvoie null tant que le libellé de la date n'est pas affiché
+PAGE_STATE_SCRIPT = """
+var label = document.getElementsByClassName("dateLabel")[0];
+if (label === undefined || document.readyState === "loading") {
+    return null;
+}
+var urls = [window.location.href];
+document.querySelectorAll("div.months a, span.prevnext a").forEach(function (link) {
+    urls.push(link.href);
+});
+var selectedText = function (id) {
+    var selector = document.getElementById(id);
+    return selector && selector.selectedIndex >= 0 ? selector.options[selector.selectedIndex].text : null;
+};
+return {
+    urls: urls,
+    dateLabel: label.innerText.trim(),
+    room: selectedText("roomSelector"),
+    rate: selectedText("rateSelector")
+};
+"""
+
+# Formats de date testés pour reconnaître le paramètre d'URL portant la date de début de la page de planning
+DATE_URL_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y%m%d"]
+
+# Verrou partagé par toutes les sessions d'un pool de bots : l'ancien fichier de cookies commun est lu par toutes les instances
+COOKIES_LOCK = threading.Lock()
+
+# Flag Windows empêchant selenium d'ouvrir un terminal (inexistant sur les serveurs Linux utilisant la ligne de commande)
+CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+# Délais d'attente (minimum, maximum) en secondes, par type d'opération (l'implicit wait du driver est désactivé, voir find_element)
+# Le délai effectif s'adapte aux latences observées dans la session : ADAPTIVE_TIMEOUT_FACTOR fois la plus longue des
+# ADAPTIVE_TIMEOUT_WINDOW dernières attentes réussies du même type, borné par ces valeurs (voir adaptive_timeout)
+PROBE_TIMEOUTS = (2, 10)  # Elément attendu sur une page déjà chargée (options des sélecteurs, hôtel de la liste, champs du formulaire)
+REQUIRED_TIMEOUTS = (15, 60)  # Elément ou page attendu après une navigation
+SAVE_TIMEOUTS = (30, 180)  # Enregistrement des prix
+ADAPTIVE_TIMEOUT_FACTOR = 5
+ADAPTIVE_TIMEOUT_WINDOW = 20
+
+# Résolution du driver commune à toutes les sessions : le chemin du driver est mémorisé entre deux lancements du logiciel
+DRIVER_RESOLVER = DriverResolver(
+    os.path.join(ROOT_PATH, SETTINGS_DICT.get("driver_cache_path", "resources/cache/driver.json")), EDGE_VERSION
+)
+
 
 class DedgeBot:
     def __init__(self, desktop_size=None):
         # Settings
+        # Cookies : un cookie jar par compte (l'ancien fichier commun à tous les comptes ne sert plus que pour les comptes sans jar)
         self.cookies_path = os.path.join(ROOT_PATH, SETTINGS_DICT["cookies_path"])
+        self.cookie_store = CookieStore(os.path.join(ROOT_PATH, SETTINGS_DICT["cookies_dir"]))
+        # URLs du site D-Edge, modifiables pour pricer sur un faux extranet local (voir benchmarks/mock_extranet.py)
+        self.login_url = SETTINGS_DICT.get("login_url", "https://login.availpro.com/")
+        self.extranet_url = SETTINGS_DICT.get("extranet_url", "https://extranet.availpro.com/")
         self.desktop_size = desktop_size
+        self.headless = SETTINGS_DICT.get("headless", False)  # Navigateur sans fenêtre (machines de batch)
         self.months_dict = {
             "janv.": 1,
             "févr.": 2,
@@ -37,17 +148,55 @@ class DedgeBot:
         }
         self.reverse_months_dict = {value: key for key, value in self.months_dict.items()}
 
+        # Grille de prix (hôtel, type de chambre, type de prix) actuellement ouverte, réutilisée si seules les dates changent
+        self.current_planning = None
+
+        # Paramètre d'URL permettant d'ouvrir directement la page de planning à une date donnée (voir go_to_date)
+        # None : pas encore recherché, False : introuvable ou non pris en compte par le site
+        self.date_url_parameter = None
+
+        # Durées de chaque attente explicite réussie et nombre d'attentes ayant échoué, par type d'attente (voir wait_until)
+        self.wait_durations = defaultdict(list)
+        self.wait_timeouts = defaultdict(int)
+        # Idem pour l'hôtel en cours uniquement (remis à zéro au début de check_prices), résumé dans le registre par wait_summary.
+        # L'historique de la session est conservé à part : il sert au calcul des délais adaptatifs (voir adaptive_timeout)
+        self.hotel_wait_durations = defaultdict(list)
+        self.hotel_wait_timeouts = defaultdict(int)
+
+        # Page dont les prix ont été saisis mais dont l'enregistrement n'est pas encore confirmé : (hôtel, début de la page, nombre
+        # de prix). Signalée à l'utilisateur si le pricing s'arrête à ce moment-là (voir BotPool.unsaved_windows)
+        self.unsaved_window = None
+
         # Driver states
         self.driver_has_been_prepared = False
         self.driver_has_already_been_created = False
 
+    @tracing.traced("prepare_driver")
     def prepare_driver(self):
         # Il faut compter une erreur d'environ 6px sur la largeur de l'écran pour obtenir la bonne position (garder cette variable dans le programme tant que ce pb n'est pas réglé)
         # Il semble aussi que la taille de la fenêtre du browser obtenue ne corresponde pas exactement non plus à celle souhaitée (à approfondir).
         # Il y a notamment une différence de taille avec celle de l'ui, alors que cette dernière a reçu la même taille en argument
         width_error = 6
+
+        # Selenium n'est importé qu'à la première préparation d'un driver, pour ne pas retarder l'affichage de la fenêtre au lancement
+        from selenium.webdriver.edge.options import Options
+        from selenium.webdriver.edge.service import Service
+
         options = Options()
-        if self.desktop_size is not None:
+        if self.headless:
+            # Aucun rendu à l'écran : la géométrie de la fenêtre est inutile, on fixe juste une taille de viewport pour que la grille soit entièrement affichée
+            for argument in [
+                "--headless",
+                "--window-size=1920,1080",
+                "--disable-gpu",
+                "--disable-extensions",
+                "--disable-dev-shm-usage",
+                "--no-first-run",
+                "--mute-audio",
+                "--blink-settings=imagesEnabled=false",  # Les images ne servent pas au pricing
+            ]:
+                options.add_argument(argument)
+        elif self.desktop_size is not None:
             options.add_argument("force-device-scale-factor=1")  # Forcer le facteur de mise à l'échelle (ici 100%)
             # options.add_argument('high-dpi-support=1')  # Pas utile a priori
             options.add_argument(
@@ -59,11 +208,8 @@ class DedgeBot:
         else:
             options.add_argument("--start-maximized")
 
-        # Installation automatique du driver
-        if EDGE_VERSION is not None:
-            service = Service(EdgeChromiumDriverManager(version=EDGE_VERSION).install())
-        else:
-            service = Service(EdgeChromiumDriverManager().install())
+        # Driver en cache local s'il correspond à la version du navigateur, téléchargement automatique sinon
+        service = Service(DRIVER_RESOLVER.resolve())
 
         service.creationflags = CREATE_NO_WINDOW  # Empêche selenium d'ouvrir un terminal grâce à 'CREATE_NO_WINDOW'
 
@@ -73,191 +219,565 @@ class DedgeBot:
         # Maj de l'état du driver
         self.driver_has_been_prepared = True
 
+    @tracing.traced("create_driver")
     def create_driver(self):
         # Instanciation du driver (et ouverture du navigateur Microsoft Edge)
+        from selenium.webdriver import Edge
+
         self.driver = Edge(service=self.service, options=self.options)
 
-        # Durée d'attente implicite pour que les éléments de pages soient trouvés
-        self.driver.implicitly_wait(60)
+        # Pas d'attente implicite : chaque recherche d'élément a son propre délai, adapté au type d'opération (voir find_element)
+        # (un implicit wait de 60 s bloquait une minute sur un type de chambre ou un hôtel mal renseigné dans les ids)
+        self.driver.implicitly_wait(0)
 
         # Ouverture d'une page D-Edge
         self.go_to_home_page()
 
-        # Ajout des cookies déjà créés auparavant (de telle sorte qu'on n'aura plus à s'en occuper pour le reste de la session)
-        if self.cookies_path is not None:
-            self.add_cookies()
+        # NB : les cookies sont désormais chargés à chaque connexion, à partir du cookie jar du compte (voir restore_session)
 
         # Maj de l'état du driver
         self.driver_has_already_been_created = True
 
+    # Vérifie que le navigateur est toujours ouvert (et le rouvre si besoin) avant de lancer une nouvelle tâche
+    def ensure_browser_is_open(self, worker=None):
+        # Récupération de la liste des onglets/fenêtres du navigateur pour s'assurer que ce dernier est bien ouvert
+        try:
+            tabs = self.driver.window_handles
+
+            # Récupération de l'onglet ciblé par le driver pour s'assurer que cet onglet n'a pas été fermé par l'utilisateur
+            try:
+                self.driver.current_window_handle
+
+            # Si l'onglet ciblé a été fermé, on ouvre un nouvel onglet et on le cible
+            except:
+                # On ne peut ouvrir un nouvel onglet qu'à partir d'un onglet ouvert ciblé, donc on cible le premier onglet de la liste des onglets actuellement ouverts
+                self.driver.switch_to.window(tabs[0])
+
+                # Ne fonctionne qu'à partir de selenium 4.
+                # Sous selenium < 4, il faudrait utiliser : self.driver.execute_script("window.open('');") puis new_tabs = self.driver.window_handles pour
+                # switch vers le seul onglet dans new_tabs qui n'est pas dans tabs
+                self.driver.switch_to.new_window("tab")
+
+        # Si le navigateur n'a jamais été ouvert (i.e. l'attribut driver n'existe pas) ou a été fermé par l'utilisateur, on ouvre
+        # une nouvelle fenêtre de navigateur (et donc on crée une nouvelle instance de driver)
+        # NB : si l'erreur est différente, on est plutôt confiant sur le fait qu'une nouvelle erreur interrompra le programme
+        except Exception:
+            message = "Ouverture du navigateur"
+            if worker is not None:
+                worker.emit_signals(message, message)
+            else:
+                print(message)
+            self.create_driver()
+
+    # --- Attentes explicites --- #
+    # Toutes les attentes passent par wait_until : interrogation du navigateur à intervalle croissant (backoff) et borné, délai maximal
+    # par type d'attente et enregistrement de la durée de chaque attente. Remplace les boucles 'while ...: pass' qui saturaient un coeur
+    # et inondaient le WebDriver de requêtes pendant le chargement des pages
+    def wait_until(
+        self,
+        condition,
+        wait_name,
+        timeout=REQUIRED_TIMEOUTS,
+        worker=None,
+        description=None,
+        min_interval=0.05,
+        max_interval=0.5,
+    ):
+        # timeout : délai en secondes, bornes (minimum, maximum) d'un délai adaptatif ou None pour une attente infinie
+        # (ex : saisie manuelle du code reçu par email)
+        if isinstance(timeout, tuple):
+            timeout = self.adaptive_timeout(wait_name, timeout)
+
+        # Erreurs passagères juste après un get, un clic ou un back() : script exécuté sur une page en cours de déchargement
+        # ("document unloaded"), élément détaché du DOM. La condition est alors simplement considérée comme non remplie
+        from selenium.common.exceptions import JavascriptException, StaleElementReferenceException
+
+        transient_errors = (JavascriptException, StaleElementReferenceException)
+        last_error = None
+
+        start_time = time.monotonic()
+        interval = min_interval
+        while True:
+            try:
+                result = condition()
+            except transient_errors as e:
+                result, last_error = None, e
+            elapsed_time = time.monotonic() - start_time
+            if result:
+                self.wait_durations[wait_name].append(elapsed_time)
+                self.hotel_wait_durations[wait_name].append(elapsed_time)
+                return result
+
+            if worker is not None:
+                worker.exit_if_interruption_requested()
+
+            if timeout is not None and elapsed_time >= timeout:
+                self.wait_timeouts[wait_name] += 1
+                self.hotel_wait_timeouts[wait_name] += 1
+                message = "Délai d'attente dépassé ({:.1f} s) : {}".format(
+                    timeout, description if description else wait_name
+                )
+                if last_error is not None:
+                    message += " (dernière erreur du navigateur : {})".format(
+                        getattr(last_error, "msg", None) or type(last_error).__name__
+                    )
+                raise TimeoutError(message)
+
+            delay = interval if timeout is None else min(interval, timeout - elapsed_time)
+            if worker is None:
+                time.sleep(delay)
+            # Attente interrompue dès l'annulation du pricing (voir Worker.cancel), sans attendre la fin de l'intervalle
+            elif worker.stop_event.wait(delay):
+                worker.exit_if_interruption_requested()
+            interval = min(interval * 1.5, max_interval)
+
+    # Délai d'une attente, adapté aux durées des dernières attentes réussies du même type (le minimum tant qu'aucune n'a abouti)
+    def adaptive_timeout(self, wait_name, bounds):
+        min_timeout, max_timeout = bounds
+        durations = self.wait_durations[wait_name][-ADAPTIVE_TIMEOUT_WINDOW:]
+        if not durations:
+            return min_timeout
+        return min(max_timeout, max(min_timeout, ADAPTIVE_TIMEOUT_FACTOR * max(durations)))
+
+    # Recherche d'un élément par son xpath, avec un délai propre à l'opération (PROBE_TIMEOUTS pour un élément attendu sur la page
+    # déjà chargée, REQUIRED_TIMEOUTS après une navigation). Si l'élément est introuvable, l'erreur indique le xpath recherché
+    def find_element(self, xpath, wait_name, timeout=REQUIRED_TIMEOUTS, worker=None, description=None):
+        return self.find_elements(xpath, wait_name, timeout, worker, description)[0]
+
+    # Idem pour plusieurs éléments (au moins un élément doit être trouvé)
+    def find_elements(self, xpath, wait_name, timeout=REQUIRED_TIMEOUTS, worker=None, description=None):
+        return self.wait_until(
+            lambda: self.driver.find_elements_by_xpath(xpath),
+            wait_name,
+            timeout,
+            worker,
+            "{} introuvable ({})".format(description if description else "élément", xpath),
+        )
+
+    # Attente du chargement d'une nouvelle page (changement d'URL)
+    def wait_for_page_change(self, previous_url, timeout=REQUIRED_TIMEOUTS, worker=None):
+        self.wait_until(
+            lambda: self.driver.current_url != previous_url,
+            "page changed",
+            timeout,
+            worker,
+            "chargement de la page suivant {}".format(previous_url),
+        )
+
+    # Attente qu'un élément existe et ne soit plus désactivé (attribut 'disabled'), en une seule requête JS par interrogation
+    def wait_for_element_enabled(self, xpath, timeout=REQUIRED_TIMEOUTS, worker=None):
+        script = (
+            "var element = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;"
+            "return element !== null && !element.hasAttribute('disabled') ? element : null;"
+        )
+        return self.wait_until(
+            lambda: self.driver.execute_script(script, xpath),
+            "element enabled",
+            timeout,
+            worker,
+            "activation de l'élément {}".format(xpath),
+        )
+
+    # Attente du message de confirmation de l'enregistrement des prix
+    def wait_for_save_confirmed(self, timeout=SAVE_TIMEOUTS, worker=None):
+        script = (
+            "return document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue !== null;"
+        )
+        xpath = '//span[text()="Les modifications ont bien été enregistrées. "]'
+        self.wait_until(
+            lambda: self.driver.execute_script(script, xpath),
+            "save confirmed",
+            timeout,
+            worker,
+            "confirmation de l'enregistrement des prix",
+        )
+
+    # Résumé des attentes de l'hôtel en cours (nombre, durée moyenne et maximale par type d'attente, et nombre de délais dépassés)
+    def wait_summary(self):
+        summaries = []
+        for wait_name in dict.fromkeys([*self.hotel_wait_durations, *self.hotel_wait_timeouts]):
+            durations = self.hotel_wait_durations.get(wait_name)
+            nb_timeouts = self.hotel_wait_timeouts.get(wait_name)
+            parts = []
+            if durations:
+                parts.append(
+                    "{} x {:.2f} s (max {:.2f} s)".format(len(durations), sum(durations) / len(durations), max(durations))
+                )
+            if nb_timeouts:
+                parts.append("{} délai(s) dépassé(s)".format(nb_timeouts))
+            if parts:
+                summaries.append("{} : {}".format(wait_name, ", ".join(parts)))
+        return ", ".join(summaries)
+
+    # Page de validation de l'appareil (code reçu par email), affichée à la connexion d'un navigateur inconnu
+    @property
+    def device_url(self):
+        return urljoin(self.extranet_url, "Device")
+
     # Accès à la page d'accueil du site D-Edge
     def go_to_home_page(self):
-        self.driver.get("https://login.availpro.com/")
+        self.current_planning = None
+        self.driver.get(self.login_url)
 
     # Connexion au compte D-Edge de l'hôtel avec création du cookie en option
+    @tracing.traced("login")
     def login(self, username, password, create_cookie=False, worker=None):
+        # Chargement du cookie jar du compte : si la session qu'il contient est encore valide, le formulaire de connexion est inutile
+        if self.restore_session(username, worker):
+            return
+
         if worker is not None:
             current_url = self.driver.current_url
 
             # Connexion
             message = f"{username} : Connexion au compte D-Edge"
             worker.emit_signals(message, message)
-            self.driver.find_element_by_xpath('//*[@id="text-id-login"]').send_keys(
-                username
-            )  # Entrer l'identifiant de l'hôtel
-            self.driver.find_element_by_xpath('//*[@id="input-password"]').send_keys(password)  # Entrer le mot de passe
-            self.driver.find_element_by_xpath('//input[@value="Login"]').click()  # Cliquer sur le bouton connecter
+            self.fill_login_form(username, password, worker)
 
             # [Explicit wait]
-            while current_url == self.driver.current_url:
-                worker.exit_if_interruption_requested()
+            self.wait_for_page_change(current_url, worker=worker)
 
             # Check si le cookie a déjà été créé
-            if "https://extranet.availpro.com/Device" not in self.driver.current_url:
+            if self.device_url not in self.driver.current_url:
+                # Mise à jour du cookie jar avec les cookies de la nouvelle session
+                if create_cookie:
+                    self.save_cookies(username)
                 return
 
+            # Le code reçu par email ne peut pas être saisi dans un navigateur sans fenêtre
+            if self.headless:
+                raise Exception(self.headless_device_error_message(username))
+
             # Attendre à l'infini tant que le code n'a pas été entré (permet de mettre un implicit wait plus petit car ce dernier n'est pas utilisé pour cette tâche) [Explicit wait]
             worker.emit_signals("{} : Veuillez entrer le mot de passe reçu par email".format(username))
-            while "https://extranet.availpro.com/Device" in self.driver.current_url:
-                time.sleep(1)
-                worker.exit_if_interruption_requested()
-                ###
-                ### Entrer manuellement le code reçu par email###
-                ###
+            ###
+            ### Entrer manuellement le code reçu par email###
+            ###
+            self.wait_for_device_validation(worker)
 
             # Check si besoin de créer le cookie
             if create_cookie:
                 # On s'assure d'être dans la page principale en exécutant une requête inutile après la connexion pour garantir la récupération du cookie
                 # -> sanity check personnel (pas nécessaire normalement)
-                self.driver.find_element_by_xpath('//a[@data-name="PriceAndPlanningSection"]')
-
-                # Retour à la page d'accueil pour pouvoir créer le cookie
-                self.go_to_home_page()
+                self.find_element(
+                    '//a[@data-name="PriceAndPlanningSection"]',
+                    "home page",
+                    worker=worker,
+                    description="page d'accueil",
+                )
 
-                # Création du cookie
+                # Création du cookie jar du compte (tous les domaines D-Edge sont récupérés d'un coup, inutile de revenir à la page d'accueil
+                # et de se reconnecter comme avec l'ancien fichier de cookies commun)
                 message = "{} : Création du cookie".format(username)
                 worker.emit_signals(message, message)
-                with open(self.cookies_path, "wb") as cookies_file:
-                    pickle.dump(self.driver.get_cookies(), cookies_file)
+                self.save_cookies(username)
                 message = "{} : Cookie créé".format(username)
                 worker.emit_signals(message, message)
 
-                # Reconnexion
-                self.login(
-                    username, password, create_cookie=True, worker=worker
-                )  # create_cookie=True non nécessaire normalement
-
         else:
             current_url = self.driver.current_url
 
             print("{} : Connexion au compte D-Edge".format(username))
-            self.driver.find_element_by_xpath('//*[@id="text-id-login"]').send_keys(
-                username
-            )  # Entrer l'identifiant de l'hôtel
-            self.driver.find_element_by_xpath('//*[@id="input-password"]').send_keys(password)  # Entrer le mot de passe
-            self.driver.find_element_by_xpath('//input[@value="Login"]').click()  # Cliquer sur le bouton connecter
+            self.fill_login_form(username, password, worker)
 
             # [Explicit wait]
-            while current_url == self.driver.current_url:
-                pass
+            self.wait_for_page_change(current_url)
 
-            if "https://extranet.availpro.com/Device" not in self.driver.current_url:
+            if self.device_url not in self.driver.current_url:
+                if create_cookie:
+                    self.save_cookies(username)
                 return
 
+            if self.headless:
+                raise Exception(self.headless_device_error_message(username))
+
             # [Explicit wait]
             print("{} : Veuillez entrer le mot de passe reçu par email".format(username))
-            while "https://extranet.availpro.com/Device" in self.driver.current_url:
-                time.sleep(1)
+            self.wait_for_device_validation()
 
             if create_cookie:
-                self.driver.find_element_by_xpath('//a[@data-name="PriceAndPlanningSection"]')
-                self.go_to_home_page()
+                self.find_element(
+                    '//a[@data-name="PriceAndPlanningSection"]', "home page", description="page d'accueil"
+                )
                 print("{} : Création du cookie".format(username))
-                with open(self.cookies_path, "wb") as cookies_file:
-                    pickle.dump(self.driver.get_cookies(), cookies_file)
+                self.save_cookies(username)
                 print("{} : Cookie créé".format(username))
-                self.login(username, password, create_cookie=True)
+
+    # Saisie des identifiants dans le formulaire de connexion et validation
+    def fill_login_form(self, username, password, worker=None):
+        # Entrer l'identifiant de l'hôtel (le formulaire peut encore être en cours de chargement)
+        self.find_element(
+            '//*[@id="text-id-login"]', "login form", worker=worker, description="formulaire de connexion"
+        ).send_keys(username)
+        # Entrer le mot de passe
+        self.find_element(
+            '//*[@id="input-password"]', "login field", PROBE_TIMEOUTS, worker, "champ du mot de passe"
+        ).send_keys(password)
+        # Cliquer sur le bouton connecter
+        self.find_element(
+            '//input[@value="Login"]', "login field", PROBE_TIMEOUTS, worker, "bouton de connexion"
+        ).click()
+
+    # Remplacement des cookies du navigateur par le cookie jar du compte, puis réutilisation de la session si elle est encore valide
+    # Renvoie True si le compte est connecté (formulaire de connexion inutile)
+    def restore_session(self, username, worker=None):
+        # Suppression des cookies de tous les domaines (notamment la session d'un éventuel autre compte)
+        self.driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+
+        jar = self.cookie_store.load(username)
+        if jar is None:
+            # Aucun cookie jar pour ce compte : on utilise l'ancien fichier de cookies commun, s'il existe
+            if self.cookies_path is not None and os.path.exists(self.cookies_path):
+                self.add_cookies()
+            return False
+
+        self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": jar["cookies"]})
+        if not self.cookie_store.is_valid(jar):
+            return False
+
+        # Test de la session : la page d'accueil de l'extranet n'est accessible que si le compte est connecté
+        self.driver.get(self.extranet_url)
+        is_logged_in = (
+            self.device_url not in self.driver.current_url
+            and self.driver.current_url.startswith(self.extranet_url)
+            and self.driver.execute_script(
+                "return document.querySelector('a[data-name=\"PriceAndPlanningSection\"]') !== null;"
+            )
+        )
+        if is_logged_in:
+            message = f"{username} : Session encore valide, connexion directe"
+            if worker is not None:
+                worker.emit_signals(message, message)
+            else:
+                print(message)
+            return True
+
+        # Session expirée : retour au formulaire de connexion (les cookies d'appareil du jar évitent tout de même le code par email)
+        self.go_to_home_page()
+        return False
+
+    # Sauvegarde de tous les cookies D-Edge du navigateur dans le cookie jar du compte
+    def save_cookies(self, username):
+        cookies = self.driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        hosts = [urlsplit(url).hostname for url in (self.login_url, self.extranet_url)]
+        self.cookie_store.save(
+            username,
+            [cookie for cookie in cookies if any(self.cookie_matches_host(cookie, host) for host in hosts)],
+        )
+
+    # Un cookie de domaine ".availpro.com" est envoyé à login.availpro.com comme à extranet.availpro.com
+    @staticmethod
+    def cookie_matches_host(cookie, host):
+        domain = cookie["domain"].lstrip(".")
+        return host == domain or host.endswith("." + domain)
+
+    # Attente infinie de la saisie manuelle du code reçu par email
+    def wait_for_device_validation(self, worker=None):
+        self.wait_until(
+            lambda: self.device_url not in self.driver.current_url,
+            "device validation",
+            timeout=None,
+            worker=worker,
+            max_interval=1,
+        )
+
+    @staticmethod
+    def headless_device_error_message(username):
+        return (
+            "{} : Le code reçu par email ne peut pas être saisi en mode sans fenêtre. "
+            'Lancez une fois le pricing avec "headless": false pour créer le cookie'.format(username)
+        )
 
     def add_cookies(self):
         # Ouverture du fichier de cookies s'il n'est pas vide
-        if os.path.getsize(self.cookies_path) > 0:
+        with COOKIES_LOCK:
+            if os.path.getsize(self.cookies_path) == 0:
+                return
             with open(self.cookies_path, "rb") as cookies_file:
                 cookies = pickle.load(cookies_file)
-                for cookie in cookies:
-                    ###Bout de code à ajouter sous selenium 4 pour ne pas avoir d'erreur (vérifier au fur et à mesure du temps si c'est juste une erreur temporaire)
-                    if "sameSite" in cookie:
-                        if cookie["sameSite"] == "None":
-                            cookie["sameSite"] = "Strict"
-                    ###
-                    self.driver.add_cookie(cookie)
 
-    @staticmethod
-    def format_price(raw_price, temp_date):
-        if isinstance(raw_price, int):
-            good_price = str(raw_price)
-        elif isinstance(raw_price, float):
-            # Si le nombre décimal est en fait un entier qui a été converti en float TERMINANT PAR .0 par le fichier excel ou par pandas, on le reconvertit en entier sans renvoyer d'erreur
-            if raw_price.is_integer():
-                good_price = str(int(raw_price))
-            # Si le nombre décimal est en fait un entier qui a été converti en float TERMINANT PAR .99... par le fichier excel ou par pandas, on le reconvertit en entier sans renvoyer d'erreur
-            elif abs(round(raw_price) - raw_price) < 0.00001:
-                good_price = str(round(raw_price))
-            else:
-                raise TypeError(
-                    "Le prix {} à la date {} est un nombre décimal. Veuillez entrer un nombre entier".format(
-                        raw_price, temp_date.strftime("%d/%m/%Y")
-                    )
-                )
-        elif isinstance(raw_price, str):
-            # On remplace les virgules par des points, s'il y a lieu, pour faciliter une éventuelle conversion en nombre entier
-            raw_price = raw_price.replace(",", ".")
-            try:
-                floated_price = float(raw_price)
-                if floated_price.is_integer():
-                    good_price = str(int(floated_price))
-                else:
-                    raise TypeError(
-                        "Le prix {} à la date {} est un nombre décimal. Veuillez entrer un nombre entier".format(
-                            raw_price, temp_date.strftime("%d/%m/%Y")
-                        )
-                    )
-            except:
-                raise TypeError(
-                    "Le prix {} à la date {} est de type {}. Veuillez entrer un nombre entier".format(
-                        raw_price, temp_date.strftime("%d/%m/%Y"), type(raw_price)
-                    )
-                )
-        else:
-            raise TypeError(
-                "Le prix {} à la date {} est de type {}. Veuillez entrer un nombre entier".format(
-                    raw_price, temp_date.strftime("%d/%m/%Y"), type(raw_price)
-                )
+        for cookie in cookies:
+            ###Bout de code à ajouter sous selenium 4 pour ne pas avoir d'erreur (vérifier au fur et à mesure du temps si c'est juste une erreur temporaire)
+            if "sameSite" in cookie:
+                if cookie["sameSite"] == "None":
+                    cookie["sameSite"] = "Strict"
+            ###
+            self.driver.add_cookie(cookie)
+
+    # Conversion du libellé de date de la grille (ex : "18 oct. 2026") en date
+    def parse_date_label(self, date_label):
+        day, month, year = date_label.split()
+        return dt.date(int(year), self.months_dict[month], int(day))
+
+    # Lecture de la grille de prix en une seule requête : renvoie la date de début de la page et le dictionnaire date -> prix D-Edge
+    @tracing.traced("grid read")
+    def read_price_grid(self, worker=None):
+        grid = self.wait_until(
+            lambda: self.driver.execute_script(PRICE_GRID_READ_SCRIPT),
+            "price grid loaded",
+            worker=worker,
+            description="chargement de la grille de prix",
+        )
+        window_start = self.parse_date_label(grid["dateLabel"])
+        grid_prices = {window_start + dt.timedelta(days=day): price for day, price in enumerate(grid["prices"])}
+        return window_start, grid_prices
+
+    # Ecriture groupée des prix modifiés de la page (indice du jour -> prix), puis enregistrement unique de la page
+    def write_price_grid(self, price_changes, worker=None):
+        written = self.driver.execute_script(
+            PRICE_GRID_WRITE_SCRIPT, {str(day): price for day, price in price_changes.items()}
+        )
+        if written != len(price_changes):
+            raise Exception(
+                "Seuls {} prix sur {} ont pu être saisis dans la grille de prix".format(written, len(price_changes))
             )
 
-        return good_price
+        # Enregistrement des modifications (on attend que l'enregistrement soit bien effectué avant de changer de page ou d'hôtel)
+        with tracing.span("savePlanning", nb_prices=len(price_changes)):
+            self.wait_for_element_enabled('//*[@name="savePlanning"]', worker=worker).click()
+            self.wait_for_save_confirmed(worker=worker)
 
-    def check_prices(
-        self,
-        hotel_is_alone,
-        room_type,
-        price_type,
-        beg_date,
-        end_date,
-        df_prices,
-        method="no-edit",
-        hotel_name=None,
-        worker=None,
-    ):
-        hotel_name = hotel_name if hotel_name else "NO-HOTEL-NAME"
+    # Recherche, dans l'URL de la page et dans les liens de navigation, du paramètre d'URL portant une date
+    # Renvoie (URL de référence, nom du paramètre, format de la date) ou False si aucun paramètre n'a été trouvé
+    @staticmethod
+    def find_date_url_parameter(urls):
+        for url in urls:
+            for name, value in parse_qsl(urlsplit(url).query):
+                for date_format in DATE_URL_FORMATS:
+                    try:
+                        dt.datetime.strptime(value, date_format)
+                    except ValueError:
+                        continue
+                    return url, name, date_format
+        return False
 
-        # Cas anormal où la date de début est supérieure à la date de fin
-        if beg_date > end_date:
-            raise Exception(
-                "La date de début ({}) est supérieure à la date de fin ({})".format(
-                    beg_date.strftime("%d/%m/%Y"), end_date.strftime("%d/%m/%Y")
+    @staticmethod
+    def build_date_url(url, name, date_format, target_date):
+        url_parts = urlsplit(url)
+        query = [
+            (key, target_date.strftime(date_format) if key == name else value)
+            for key, value in parse_qsl(url_parts.query, keep_blank_values=True)
+        ]
+        return urlunsplit(url_parts._replace(query=urlencode(query)))
+
+    # Ouverture directe de la page de planning commençant à target_date, en un seul chargement de page
+    # Renvoie la date de début de la page obtenue, ou None si le saut n'est pas possible (on revient alors à la page de départ)
+    def jump_to_date(self, target_date, page_state, worker=None):
+        if self.date_url_parameter is None:
+            self.date_url_parameter = self.find_date_url_parameter(page_state["urls"])
+        if not self.date_url_parameter:
+            return None
+
+        reference_url, name, date_format = self.date_url_parameter
+        # On part de préférence de l'URL courante, pour conserver tous les paramètres de la page (hôtel, chambre, prix...)
+        current_url = page_state["urls"][0]
+        if name in dict(parse_qsl(urlsplit(current_url).query)):
+            reference_url = current_url
+        self.driver.get(self.build_date_url(reference_url, name, date_format, target_date))
+
+        # Unique vérification du libellé de la date (et de la grille sélectionnée) après le saut
+        new_page_state = self.wait_until(
+            lambda: self.driver.execute_script(PAGE_STATE_SCRIPT),
+            "page loaded",
+            worker=worker,
+            description="chargement de la page du {}".format(target_date.strftime("%d/%m/%Y")),
+        )
+        new_date = self.parse_date_label(new_page_state["dateLabel"])
+        same_grid = (new_page_state["room"], new_page_state["rate"]) == (page_state["room"], page_state["rate"])
+        if same_grid and 0 <= (target_date - new_date).days < 14:
+            return new_date
+
+        # Le site n'a pas pris en compte le paramètre (ou a perdu la grille sélectionnée) : retour à la page de départ et
+        # abandon du saut direct pour le reste de la session
+        self.date_url_parameter = False
+        self.driver.back()
+        self.wait_for_page_change(new_page_state["urls"][0], worker=worker)
+        return None
+
+    # Accès à la page contenant target_date (commençant exactement à target_date si 'align' et si le saut direct est possible)
+    # Renvoie la date de début de la page obtenue
+    @tracing.traced("date navigation")
+    def go_to_date(self, target_date, worker=None, align=True):
+        page_state = self.wait_until(
+            lambda: self.driver.execute_script(PAGE_STATE_SCRIPT),
+            "page loaded",
+            worker=worker,
+            description="chargement de la page de planning",
+        )
+        current_date = self.parse_date_label(page_state["dateLabel"])
+        if current_date == target_date or (not align and 0 <= (target_date - current_date).days < 14):
+            return current_date
+
+        # Saut direct vers la page (URL construite à partir du paramètre de date de la page)
+        new_date = self.jump_to_date(target_date, page_state, worker)
+        if new_date is not None:
+            return new_date
+
+        # A défaut, navigation de proche en proche (liens des mois, puis boutons '14j. précédents/suivants')
+        current_date = self.read_page_date(worker)
+        months_xpath = '//div[@class="months"]/a'
+
+        # Atteindre la page où se situe target_date
+        while not (0 <= (target_date - current_date).days < 14):
+            if worker is not None:
+                worker.exit_if_interruption_requested()
+
+            current_url = self.driver.current_url
+
+            # La page est déjà chargée (date lue) : les liens de navigation sont recherchés avec un délai court
+            if target_date.year != current_date.year or not -5 <= target_date.month - current_date.month <= 6:
+                month_links = self.find_elements(
+                    months_xpath, "navigation link", PROBE_TIMEOUTS, worker, "liens des mois"
                 )
-            )
+                month_links[0 if target_date < current_date else -1].click()
+            elif target_date.month != current_date.month:
+                target_date_month_in_letters = self.reverse_months_dict[target_date.month]
+                self.find_element(
+                    '{}[text()="{}"]'.format(months_xpath, target_date_month_in_letters),
+                    "navigation link",
+                    PROBE_TIMEOUTS,
+                    worker,
+                    "lien du mois",
+                ).click()
+            elif target_date < current_date:
+                self.find_element(
+                    '//span[@class="prevnext"]/a[text()="14j. précédents"]',
+                    "navigation link",
+                    PROBE_TIMEOUTS,
+                    worker,
+                    "bouton '14j. précédents'",
+                ).click()
+            else:
+                self.find_element(
+                    '//span[@class="prevnext"]/a[text()="14j. suivants"]',
+                    "navigation link",
+                    PROBE_TIMEOUTS,
+                    worker,
+                    "bouton '14j. suivants'",
+                ).click()
+
+            # Sanity check : on attend bien que la nouvelle page s'affiche (via vérification de l'URL) avant de récupérer la nouvelle date [Explicit wait]
+            self.wait_for_page_change(current_url, worker=worker)
 
+            # Mise à jour de la date en cours
+            current_date = self.read_page_date(worker)
+
+        return current_date
+
+    # Date de début de la page de planning affichée (attente du libellé de la date si la page est en cours de chargement)
+    def read_page_date(self, worker=None):
+        page_state = self.wait_until(
+            lambda: self.driver.execute_script(PAGE_STATE_SCRIPT),
+            "page loaded",
+            worker=worker,
+            description="chargement de la page de planning",
+        )
+        return self.parse_date_label(page_state["dateLabel"])
+
+    # Ouverture de la grille de prix (hôtel, type de chambre, type de prix) dans la section Prix et Planning
+    @tracing.traced("hotel selection")
+    def open_planning(self, hotel_is_alone, room_type, price_type, hotel_name, worker=None):
+        self.current_planning = None
         message = f"{hotel_name} : Accès à l'interface de prix"
         if worker is not None:
             worker.emit_signals(message, message)
@@ -266,9 +786,19 @@ class DedgeBot:
 
         if not hotel_is_alone:
             if hotel_name != "NO-HOTEL-NAME":
-                self.driver.find_element_by_xpath('//a[@class="header-hotel-selector__value"]').click()
-                self.driver.find_element_by_xpath(
-                    '//a[@class="header-hotel-selector__result__item" and text()[contains(., "{}")]]'.format(hotel_name)
+                self.find_element(
+                    '//a[@class="header-hotel-selector__value"]',
+                    "home page",
+                    worker=worker,
+                    description="sélecteur d'hôtel",
+                ).click()
+                # Un hôtel absent de la liste (nom mal renseigné dans les ids) est signalé en quelques secondes
+                self.find_element(
+                    '//a[@class="header-hotel-selector__result__item" and text()[contains(., "{}")]]'.format(hotel_name),
+                    "hotel item",
+                    PROBE_TIMEOUTS,
+                    worker,
+                    "hôtel '{}' dans la liste des hôtels du compte".format(hotel_name),
                 ).click()
             else:
                 raise Exception("Veuillez renseigner le nom de l'hôtel pour assurer le bon fonctionnement du pricing")
@@ -277,64 +807,122 @@ class DedgeBot:
             worker.exit_if_interruption_requested()
 
         # Aller à la section Prix et Planning
-        self.driver.find_element_by_xpath('//a[@data-name="PriceAndPlanningSection"]').click()
+        self.find_element(
+            '//a[@data-name="PriceAndPlanningSection"]',
+            "home page",
+            worker=worker,
+            description="section Prix et Planning",
+        ).click()
 
         if worker is not None:
             worker.exit_if_interruption_requested()
 
         # Cliquer sur un prix pour accéder à l'interface de prix
-        self.driver.find_element_by_xpath('//table[@class="room"]//tr[@class="price"]/td[3]').click()
+        self.find_element(
+            '//table[@class="room"]//tr[@class="price"]/td[3]',
+            "planning overview",
+            worker=worker,
+            description="grille des prix",
+        ).click()
 
         if worker is not None:
             worker.exit_if_interruption_requested()
 
-        # Sélectionner la grille de référence
+        # Sélectionner la grille de référence (une fois les sélecteurs chargés, un type mal renseigné dans les ids est signalé
+        # en quelques secondes)
+        self.find_element('//*[@id="roomSelector"]', "planning page", worker=worker, description="sélecteur de chambre")
         ##Sélectionner le type de chambre
-        self.driver.find_element_by_xpath('//*[@id="roomSelector"]/option[text()="{}"]'.format(room_type)).click()
+        self.find_element(
+            '//*[@id="roomSelector"]/option[text()="{}"]'.format(room_type),
+            "grid option",
+            PROBE_TIMEOUTS,
+            worker,
+            "type de chambre '{}'".format(room_type),
+        ).click()
         ##Sélectionner le type de prix
-        self.driver.find_element_by_xpath('//*[@id="rateSelector"]/option[text()="{}"]'.format(price_type)).click()
+        self.find_element(
+            '//*[@id="rateSelector"]/option[text()="{}"]'.format(price_type),
+            "grid option",
+            PROBE_TIMEOUTS,
+            worker,
+            "type de prix '{}'".format(price_type),
+        ).click()
 
         if worker is not None:
             worker.exit_if_interruption_requested()
 
-        # Récupérer la date en cours
-        current_date = self.driver.find_element_by_class_name("dateLabel").text
-        day, month, year = current_date.split()
-        current_date = dt.date(int(year), self.months_dict[month], int(day))
+        self.current_planning = (hotel_name, room_type, price_type)
 
-        # Atteindre la page où se situe la beg_date
-        while not (0 <= (beg_date - current_date).days < 14):
-            if worker is not None:
-                worker.exit_if_interruption_requested()
+    def check_prices(
+        self,
+        hotel_is_alone,
+        room_type,
+        price_type,
+        beg_date,
+        end_date,
+        prices,
+        method="no-edit",
+        hotel_name=None,
+        worker=None,
+        skippable_dates=None,
+        on_window_synced=None,
+    ):
+        # skippable_dates : dates dont le prix n'a pas changé depuis le dernier envoi (voir PriceSnapshotStore), les pages qui ne
+        # contiennent que de telles dates ne sont pas visitées
+        # on_window_synced : fonction appelée avec les prix (date -> prix) de chaque page dont les prix D-Edge sont à jour (méthode
+        # "edit" uniquement : en "no-edit", rien n'est écrit sur D-Edge)
+        # Renvoie un résumé du pricing (jours traités, pages visitées, prix modifiés ou différences constatées)
+        hotel_name = hotel_name if hotel_name else "NO-HOTEL-NAME"
+        self.hotel_wait_durations.clear()
+        self.hotel_wait_timeouts.clear()
 
-            current_url = self.driver.current_url
+        if method not in ["edit", "no-edit"]:
+            raise Exception("Méthode de pricing inconnue : '{}' (edit ou no-edit)".format(method))
 
-            if beg_date.year < current_date.year:
-                self.driver.find_elements_by_xpath('//div[@class="months"]/a')[0].click()
-            elif beg_date.year > current_date.year:
-                self.driver.find_elements_by_xpath('//div[@class="months"]/a')[-1].click()
-            elif beg_date.month - current_date.month < -5:
-                self.driver.find_elements_by_xpath('//div[@class="months"]/a')[0].click()
-            elif beg_date.month - current_date.month > 6:
-                self.driver.find_elements_by_xpath('//div[@class="months"]/a')[-1].click()
-            elif beg_date.month != current_date.month:
-                beg_date_month_in_letters = self.reverse_months_dict[beg_date.month]
-                self.driver.find_element_by_xpath(
-                    '//div[@class="months"]/a[text()="{}"]'.format(beg_date_month_in_letters)
-                ).click()
-            elif beg_date < current_date:
-                self.driver.find_element_by_xpath('//span[@class="prevnext"]/a[text()="14j. précédents"]').click()
+        # Cas anormal où la date de début est supérieure à la date de fin
+        if beg_date > end_date:
+            raise Exception(
+                "La date de début ({}) est supérieure à la date de fin ({})".format(
+                    beg_date.strftime("%d/%m/%Y"), end_date.strftime("%d/%m/%Y")
+                )
+            )
+
+        # Toutes les dates manquantes du calendrier de prix sont signalées d'un coup, avant tout accès au navigateur
+        missing_dates = utils.find_missing_dates(prices, beg_date, end_date)
+        if missing_dates:
+            raise Exception(
+                "Les dates suivantes ne sont pas dans le fichier de prix. Veuillez vérifier votre fichier Excel : {}".format(
+                    ", ".join(date.strftime("%d/%m/%Y") for date in missing_dates)
+                )
+            )
+
+        # Dates à traiter
+        nb_days = (end_date - beg_date).days + 1
+        skippable_dates = skippable_dates if skippable_dates is not None else set()
+        pending_dates = [
+            date for date in (beg_date + dt.timedelta(days=i) for i in range(nb_days)) if date not in skippable_dates
+        ]
+        if not pending_dates:
+            message = f"{hotel_name} : Prix inchangés depuis le dernier envoi, aucune page à visiter"
+            if worker is not None:
+                worker.emit_signals(message, message)
+                worker.advance_progress(nb_days=nb_days)
             else:
-                self.driver.find_element_by_xpath('//span[@class="prevnext"]/a[text()="14j. suivants"]').click()
+                print(message)
+            return {"nb_days": nb_days, "nb_visited_pages": 0, "nb_changed_prices": 0, "nb_differences": 0}
 
-            # Sanity check : on attend bien que la nouvelle page s'affiche (via vérification de l'URL) avant de récupérer la nouvelle date [Explicit wait]
-            while current_url == self.driver.current_url:
-                pass
+        # Grille de prix déjà ouverte (même compte, même hôtel, mêmes types de chambre et de prix) : seules les dates changent
+        if self.current_planning == (hotel_name, room_type, price_type):
+            message = f"{hotel_name} : Interface de prix déjà ouverte"
+            if worker is not None:
+                worker.emit_signals(message, message)
+            else:
+                print(message)
+        else:
+            self.open_planning(hotel_is_alone, room_type, price_type, hotel_name, worker)
 
-            # Mise à jour de la date en cours
-            current_date = self.driver.find_element_by_class_name("dateLabel").text
-            day, month, year = current_date.split()
-            current_date = dt.date(int(year), self.months_dict[month], int(day))
+        # Atteindre la page où se situe la première date à traiter
+        current_date = self.go_to_date(pending_dates[0], worker)
 
         # Message de début du pricing
         message = f"{hotel_name} : Début du pricing"
@@ -344,141 +932,53 @@ class DedgeBot:
             print(message)
 
         date_idx = 0
-        nb_days = (end_date - beg_date).days + 1
-
-        # Insertion des prix Excel dans l'interface pour les dates comprises entre beg_date et end_date
-        if method == "edit":
-            any_modified_price = False
-            temp_date = beg_date
-            count = (temp_date - current_date).days
-            while temp_date <= end_date:
-                df_raw_price = df_prices.loc[df_prices["Date"] == temp_date, "Price"]
-                if not df_raw_price.empty:
-                    # Prix Excel
-                    raw_price = df_raw_price.item()
-                    good_price = self.format_price(raw_price, temp_date)
-
-                    # Prix D-Edge
-                    price_to_check = self.driver.find_element_by_xpath(
-                        '//tr[@type="RatePrice"]/td[@day="{}"]//input[@id="Price"]'.format(count)
-                    )
-                    price_to_check_value = price_to_check.get_attribute("value")
-
-                    # On clique sur le prix pour être bien sûr de faire apparaître le bouton d'enregistrement
-                    price_to_check.click()
-
-                    if good_price != price_to_check_value:
-                        price_to_check.send_keys(Keys.CONTROL + "a")
-                        price_to_check.send_keys(Keys.DELETE)
-                        price_to_check.send_keys(good_price)
-
-                        message = "{} : {} : Prix modifié : {} --> {}".format(
-                            hotel_name, temp_date.strftime("%d/%m/%Y"), price_to_check_value, good_price
-                        )
-                        if worker is not None:
-                            worker.emit_signals(log_list_widget_message=message)
-                        else:
-                            print(message)
-
-                        if not any_modified_price:
-                            any_modified_price = True
-                            # Si on n'a modifié que le dernier prix de la quatorzaine de jours, on clique sur le premier prix (ou n'importe lequel autre que le dernier) pour faire apparaître le bouton d'enregistrement
-                            if count == 13:
-                                self.driver.find_element_by_xpath(
-                                    '//tr[@type="RatePrice"]/td[@day="0"]//input[@id="Price"]'
-                                ).click()
-                else:
-                    raise Exception(
-                        "La date {} n'est pas dans le dataframe. Veuillez vérifier votre fichier Excel".format(
-                            temp_date.strftime("%d/%m/%Y")
-                        )
-                    )
-
-                date_idx += 1
-                message = "{} : Pricing en cours ({}/{})".format(hotel_name, date_idx, nb_days)
+        next_date = beg_date  # Première date de la période non encore comptabilisée dans la progression
+        nb_visited_pages = 0
+        nb_changed_prices, nb_differences = 0, 0
+
+        # Traitement page par page (quatorzaine par quatorzaine) : la grille entière est lue en une seule requête, puis la comparaison
+        # avec les prix Excel se fait uniquement en local. Seuls les prix à modifier donnent lieu à des requêtes supplémentaires (méthode "edit")
+        while True:
+            window_start_time = tracing.clock()
+            window_start, grid_prices = self.read_price_grid(worker)
+
+            # Sanity check de la date
+            if window_start != current_date:
+                raise Exception("Une erreur s'est produite durant le changement de date")
+            nb_visited_pages += 1
+            window_end = window_start + dt.timedelta(days=13)
+
+            # Les dates ignorées depuis la page précédente sont comptabilisées d'un coup dans la progression
+            nb_skipped_days = (min(window_start, end_date + dt.timedelta(days=1)) - next_date).days
+            if nb_skipped_days > 0:
+                date_idx += nb_skipped_days
                 if worker is not None:
-                    # Mise à jour de la barre de progression et du label
-                    worker.date_idx += 1
-                    pct = int(worker.date_idx / worker.total_nb_days * 100)
-                    worker.emit_signals(message, progressbar_value=pct)
-
-                    worker.exit_if_interruption_requested()
-                else:
-                    print(message)
-
-                temp_date += dt.timedelta(days=1)
-                count += 1
-                if count == 14:
-                    if any_modified_price:
-                        # Enregistrement des modifications
-                        self.driver.find_element_by_name("savePlanning").click()
-
-                        # Réinitialisation du booléen indiquant si des prix ont été modifiés ou non sur la quatorzaine de jours
-                        any_modified_price = False
-
-                        # Gestion du moment précis auquel on doit cliquer sur le bouton '14j. suivants'
-                        ##Juste après avoir modifié au moins un prix (puis avoir cliqué n'importe où), tous les éléments permettant de passer à une autre date sont désactivés (leur code html contient disabled="disabled") jusqu'à ce que les prix soient bien enregistrés
-                        ##Ainsi, si l'on cherche un des ces éléments (ex: bouton '14j. suivants') durant ce processus et qu'on lance la méthode 'click', un comportement non souhaité se produit : selenium trouve l'élement et clique dessus (MAIS RIEN NE SE PASSE)
-                        ##--> l'implicit wait ne peut donc pas correctement faire son travail, i.e. attendre que le bouton devienne clickable avant de clicker, car il est toujours clickable (tout comme du texte l'est)!
-                        ##Toutes les solutions testées :
-                        ## Ce qui fonctionne :						- Attendre que le message "Les modifications ont bien été enregistrées. " apparaisse : driver.find_element_by_xpath('//span[text()="Les modifications ont bien été enregistrées. "]')
-                        ##											- Attendre que le bouton "Enregistré" apparaisse : code similaire à l'alternative précédente (pas testé mais doit fonctionner)
-                        ##											- Attendre que le bouton '14j. suivants' soit "activé" (dès que le mot-clé "disabled" disparaît) :
-                        ##					SOLUTION ACTUELLE -->		- driver.find_element_by_xpath('//span[@class="prevnext"]/a[text()="14j. suivants" and not(@disabled)]') (utilisation directe du xpath) (plus concis, plus propre, et certainement plus fiable)
-                        ##												- while element.get_attribute('disabled') != None: pass
-                        ##												- while driver.execute_script("return arguments[0].hasAttribute('disabled');", element): pass (en utilisant du code JS)(semble plus lent)(l'implicit wait peut faire son travail correctement)
-                        ## Ce qui ne fonctionne pas : 				- driver.execute_script("arguments[0].click()", element)
-                        ##											- ActionChains(driver).move_to_element(element).perform() puis element.click()
-                        ##											- while not element.is_enabled(): pass (voir documentation pour l'explication)
-                        ##											- idem pour element_to_be_clikable, active, ... car l'élément est bien clickable, c'est juste que rien ne se produit car il est disabled (grisé)
-                        ### en remplaçant, dans les codes ci-dessus, element par --> driver.find_element_by_xpath('//span[@class="prevnext"]/a[text()="14j. suivants"]')
-
-                    # Passage à la page suivante / Mise à jour de la date en cours : on clique sur le bouton suivant et on attend bien (via vérification de l'URL) que la nouvelle page s'affiche avant de récupérer la nouvelle date
-                    current_url = self.driver.current_url
-                    self.driver.find_element_by_xpath(
-                        '//span[@class="prevnext"]/a[text()="14j. suivants" and not(@disabled)]'
-                    ).click()
-                    while current_url == self.driver.current_url:
-                        pass
-
-                    # Sanity check de la date [Explicit wait]
-                    current_date_temp = self.driver.find_element_by_class_name("dateLabel").text
-                    day, month, year = current_date_temp.split()
-                    current_date_temp = dt.date(int(year), self.months_dict[month], int(day))
-                    if current_date_temp != current_date + dt.timedelta(days=14):
-                        raise Exception("Une erreur s'est produite durant le changement de date")
-
-                    current_date = current_date_temp
-
-                    # Réinitialisation du compteur
-                    count = 0
-
-            # On enregistre les modifications des dernières dates
-            if any_modified_price:
-                # On clique sur le dernier prix pour être sûr de faire apparaître le bouton d'enregistrement
-                self.driver.find_element_by_xpath('//tr[@type="RatePrice"]/td[@day="13"]//input[@id="Price"]').click()
-                self.driver.find_element_by_name("savePlanning").click()
-                # Par précaution, on attend que l'enregistrement soit bien effectué avant d'aller à la page d'accueil dans le cas où il y a plusieurs hôtels à pricer
-                self.driver.find_element_by_xpath('//span[text()="Les modifications ont bien été enregistrées. "]')
-
-        # Vérification des prix dans l'interface par comparaison aux prix Excel pour les dates comprises entre beg_date et end_date
-        elif method == "no-edit":
-            temp_date = beg_date
-            count = (temp_date - current_date).days
-            while temp_date <= end_date:
-                df_raw_price = df_prices.loc[df_prices["Date"] == temp_date, "Price"]
-                if not df_raw_price.empty:
-                    # Prix Excel
-                    raw_price = df_raw_price.item()
-                    good_price = self.format_price(raw_price, temp_date)
-
-                    # Prix D-Edge
-                    price_to_check = self.driver.find_element_by_xpath(
-                        '//tr[@type="RatePrice"]/td[@day="{}"]//input[@id="Price"]'.format(count)
-                    )
-                    price_to_check_value = price_to_check.get_attribute("value")
-
-                    if good_price != price_to_check_value:
+                    worker.advance_progress(nb_days=nb_skipped_days)
+            next_date = max(next_date, window_end + dt.timedelta(days=1))
+
+            # Prix à modifier sur la page (indice du jour -> prix Excel) et messages du registre associés
+            price_changes = {}
+            change_messages = []
+            for temp_date, price_to_check_value in grid_prices.items():
+                if not beg_date <= temp_date <= end_date:
+                    continue
+
+                # Prix Excel, déjà normalisé par utils.fetch_prices (accès direct par date, les dates manquantes ayant été vérifiées au préalable)
+                good_price = prices[temp_date]
+
+                # Comparaison avec le prix D-Edge lu dans la grille
+                if good_price != price_to_check_value:
+                    # Insertion du prix Excel dans l'interface (groupée pour toute la page, voir write_price_grid)
+                    if method == "edit":
+                        price_changes[(temp_date - window_start).days] = good_price
+                        change_messages.append(
+                            "{} : {} : Prix modifié : {} --> {}".format(
+                                hotel_name, temp_date.strftime("%d/%m/%Y"), price_to_check_value, good_price
+                            )
+                        )
+                    # Simple vérification des prix dans l'interface
+                    else:
+                        nb_differences += 1
                         message = "{} : {} : Prix D-Edge = {} != {} = Prix Excel".format(
                             hotel_name, temp_date.strftime("%d/%m/%Y"), price_to_check_value, good_price
                         )
@@ -486,45 +986,87 @@ class DedgeBot:
                             worker.emit_signals(log_list_widget_message=message)
                         else:
                             print(message)
-                else:
-                    raise Exception(
-                        "La date {} n'est pas dans le dataframe. Veuillez vérifier votre fichier Excel".format(
-                            temp_date.strftime("%d/%m/%Y")
-                        )
-                    )
 
                 date_idx += 1
                 message = "{} : Pricing en cours ({}/{})".format(hotel_name, date_idx, nb_days)
                 if worker is not None:
-                    # Mise à jour de la barre de progression et du label
-                    worker.date_idx += 1
-                    pct = int(worker.date_idx / worker.total_nb_days * 100)
-                    worker.emit_signals(message, progressbar_value=pct)
+                    # Mise à jour de la barre de progression (commune à toutes les sessions du pool) et du label
+                    worker.advance_progress(message)
 
                     worker.exit_if_interruption_requested()
                 else:
                     print(message)
 
-                temp_date += dt.timedelta(days=1)
-                count += 1
-                if count == 14:
-                    # Passage à la page suivante / Mise à jour de la date en cours : on clique sur le bouton suivant et on attend bien (via vérification de l'URL) que la nouvelle page s'affiche avant de récupérer la nouvelle date
-                    current_url = self.driver.current_url
-                    self.driver.find_element_by_xpath('//span[@class="prevnext"]/a[text()="14j. suivants"]').click()
-                    while current_url == self.driver.current_url:
-                        pass
-
-                    # Sanity check de la date [Explicit wait]
-                    current_date_temp = self.driver.find_element_by_class_name("dateLabel").text
-                    day, month, year = current_date_temp.split()
-                    current_date_temp = dt.date(int(year), self.months_dict[month], int(day))
-                    if current_date_temp != current_date + dt.timedelta(days=14):
-                        raise Exception("Une erreur s'est produite durant le changement de date")
-
-                    current_date = current_date_temp
-
-                    # Réinitialisation du compteur
-                    count = 0
+            if price_changes:
+                # Ecriture de tous les prix modifiés de la page en une fois, puis un unique enregistrement
+                self.unsaved_window = (hotel_name, window_start, len(price_changes))
+                self.write_price_grid(price_changes, worker)
+                self.unsaved_window = None
+                nb_changed_prices += len(price_changes)
+                for message in change_messages:
+                    if worker is not None:
+                        worker.emit_signals(log_list_widget_message=message)
+                    else:
+                        print(message)
+
+                # Gestion du moment précis auquel on doit cliquer sur le bouton '14j. suivants'
+                ##Juste après avoir modifié au moins un prix (puis avoir cliqué n'importe où), tous les éléments permettant de passer à une autre date sont désactivés (leur code html contient disabled="disabled") jusqu'à ce que les prix soient bien enregistrés
+                ##Ainsi, si l'on cherche un des ces éléments (ex: bouton '14j. suivants') durant ce processus et qu'on lance la méthode 'click', un comportement non souhaité se produit : selenium trouve l'élement et clique dessus (MAIS RIEN NE SE PASSE)
+                ##--> l'implicit wait ne peut donc pas correctement faire son travail, i.e. attendre que le bouton devienne clickable avant de clicker, car il est toujours clickable (tout comme du texte l'est)!
+                ##Toutes les solutions testées :
+                ## Ce qui fonctionne :						- Attendre que le message "Les modifications ont bien été enregistrées. " apparaisse : driver.find_element_by_xpath('//span[text()="Les modifications ont bien été enregistrées. "]')
+                ##											- Attendre que le bouton "Enregistré" apparaisse : code similaire à l'alternative précédente (pas testé mais doit fonctionner)
+                ##											- Attendre que le bouton '14j. suivants' soit "activé" (dès que le mot-clé "disabled" disparaît) :
+                ##												- driver.find_element_by_xpath('//span[@class="prevnext"]/a[text()="14j. suivants" and not(@disabled)]') (utilisation directe du xpath) (ancienne solution, dépend de l'implicit wait)
+                ##												- while element.get_attribute('disabled') != None: pass
+                ##					SOLUTION ACTUELLE -->		- while driver.execute_script("return arguments[0].hasAttribute('disabled');", element): pass (en utilisant du code JS) -> self.wait_for_element_enabled (recherche + test en une requête, avec backoff et délai max)
+                ##											  précédé de self.wait_for_save_confirmed pour s'assurer que l'enregistrement a bien abouti
+                ## Ce qui ne fonctionne pas : 				- driver.execute_script("arguments[0].click()", element)
+                ##											- ActionChains(driver).move_to_element(element).perform() puis element.click()
+                ##											- while not element.is_enabled(): pass (voir documentation pour l'explication)
+                ##											- idem pour element_to_be_clikable, active, ... car l'élément est bien clickable, c'est juste que rien ne se produit car il est disabled (grisé)
+                ### en remplaçant, dans les codes ci-dessus, element par --> driver.find_element_by_xpath('//span[@class="prevnext"]/a[text()="14j. suivants"]')
+
+            # Les prix D-Edge de la page sont désormais identiques aux prix Excel (prix modifiés enregistrés, ou déjà identiques)
+            if method == "edit" and on_window_synced is not None:
+                on_window_synced({date: prices[date] for date in grid_prices if beg_date <= date <= end_date})
+
+            # Durée du traitement de la page (lecture, comparaison, écriture et enregistrement), hors passage à la page suivante
+            tracing.record("window", window_start_time, hotel=hotel_name, start=window_start, nb_prices=len(price_changes))
+
+            # Prochaine date à traiter : s'il n'y en a plus, fin de la période à pricer
+            next_pending_idx = bisect.bisect_right(pending_dates, window_end)
+            if next_pending_idx == len(pending_dates):
+                break
+            next_pending_date = pending_dates[next_pending_idx]
+
+            # Passage à la page suivante : on clique sur le bouton suivant et on attend bien (via vérification de l'URL) que la nouvelle page s'affiche
+            if next_pending_date <= window_end + dt.timedelta(days=14):
+                current_url = self.driver.current_url
+                self.wait_for_element_enabled(
+                    '//span[@class="prevnext"]/a[text()="14j. suivants"]', worker=worker
+                ).click()
+                self.wait_for_page_change(current_url, worker=worker)
+                current_date = window_start + dt.timedelta(days=14)
+            # Sinon, les pages intermédiaires n'ont aucun prix modifié : on va directement à la page de la prochaine date à traiter
+            else:
+                self.wait_for_element_enabled('//span[@class="prevnext"]/a[text()="14j. suivants"]', worker=worker)
+                current_date = self.go_to_date(next_pending_date, worker)
+
+        # Progression des dernières dates ignorées
+        if next_date <= end_date and worker is not None:
+            worker.advance_progress(nb_days=(end_date - next_date).days + 1)
+
+        # Pages évitées grâce au snapshot des derniers prix envoyés
+        if skippable_dates:
+            nb_full_pass_pages = math.ceil(nb_days / 14)
+            message = "{} : {} page(s) évitée(s) sur {} (prix inchangés depuis le dernier envoi)".format(
+                hotel_name, max(0, nb_full_pass_pages - nb_visited_pages), nb_full_pass_pages
+            )
+            if worker is not None:
+                worker.emit_signals(log_list_widget_message=message)
+            else:
+                print(message)
 
         # Message de fin du pricing
         message = f"{hotel_name} : Pricing terminé"
@@ -533,6 +1075,72 @@ class DedgeBot:
         else:
             print(message)
 
+        # Durées des attentes de l'hôtel (ouverture du planning, chargements de pages, activation des boutons, enregistrements)
+        message = f"{hotel_name} : Attentes : {self.wait_summary()}"
+        if worker is not None:
+            worker.emit_signals(log_list_widget_message=message)
+        else:
+            print(message)
+
+        return {
+            "nb_days": nb_days,
+            "nb_visited_pages": nb_visited_pages,
+            "nb_changed_prices": nb_changed_prices,
+            "nb_differences": nb_differences,
+        }
+
+    # Fermeture du navigateur sans quitter le programme (utilisé pour les sessions secondaires d'un pool de bots)
+    def close(self):
+        if self.driver_has_already_been_created:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver_has_already_been_created = False
+
+    # Arrêt immédiat du navigateur depuis un autre thread, lorsque l'annulation du pricing reste bloquée dans une commande WebDriver
+    # (chargement de page, clic, script). driver.quit attendrait la fin de cette commande : on tue donc le driver et le navigateur
+    # qu'il a lancé, ce qui fait échouer aussitôt la commande en cours. Le navigateur est rouvert à la tâche suivante (voir
+    # ensure_browser_is_open)
+    def abort(self):
+        driver = getattr(self, "driver", None)
+        process = getattr(getattr(driver, "service", None), "process", None)
+        self.driver_has_already_been_created = False
+        if process is None or process.poll() is not None:
+            return
+        if sys.platform == "win32":
+            # /T : arbre complet des processus (le navigateur est un processus enfant du driver)
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True, creationflags=CREATE_NO_WINDOW
+            )
+        else:
+            # Equivalent de /T : le navigateur et ses processus enfants survivraient au driver (serveurs Linux du planificateur)
+            for pid in self.process_tree(process.pid)[1:]:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except OSError:
+                    pass
+            process.kill()
+
+    @staticmethod
+    def process_tree(pid):
+        # Processus pid suivi de tous ses descendants, d'après la table des processus donnée par ps (Linux, macOS). La liste est
+        # établie avant tout arrêt : les enfants d'un processus tué seraient rattachés à init et ne seraient plus retrouvés
+        try:
+            output = subprocess.run(["ps", "-A", "-o", "pid=,ppid="], capture_output=True, text=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return [pid]
+        children = defaultdict(list)
+        for line in output.splitlines():
+            child_pid, parent_pid = (int(value) for value in line.split())
+            children[parent_pid].append(child_pid)
+        tree, pending = [], [pid]
+        while pending:
+            current_pid = pending.pop()
+            tree.append(current_pid)
+            pending.extend(children[current_pid])
+        return tree
+
     # Delete the bot and return to the cmd
     def destroy(self):
         self.driver.quit()
@@ -0,0 +1,142 @@
+import os
+import re
+import json
+import subprocess
+import threading
+from typing import Optional
+
+try:
+    import winreg
+except ImportError:  # Hors Windows : la version du navigateur ne peut venir que de EDGE_VERSION
+    winreg = None
+
+# Clés de registre où Microsoft Edge indique sa version installée (installation utilisateur puis installation machine)
+EDGE_REGISTRY_KEYS = [
+    ("HKEY_CURRENT_USER", r"Software\Microsoft\Edge\BLBeacon"),
+    ("HKEY_LOCAL_MACHINE", r"Software\WOW6432Node\Microsoft\EdgeUpdate\Clients\{56EB18F8-B008-4CBD-B6D2-8C97FE7E9062}"),
+    ("HKEY_LOCAL_MACHINE", r"Software\Microsoft\EdgeUpdate\Clients\{56EB18F8-B008-4CBD-B6D2-8C97FE7E9062}"),
+]
+
+VERSION_PATTERN = re.compile(r"(\d+)\.(\d+)\.(\d+)\.(\d+)")
+
+# Verrou partagé par toutes les instances : les sessions d'un pool de bots résolvent le même driver
+RESOLVE_LOCK = threading.Lock()
+
+
+class DriverResolver:
+    """
+    Resolution of the Edge driver binary, with a local cache persisted between launches
+
+    - the cached driver is reused as long as it exists and its major version matches the installed browser
+    - the driver is only downloaded (webdriver_manager) when there is no usable cached driver
+    - without network access, the last cached driver is still used rather than failing at startup
+    """
+
+    def __init__(self, cache_path: str, default_browser_version: Optional[str] = None) -> None:
+        self.cache_path = cache_path
+        self.default_browser_version = default_browser_version  # Version renseignée à la main (constants.EDGE_VERSION)
+        self.driver_path = None  # Driver déjà résolu pendant cette exécution
+
+    @staticmethod
+    def major(version: Optional[str]) -> Optional[str]:
+        match = VERSION_PATTERN.search(version or "")
+        return match.group(1) if match else None
+
+    def browser_version(self) -> Optional[str]:
+        """
+        Get the version of the installed Microsoft Edge browser (None if it cannot be found)
+        """
+        if winreg is not None:
+            for hive, key in EDGE_REGISTRY_KEYS:
+                for value_name in ["version", "pv"]:
+                    try:
+                        with winreg.OpenKey(getattr(winreg, hive), key) as registry_key:
+                            version = winreg.QueryValueEx(registry_key, value_name)[0]
+                    except OSError:
+                        continue
+                    if VERSION_PATTERN.search(version):
+                        return version
+        return self.default_browser_version
+
+    @staticmethod
+    def driver_version(driver_path: str) -> Optional[str]:
+        """
+        Get the version of a driver binary by running it (None if it is missing or cannot be run)
+        """
+        if not os.path.isfile(driver_path):
+            return None
+        try:
+            output = subprocess.run(
+                [driver_path, "--version"],
+                capture_output=True,
+                text=True,
+                timeout=10,
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+            ).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+        match = VERSION_PATTERN.search(output)
+        return match.group(0) if match else None
+
+    def load(self) -> dict:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, cache: dict) -> None:
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as cache_file:
+            json.dump(cache, cache_file, indent=4)
+        os.replace(temp_path, self.cache_path)
+
+    def resolve(self) -> str:
+        """
+        Return the path of a driver matching the installed browser, downloading it only if the cached one cannot be used
+        """
+        with RESOLVE_LOCK:
+            if self.driver_path is not None:
+                return self.driver_path
+
+            browser_version = self.browser_version()
+            cache = self.load()
+            cached_path = cache.get("driver_path")
+            cached_version = self.driver_version(cached_path) if cached_path else None
+
+            # Driver en cache utilisable : aucun accès réseau
+            if cached_version is not None and (
+                browser_version is None or self.major(cached_version) == self.major(browser_version)
+            ):
+                self.driver_path = cached_path
+                return cached_path
+
+            try:
+                from webdriver_manager.microsoft import EdgeChromiumDriverManager
+
+                if browser_version is not None:
+                    driver_path = EdgeChromiumDriverManager(version=browser_version).install()
+                else:
+                    driver_path = EdgeChromiumDriverManager().install()
+            except Exception as e:
+                # Pas de réseau (ou version introuvable) : on se rabat sur le dernier driver connu, même d'une autre version
+                if cached_version is not None:
+                    self.driver_path = cached_path
+                    return cached_path
+                raise Exception(
+                    "Impossible de télécharger le driver de Microsoft Edge et aucun driver n'est disponible localement ({})".format(e)
+                )
+
+            self.save(
+                {
+                    "driver_path": driver_path,
+                    "driver_version": self.driver_version(driver_path),
+                    "browser_version": browser_version,
+                }
+            )
+            self.driver_path = driver_path
+            return driver_path
@@ -1,6 +1,6 @@
 import os
+import functools
 import datetime as dt
-import pandas as pd
 from PySide2.QtWidgets import (
     QWidget,
     QTabWidget,
@@ -10,18 +10,31 @@ from PySide2.QtWidgets import (
     QScrollArea,
     QGroupBox,
     QRadioButton,
+    QCheckBox,
     QLabel,
-    QListWidget,
-    QListWidgetItem,
-    QFrame,
-)  # QAbstractItemView, QCheckBox
-from PySide2.QtCore import Qt, QThread
-from PySide2.QtGui import QColor  # QFont, QTextCharFormat
+    QListView,
+)  # QAbstractItemView
+from PySide2.QtCore import Qt, QThread, QTimer
 from . import worker
 from . import customized_widgets as cw
+from .bot_pool import BotPool
+from .price_cache import PriceCache
+from .price_snapshots import PriceSnapshotStore
+from .config_store import ConfigStore, HotelConfig
+from .run_journal import RunJournal
+from . import registry
 from constants import ROOT_PATH, SETTINGS_DICT, APP_NAME, Version
 
 
+# Styles construits une seule fois puis réutilisés pour chaque message (le parsing d'une feuille de style Qt est coûteux)
+PROGRESSBAR_ERROR_STYLE_SHEET = "QProgressBar::chunk {background-color: red;}"
+
+
+@functools.lru_cache(maxsize=None)
+def label_style_sheet(color: str) -> str:
+    return "QLabel { color : %s; }" % color
+
+
 class Hpm(QWidget):
     def __init__(self, bot=None, desktop_size=None, version: Version = Version.FREE) -> None:
         super().__init__()
@@ -30,12 +43,14 @@ class Hpm(QWidget):
         # Main settings
         self.bot = bot
         self.today = dt.date.today()
+        self.ids_loaded = False  # Ids chargés en arrière-plan (voir load_ids)
         self.load_settings()
-        self.df_ids = pd.read_excel(self.ids_path, keep_default_na=False)
-        self.update_lists()
+        self.bot_pool = BotPool(bot, self.pool_size) if bot is not None else None
         self.handle_version(version)
+        self.update_lists()  # Listes vides tant que les ids ne sont pas chargés en arrière-plan (voir load_ids)
 
         self.build_widgets()
+        self.load_ids()
 
     def build_widgets(self) -> None:
         self.main_layout = QVBoxLayout(self)  # Window main layout
@@ -86,15 +101,56 @@ class Hpm(QWidget):
         self.edit_option = QRadioButton("Modifier")
         self.edit_option.setChecked(True)  # Bouton "Modifier" sélectionné par défaut
 
+        # Option pour revisiter toutes les pages, y compris celles dont les prix n'ont pas changé depuis le dernier envoi
+        self.full_pass_option = QCheckBox("Passage complet")
+        self.full_pass_option.setToolTip(
+            "Vérifier toutes les pages, même celles dont les prix n'ont pas changé depuis le dernier envoi"
+        )
+
         # Création du bouton 'Lancer'
-        self.run_pricing_button = cw.CustomPushButton("Lancer", self.run_pricing, "Lancer le pricing")
+        self.run_pricing_button = cw.CustomPushButton("Lancer", lambda *args: self.run_pricing(), "Lancer le pricing")
+
+        # Création du bouton 'Reprendre', actif uniquement si le dernier pricing (méthode "Modifier") n'a pas abouti
+        self.resume_pricing_button = cw.CustomPushButton(
+            "Reprendre",
+            lambda *args: self.run_pricing(resume=True),
+            "Reprendre le dernier pricing interrompu là où il s'est arrêté (hôtels et pages déjà enregistrés ignorés)",
+        )
 
         ## Section 'Registre'
         # Création d'une groupbox 'Registre' qui stocke et affiche toutes les étapes importantes
+        # Vue sur le modèle borné du registre (voir registry.RegistryModel) : seules les lignes visibles sont dessinées
         self.log_groupbox = QGroupBox("Registre")
         self.log_vlayout = QVBoxLayout()
-        self.log_list_widget = QListWidget()
-        self.log_vscroll_bar = self.log_list_widget.verticalScrollBar()  # QListWidget contient une scroll bar par défaut
+        self.registry_filter_model = registry.RegistryFilterModel(self)
+        self.registry_filter_model.setSourceModel(self.registry_model)
+        self.log_list_view = QListView()
+        self.log_list_view.setModel(self.registry_filter_model)
+        self.log_list_view.setItemDelegate(registry.RegistryDelegate(self.log_list_view))
+        self.log_list_view.setUniformItemSizes(True)
+        self.log_vscroll_bar = self.log_list_view.verticalScrollBar()  # QListView contient une scroll bar par défaut
+
+        # Filtres du registre par hôtel (hôtels ajoutés au fil des messages) et par gravité
+        self.log_filter_hlayout = QHBoxLayout()
+        self.log_filter_hlayout.setAlignment(Qt.AlignLeft)
+        self.log_hotel_filter_combobox = QComboBox()
+        self.log_hotel_filter_combobox.addItem("Tous les hôtels", None)
+        self.log_hotel_filter_combobox.currentIndexChanged.connect(
+            lambda *args: self.registry_filter_model.set_hotel_name(self.log_hotel_filter_combobox.currentData())
+        )
+        self.registry_model.hotel_seen.connect(
+            lambda hotel_name: self.log_hotel_filter_combobox.addItem(hotel_name, hotel_name)
+        )
+        self.log_severity_filter_combobox = QComboBox()
+        for text, severity in [
+            ("Tous les messages", registry.INFO),
+            ("Avertissements et erreurs", registry.WARNING),
+            ("Erreurs", registry.ERROR),
+        ]:
+            self.log_severity_filter_combobox.addItem(text, severity)
+        self.log_severity_filter_combobox.currentIndexChanged.connect(
+            lambda *args: self.registry_filter_model.set_min_severity(self.log_severity_filter_combobox.currentData())
+        )
 
         # Scroll automatique vers le dernier item ajouté
         self.log_vscroll_bar.rangeChanged.connect(
@@ -106,11 +162,11 @@ class Hpm(QWidget):
         self.dedge_settings_widget = QWidget()
         self.dedge_settings_vlayout = QVBoxLayout(self.dedge_settings_widget)
 
-        # Création d'un tableau à partir de self.df_ids
+        # Création d'un tableau vide, rempli à partir de self.config_store à la fin de son chargement
         self.table_ids = cw.CustomTable(
-            df=self.df_ids,
             add_icon_path=self.add_icon_path,
             remove_icon_path=self.remove_icon_path,
+            columns=HotelConfig.columns(),
         )
 
         # Création d'un delegate personnalisé pour la colonne "path" : editor -> QToolButton + QLineEdit
@@ -130,7 +186,7 @@ class Hpm(QWidget):
             "Vider", lambda *args: self.table_ids.setRowCount(0), "Vider le tableau"
         )
         self.restore_table_ids_button = cw.CustomPushButton(
-            "Rétablir", lambda *args: self.table_ids.fill(self.df_ids), "Annuler les changements effectués"
+            "Rétablir", lambda *args: self.table_ids.fill_rows(self.ids_rows()), "Annuler les changements effectués"
         )
         self.save_table_ids_button = cw.CustomPushButton(
             "Sauvegarder", self.save_table_ids, "Sauvegarder les changements effectués"
@@ -185,11 +241,17 @@ class Hpm(QWidget):
         self.pricing_groupbox.setLayout(self.pricing_hlayout)
         self.pricing_hlayout.addWidget(self.no_edit_option)
         self.pricing_hlayout.addWidget(self.edit_option)
+        self.pricing_hlayout.addWidget(self.full_pass_option)
         self.pricing_hlayout.addWidget(self.run_pricing_button)
+        self.pricing_hlayout.addWidget(self.resume_pricing_button)
+        self.update_resume_pricing_button()
 
         self.program_vlayout.addWidget(self.log_groupbox)
         self.log_groupbox.setLayout(self.log_vlayout)
-        self.log_vlayout.addWidget(self.log_list_widget)
+        self.log_vlayout.addLayout(self.log_filter_hlayout)
+        self.log_filter_hlayout.addWidget(self.log_hotel_filter_combobox)
+        self.log_filter_hlayout.addWidget(self.log_severity_filter_combobox)
+        self.log_vlayout.addWidget(self.log_list_view)
 
         self.tab_widget.addTab(self.dedge_settings_widget, "Paramètres D-Edge")
 
@@ -230,12 +292,81 @@ class Hpm(QWidget):
         self.remove_icon_path = os.path.join(ROOT_PATH, SETTINGS_DICT["remove_icon_path"])
         self.folder_icon_path = os.path.join(ROOT_PATH, SETTINGS_DICT["folder_icon_path"])
         self.settings_icon_path = os.path.join(ROOT_PATH, SETTINGS_DICT["settings_icon_path"])
+        self.config_store = ConfigStore(os.path.join(ROOT_PATH, SETTINGS_DICT["ids_db_path"]), self.ids_path)
+        self.pool_size = SETTINGS_DICT.get("pool_size", 1)  # Nombre de sessions de navigateur pricant en parallèle
+        self.tracing_enabled = SETTINGS_DICT.get("tracing", False)  # Durées des étapes du pricing dans un fichier de trace
+        self.trace_dir = os.path.join(ROOT_PATH, SETTINGS_DICT.get("trace_dir", "resources/traces"))
+        self.price_snapshots = PriceSnapshotStore(os.path.join(ROOT_PATH, SETTINGS_DICT["price_snapshots_path"]))
+        self.run_journal = RunJournal(
+            os.path.join(ROOT_PATH, SETTINGS_DICT.get("run_journal_path", "resources/run_journal.json"))
+        )
+        self.price_cache = PriceCache(
+            os.path.join(ROOT_PATH, SETTINGS_DICT["price_cache_dir"]), SETTINGS_DICT.get("price_cache_max_mb", 200)
+        )
+
+        # Registre : les derniers messages en mémoire, tout l'historique dans des fichiers de log tournants
+        self.registry_model = registry.RegistryModel(
+            SETTINGS_DICT.get("registry_max_entries", 5000),
+            registry.build_registry_logger(
+                os.path.join(ROOT_PATH, SETTINGS_DICT.get("registry_log_path", "resources/logs/registry.log")),
+                SETTINGS_DICT.get("registry_log_max_mb", 5),
+                SETTINGS_DICT.get("registry_log_backups", 5),
+            ),
+            self,
+        )
 
     def handle_version(self, version: Version) -> None:
         if version == Version.FREE:
-            self.df_ids = self.df_ids.iloc[:1]
+            self.config_store.max_configs = 1
         self.version = version
 
+    def load_ids(self) -> None:
+        """
+        Load the ids file in a separate thread, the widgets depending on it being disabled until it is loaded
+        """
+        self.ids_loaded = False
+        self.set_ids_widgets_enabled(False)
+
+        self.ids_thread = QThread()
+        self.ids_loader = worker.IdsLoader(self.config_store)
+        self.ids_loader.moveToThread(self.ids_thread)
+
+        self.ids_thread.started.connect(self.ids_loader.run)
+        self.ids_loader.loaded.connect(self.on_ids_loaded)
+        self.ids_loader.failed.connect(lambda message: self.update_log_list_widget(message, color="red"))
+        self.ids_loader.finished.connect(self.ids_thread.quit)
+        self.ids_loader.finished.connect(self.ids_loader.deleteLater)
+        self.ids_thread.finished.connect(self.ids_thread.deleteLater)
+
+        # Démarrage une fois la boucle d'évènements lancée : la fenêtre est entièrement construite sans le chargement en parallèle,
+        # et les connexions faites après la construction (profil de démarrage, voir main.py) ne peuvent pas manquer la fin du thread
+        QTimer.singleShot(0, self.ids_thread.start)
+
+    def on_ids_loaded(self) -> None:
+        self.update_lists()
+
+        # Le remplissage du tableau n'est pas une modification de l'utilisateur : le bouton "Sauvegarder" n'est pas mis en relief
+        self.table_ids.fill_rows(self.ids_rows())
+        self.save_table_ids_button.setStyleSheet("")
+
+        self.ids_loaded = True
+        self.set_ids_widgets_enabled(True)
+
+    def ids_rows(self) -> list:
+        return [config.to_row() for config in self.config_store.configs]
+
+    def set_ids_widgets_enabled(self, enabled: bool) -> None:
+        for widget in [
+            self.add_hotel_button,
+            self.run_pricing_button,
+            self.add_id_button,
+            self.empty_table_ids_button,
+            self.restore_table_ids_button,
+            self.save_table_ids_button,
+        ]:
+            widget.setEnabled(enabled)
+        self.update_resume_pricing_button()
+
     def add_hotel(self):
         # On crée un layout horizontal pour chaque ligne "hotel + date debut + date fin" créée
         hlayout = QHBoxLayout()
@@ -251,7 +382,7 @@ class Hpm(QWidget):
 
         # Ajout aux comboboxes des usernames et de leur(s) hôtel(s) associé(s)
         for username in self.username_list:
-            related_hotels = self.df_ids.loc[self.df_ids["username"] == username, "hotel_name"].to_list()
+            related_hotels = self.config_store.hotels_of(username)
             username_combobox.addItem(username, related_hotels)
         username_combobox.currentIndexChanged.connect(
             lambda *args: self.update_hotel_name_combobox(username_combobox, hotel_name_combobox)
@@ -276,18 +407,21 @@ class Hpm(QWidget):
         for widget in [username_combobox, hotel_name_combobox, date_edit_beg, date_edit_end, remove_button]:
             hlayout.addWidget(widget)
 
-    def run_pricing(self):
+    def run_pricing(self, resume=False):
         self.thread = QThread()
-        self.worker = worker.Worker(self)
+        self.worker = worker.Worker(self, resume)
         self.worker.moveToThread(self.thread)
 
         # If widgets already exist, remove them and recreate them for a cleaner code
         # + allows for avoiding bugs if progressbar has been updated due to an error -> update via 'setStyleSheet' deletes all its parameters, so it no longer looks the same
-        if self.pricing_hlayout.count() > 3:
-            for i in [5, 4, 3]:
+        if self.pricing_hlayout.count() > 5:
+            for i in [7, 6, 5]:
                 cw.remove_widget_cleanly_at(i, self.pricing_hlayout)
 
-        cancel_pricing_button = cw.CustomPushButton("Annuler", self.thread.requestInterruption, "Annuler le pricing")
+        pricing_thread, pricing_worker = self.thread, self.worker
+        cancel_pricing_button = cw.CustomPushButton(
+            "Annuler", lambda *args: self.cancel_pricing(pricing_thread, pricing_worker), "Annuler le pricing"
+        )
         pricing_progressbar = cw.CustomProgressBar(range_=(0, 100), alignment=Qt.AlignCenter)
         pricing_label = cw.CustomLabel(fixed_width=200, word_wrap=True)  # For real time status
         for widget in [cancel_pricing_button, pricing_progressbar, pricing_label]:
@@ -298,57 +432,89 @@ class Hpm(QWidget):
         self.worker.finished.connect(self.thread.quit)
         self.worker.finished.connect(self.worker.deleteLater)
         self.thread.finished.connect(self.set_ui_enabled)
+        self.thread.finished.connect(self.update_resume_pricing_button)
         self.thread.finished.connect(lambda *args: cancel_pricing_button.setEnabled(False))
         self.thread.finished.connect(self.add_list_widget_separator)
         self.thread.finished.connect(self.thread.deleteLater)
-        self.worker.update_progressbar.connect(lambda value: self.update_progressbar(pricing_progressbar, value))
-        self.worker.update_label.connect(lambda message, style_dict: self.update_label(pricing_label, message, **style_dict))
-        self.worker.update_log_list_widget.connect(
-            lambda message, style_dict: self.update_log_list_widget(message, **style_dict)
-        )
+
+        # Rafraîchissement de l'interface à intervalle fixe avec les mises à jour mises en attente par le worker
+        apply_updates = lambda *args: self.apply_worker_updates(pricing_worker, pricing_progressbar, pricing_label)
+        self.ui_refresh_timer = QTimer(self)
+        self.ui_refresh_timer.setInterval(worker.UI_REFRESH_INTERVAL_MS)
+        self.ui_refresh_timer.timeout.connect(apply_updates)
+        self.worker.finished.connect(self.ui_refresh_timer.stop)
+        self.worker.finished.connect(apply_updates)  # Dernières mises à jour (message de fin ou d'erreur)
+        self.worker.finished.connect(self.ui_refresh_timer.deleteLater)
 
         # Start thread
         self.set_ui_enabled(pricing_enabled=False)
+        self.ui_refresh_timer.start()
         self.thread.start()
 
+    def cancel_pricing(self, pricing_thread, pricing_worker):
+        """
+        Stop the pricing in less than a second, even in the middle of a page load (see Worker.cancel)
+        """
+        pricing_thread.requestInterruption()
+        pricing_worker.cancel()
+        pricing_worker.emit_signals("Annulation en cours")
+
+    def apply_worker_updates(self, pricing_worker, progressbar, label):
+        """
+        Apply the updates queued by the worker since the last refresh: every registry message, but only the latest label
+        and progress value
+        """
+        label_update, progressbar_value, log_messages = pricing_worker.take_updates()
+        if log_messages:
+            # Un seul ajout au modèle du registre pour tous les messages reçus depuis le dernier appel
+            self.registry_model.add_messages(log_messages)
+        if label_update is not None:
+            message, style_dict = label_update
+            self.update_label(label, message, **style_dict)
+        if progressbar_value is not None:
+            self.update_progressbar(progressbar, progressbar_value)
+
+    def update_resume_pricing_button(self):
+        # La reprise relit les mots de passe et fichiers de prix dans les ids : elle attend leur chargement
+        self.resume_pricing_button.setEnabled(self.ids_loaded and self.run_journal.resumable_run() is not None)
+
     def update_lists(self):
         """
         Update username and hotel lists
         """
-        self.username_list = sorted(set(self.df_ids["username"]), key=str.lower)
-        self.hotel_name_list = self.df_ids["hotel_name"].to_list()
+        self.username_list = self.config_store.usernames()
+        self.hotel_name_list = [config.hotel_name for config in self.config_store.configs]
+        self.registry_model.set_known_hotels(self.hotel_name_list)
 
     def update_progressbar(self, progressbar, value):
         if value >= 0:
             progressbar.setValue(value)
         else:
-            progressbar.setStyleSheet("QProgressBar::chunk {background-color: red;}")
+            progressbar.setStyleSheet(PROGRESSBAR_ERROR_STYLE_SHEET)
 
     def update_log_list_widget(self, message, **kwargs):
         """
-        Update log list widget by inserting a new item and handling color
+        Add a message to the registry, the only style keyword being 'color'
         """
-        now = dt.datetime.now()
-        self.log_list_widget.addItem("[{}]   {}".format(now.strftime("%H:%M"), message))
-
-        for key, value in kwargs.items():
-            if key == "color":
-                self.log_list_widget.item(self.log_list_widget.count() - 1).setForeground(QColor(value))
-            else:
-                raise KeyError("Le mot clé '{}' choisi pour le style du dernier item du registre est invalide".format(key))
+        self.registry_model.add_messages([(message, kwargs)])
 
     def update_label(self, label: QLabel, message: str, **kwargs):
         """
         Same principle than update_log_list_widget, but for the label
         """
         label.setText(message)
-        label.setStyleSheet("QLabel { color : black; }")
+        color = "black"
         for key, value in kwargs.items():
             if key == "color":
-                label.setStyleSheet("QLabel { color : %s; }" % value)
+                color = value
             else:
                 raise KeyError("Le mot clé '{}' choisi pour le style du label est invalide".format(key))
 
+        # La feuille de style n'est appliquée (et donc parsée par Qt) que si la couleur du label change
+        style_sheet = label_style_sheet(color)
+        if label.styleSheet() != style_sheet:
+            label.setStyleSheet(style_sheet)
+
     def set_ui_enabled(self, pricing_enabled=True):
         """
         Enable or disable widgets to prevent bugs when the tools runs an action
@@ -357,7 +523,9 @@ class Hpm(QWidget):
             self.param_groupbox,
             self.no_edit_option,
             self.edit_option,
+            self.full_pass_option,
             self.run_pricing_button,
+            self.resume_pricing_button,
             self.restore_table_ids_button,
             self.save_table_ids_button,
         ]
@@ -371,15 +539,7 @@ class Hpm(QWidget):
                 widget.setEnabled(False)
 
     def add_list_widget_separator(self):
-        item = QListWidgetItem()
-        item.setFlags(Qt.NoItemFlags)
-        self.log_list_widget.addItem(item)
-        frame = QFrame()
-        frame.setFrameShape(QFrame.HLine)
-        self.log_list_widget.setItemWidget(item, frame)
-
-        # On sélectionne le dernier message affiché dans la log_list_widget
-        # self.log_list_widget.setCurrentRow(self.log_list_widget.count()-2)
+        self.registry_model.add_separator()
 
     def update_date_edit_end(self, date_edit_beg, date_edit_end):
         date_value = date_edit_beg.date()
@@ -412,20 +572,23 @@ class Hpm(QWidget):
 
     # SETTINGS TAB
     def save_table_ids(self):
-        df_from_table_ids = self.table_ids.to_df()
+        rows_from_table_ids = self.table_ids.to_rows()
 
         # Delete empty rows
-        new_df_ids = df_from_table_ids.loc[df_from_table_ids.astype(bool).any(axis=1)]
+        new_rows = [row for row in rows_from_table_ids if any(row)]
 
         if self.version == Version.FREE:
-            new_df_ids = new_df_ids.iloc[:1]
-
-        # If the content of the created df is not identical to self.df_ids, update self.df_ids and save it
-        if not new_df_ids.equals(self.df_ids):
-            self.df_ids = new_df_ids
-            self.update_lists()
-            new_df_ids.to_excel(self.ids_path, index=False)
-
-        # Refill the table to delete empty rows
-        if not new_df_ids.equals(df_from_table_ids):
-            self.table_ids.fill(new_df_ids)
+            new_rows = new_rows[:1]
+
+        # Only the configurations that have changed are saved (see ConfigStore.save), duplicates being rejected
+        configs = [HotelConfig.from_row(dict(zip(self.table_ids.columns, row))) for row in new_rows]
+        try:
+            if self.config_store.save(configs):
+                self.update_lists()
+        except ValueError as e:
+            self.update_log_list_widget(str(e), color="red")
+            return
+
+        # Refill the table to delete empty rows (and display normalized values)
+        if self.ids_rows() != rows_from_table_ids:
+            self.table_ids.fill_rows(self.ids_rows())
@@ -0,0 +1,89 @@
+import os
+import hashlib
+import pickle
+import threading
+from typing import Callable
+
+
+class PriceCache:
+    """
+    Local cache of parsed price workbooks (one pickle sidecar per workbook)
+
+    - an entry is keyed by the workbook path and is only valid for the size and modification time it was built from,
+      so that any change of the workbook is taken into account at the next run
+    - an entry only holds the period that was read (see utils.read_price_sheet) and is rebuilt for a period it does not cover
+    - the total size of the cache is bounded: the least recently used entries are evicted first
+    """
+
+    def __init__(self, directory: str, max_size_mb: float = 200) -> None:
+        self.directory = directory
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.lock = threading.Lock()  # Le cache est partagé par toutes les sessions du pool de bots
+
+    def entry_path(self, path: str) -> str:
+        key = hashlib.sha1(os.path.normcase(os.path.abspath(path)).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + ".pkl")
+
+    def get(self, path: str, load: Callable, beg_date=None, end_date=None):
+        """
+        Return the cached prices of the workbook at 'path' for [beg_date, end_date] (None meaning unbounded),
+        or build them with 'load(path, beg_date, end_date)' and store them if the cache is stale or does not cover the period
+        """
+        stat = os.stat(path)
+        signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        entry_path = self.entry_path(path)
+
+        try:
+            with open(entry_path, "rb") as entry_file:
+                entry = pickle.load(entry_file)
+            if entry["signature"] == signature and self.covers(entry, beg_date, end_date):
+                # Mise à jour de la date d'accès de l'entrée (utilisée pour l'éviction)
+                os.utime(entry_path)
+                return entry["data"]
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError, AttributeError, ImportError):
+            pass
+
+        data = load(path, beg_date, end_date)
+        self.put(entry_path, {"signature": signature, "beg_date": beg_date, "end_date": end_date, "data": data})
+        return data
+
+    @staticmethod
+    def covers(entry: dict, beg_date, end_date) -> bool:
+        """
+        Check if the period stored in a cache entry contains the requested period
+        """
+        beg_date_is_covered = entry["beg_date"] is None or (beg_date is not None and entry["beg_date"] <= beg_date)
+        end_date_is_covered = entry["end_date"] is None or (end_date is not None and entry["end_date"] >= end_date)
+        return beg_date_is_covered and end_date_is_covered
+
+    def put(self, entry_path: str, entry: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Ecriture atomique : une autre session ne peut jamais lire une entrée à moitié écrite
+        temp_path = "{}.{}.tmp".format(entry_path, threading.get_ident())
+        with open(temp_path, "wb") as entry_file:
+            pickle.dump(entry, entry_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, entry_path)
+
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Delete the least recently used entries until the cache fits in its maximum size
+        """
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".pkl"):
+                    entry_stat = os.stat(os.path.join(self.directory, name))
+                    entries.append((entry_stat.st_mtime, entry_stat.st_size, name))
+
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                total_size -= size
@@ -0,0 +1,64 @@
+import os
+import json
+import threading
+import datetime as dt
+
+
+class PriceSnapshotStore:
+    """
+    Local snapshot of the prices last pushed successfully to D-Edge, per (username, hotel, room type, rate)
+
+    Used by the "edit" method to skip the dates whose Excel price has not changed since the last push
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()  # Le snapshot est partagé par toutes les sessions du pool de bots
+        self.snapshots = None  # Chargé à la première utilisation
+
+    @staticmethod
+    def key(username: str, hotel_name: str, room_type: str, price_type: str) -> str:
+        return "|".join([username, hotel_name, room_type, price_type])
+
+    def load(self) -> dict:
+        if self.snapshots is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as snapshot_file:
+                    self.snapshots = json.load(snapshot_file)
+            except (OSError, ValueError):
+                self.snapshots = {}
+        return self.snapshots
+
+    def unchanged_dates(self, key: str, prices) -> set:
+        """
+        Get the dates whose price (see utils.fetch_prices) is identical to the last pushed price
+        """
+        with self.lock:
+            pushed_prices = self.load().get(key, {})
+            return {date for date, price in prices.items() if pushed_prices.get(date.isoformat()) == price}
+
+    def record(self, key: str, window_prices: dict) -> None:
+        """
+        Record the prices (date -> price) of a window that has just been pushed (or found identical) on D-Edge
+        """
+        with self.lock:
+            pushed_prices = self.load().setdefault(key, {})
+            pushed_prices.update({date.isoformat(): price for date, price in window_prices.items()})
+
+            # Les dates passées ne seront plus jamais pricées : inutile de les conserver
+            today = dt.date.today().isoformat()
+            for date in [date for date in pushed_prices if date < today]:
+                del pushed_prices[date]
+
+            self.save()
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Ecriture atomique pour ne jamais laisser un snapshot corrompu en cas d'arrêt brutal
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as snapshot_file:
+            json.dump(self.snapshots, snapshot_file)
+        os.replace(temp_path, self.path)
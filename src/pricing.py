@@ -0,0 +1,255 @@
+import sys
+import time
+import threading
+from typing import List, Optional
+from . import utils
+from . import tracing
+
+
+# Pipeline de pricing commun à l'interface (voir worker.Worker) et à la ligne de commande (voir cli.py)
+# Le "reporter" est le worker Qt ou un ConsoleReporter : il expose emit_signals, advance_progress et exit_if_interruption_requested
+
+
+def group_by_account(information_list: list) -> List[list]:
+    """
+    Group the hotel lines by D-Edge account (one login per account), keeping the lines of a same price grid
+    (hotel, room type, rate) next to each other so that the planning page already open can be reused
+    """
+    accounts = {}
+    for information in information_list:
+        accounts.setdefault(information[0], []).append(information)
+    account_list = list(accounts.values())
+
+    for account_information_list in account_list:
+        grid_order = {}
+        for information in account_information_list:
+            grid_order.setdefault(information[2:6], len(grid_order))
+        account_information_list.sort(key=lambda information: grid_order[information[2:6]])
+
+    return account_list
+
+
+def prepare_sessions(bot_pool, nb_accounts: int, reporter) -> list:
+    """
+    Prepare the drivers of the sessions that will be used (sequentially, so that the driver is resolved only once)
+    """
+    sessions = bot_pool.sessions_for(nb_accounts)
+    for bot in sessions:
+        if not bot.driver_has_been_prepared:
+            message = "Installation du driver"
+            reporter.emit_signals(message, message)
+            bot.prepare_driver()
+
+    if len(sessions) > 1:
+        message = f"Pricing en parallèle sur {len(sessions)} sessions"
+        reporter.emit_signals(message, message)
+
+    return sessions
+
+
+def price_account(
+    bot,
+    account_information_list: list,
+    method: str,
+    reporter,
+    price_cache=None,
+    price_snapshots=None,
+    full_pass: bool = False,
+    results: Optional[list] = None,
+    journal=None,
+) -> None:
+    """
+    Price every hotel of a D-Edge account with a single login
+
+    If 'results' is provided, the result of each hotel (see price_hotel) is appended to it, including the failed hotel
+    """
+    username, password = account_information_list[0][:2]
+
+    # Reprise d'un run interrompu : les hôtels déjà terminés ne sont pas repricés (ni même la connexion, s'ils le sont tous)
+    if journal is not None:
+        remaining_information_list = []
+        for information in account_information_list:
+            if journal.is_hotel_done(journal.key(information)):
+                reporter.emit_signals(log_list_widget_message=f"{information[2]} : Pricing déjà terminé, hôtel ignoré")
+                reporter.advance_progress(nb_days=(information[7] - information[6]).days + 1)
+                if results is not None:
+                    results.append(hotel_result(information, "already_done", 0))
+            else:
+                remaining_information_list.append(information)
+        account_information_list = remaining_information_list
+        if not account_information_list:
+            return
+
+    reporter.exit_if_interruption_requested()
+    bot.ensure_browser_is_open(worker=reporter)
+    bot.go_to_home_page()
+    bot.login(username, password, create_cookie=True, worker=reporter)
+
+    for information in account_information_list:
+        start_time = time.perf_counter()
+        try:
+            result = price_hotel(bot, information, method, reporter, price_cache, price_snapshots, full_pass, journal)
+        except BaseException as e:
+            if results is not None:
+                results.append(hotel_result(information, "error", time.perf_counter() - start_time, error=str(e)))
+            raise
+        if results is not None:
+            results.append(result)
+
+
+@tracing.traced("hotel")
+def price_hotel(
+    bot,
+    information: tuple,
+    method: str,
+    reporter,
+    price_cache=None,
+    price_snapshots=None,
+    full_pass: bool = False,
+    journal=None,
+) -> dict:
+    """
+    Price a hotel with a session already logged in to the account of the hotel
+
+    With a run journal (see run_journal.RunJournal), every confirmed window is recorded and the windows confirmed during
+    an earlier attempt of the same run are skipped
+    """
+    (
+        username,
+        password,
+        hotel_name,
+        hotel_is_alone,
+        room_type,
+        price_type,
+        beg_date,
+        end_date,
+        prices_path,
+    ) = information
+
+    reporter.exit_if_interruption_requested()
+    start_time = time.perf_counter()
+    prices = utils.fetch_prices(prices_path, beg_date, end_date, hotel_name, worker=reporter, cache=price_cache)
+
+    # Synchronisation incrémentale (méthode "edit") : seules les pages dont les prix Excel diffèrent des derniers prix envoyés sont visitées
+    skippable_dates, window_synced_callbacks = set(), []
+    if method == "edit" and price_snapshots is not None:
+        snapshot_key = price_snapshots.key(username, hotel_name, room_type, price_type)
+        if not full_pass:
+            skippable_dates |= price_snapshots.unchanged_dates(snapshot_key, prices)
+        window_synced_callbacks.append(lambda window_prices: price_snapshots.record(snapshot_key, window_prices))
+
+    # Reprise d'un run interrompu : les pages confirmées lors de la tentative précédente ne sont pas revisitées, même en passage complet
+    if method == "edit" and journal is not None:
+        journal_key = journal.key(information)
+        skippable_dates |= journal.synced_dates(journal_key)
+        window_synced_callbacks.append(lambda window_prices: journal.record_window(journal_key, window_prices))
+
+    def on_window_synced(window_prices: dict) -> None:
+        for callback in window_synced_callbacks:
+            callback(window_prices)
+
+    summary = bot.check_prices(
+        hotel_is_alone,
+        room_type,
+        price_type,
+        beg_date,
+        end_date,
+        prices,
+        method,
+        hotel_name,
+        worker=reporter,
+        skippable_dates=skippable_dates,
+        on_window_synced=on_window_synced if window_synced_callbacks else None,
+    )
+    if method == "edit" and journal is not None:
+        journal.finish_hotel(journal.key(information))
+
+    # Durée totale du pricing de l'hôtel (hors connexion au compte), pour comparer les modes avec et sans fenêtre
+    duration = time.perf_counter() - start_time
+    mode = "sans fenêtre" if bot.headless else "avec fenêtre"
+    message = f"{hotel_name} : Durée du pricing : {duration:.1f} s (navigateur {mode})"
+    reporter.emit_signals(log_list_widget_message=message)
+
+    return hotel_result(information, "ok", duration, summary)
+
+
+def hotel_result(information: tuple, status: str, duration: float, summary: dict = None, error: str = None) -> dict:
+    username, _, hotel_name, _, room_type, price_type, beg_date, end_date, _ = information
+    result = {
+        "username": username,
+        "hotel_name": hotel_name,
+        "room_type": room_type,
+        "price_type": price_type,
+        "beg_date": beg_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "status": status,
+        "duration_s": round(duration, 1),
+    }
+    result.update(summary or {})
+    if error is not None:
+        result["error"] = error
+    return result
+
+
+class ConsoleReporter:
+    """
+    Reporter of the pricing without Qt (command line, scheduler): messages are written on a stream, stderr by default
+    so that the standard output stays free for machine-readable results
+    """
+
+    def __init__(self, stream=None, stop_event: threading.Event = None) -> None:
+        self.stream = stream if stream is not None else sys.stderr
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.progress_lock = threading.Lock()
+        self.date_idx = 0  # Nombre de jours traités, toutes sessions confondues
+
+    def exit_if_interruption_requested(self) -> None:
+        if self.stop_event.is_set():
+            raise KeyboardInterrupt("Programme interrompu")
+
+    def advance_progress(self, label_message: str = None, nb_days: int = 1) -> None:
+        with self.progress_lock:
+            self.date_idx += nb_days
+
+    def emit_signals(
+        self,
+        label_message: str = None,
+        log_list_widget_message: str = None,
+        style_dict: dict = None,
+        progressbar_value: int = None,
+        finished: bool = False,
+    ) -> None:
+        # Le registre suffit : le label ne fait que répéter le dernier message ou la progression
+        if log_list_widget_message is not None:
+            print("[{}]   {}".format(time.strftime("%H:%M:%S"), log_list_widget_message), file=self.stream, flush=True)
+
+
+def run(
+    bot_pool,
+    information_list: list,
+    method: str,
+    reporter,
+    price_cache=None,
+    price_snapshots=None,
+    full_pass: bool = False,
+    results: Optional[list] = None,
+    journal=None,
+) -> list:
+    """
+    Run the whole pricing of 'information_list' on the sessions of 'bot_pool' and return the result of each priced hotel
+
+    If 'results' is provided, it is filled in place, so that the caller still gets the results obtained before an error.
+    If 'journal' is provided (started or resumed by the caller), the hotels and windows already done are skipped
+    """
+    results = results if results is not None else []
+    account_list = group_by_account(information_list)
+    prepare_sessions(bot_pool, len(account_list), reporter)
+
+    bot_pool.run(
+        account_list,
+        lambda bot, account_information_list: price_account(
+            bot, account_information_list, method, reporter, price_cache, price_snapshots, full_pass, results, journal
+        ),
+        reporter.stop_event,
+    )
+    return results
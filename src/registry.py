@@ -0,0 +1,212 @@
+import os
+import logging
+import functools
+import datetime as dt
+from collections import deque
+from dataclasses import dataclass
+from logging.handlers import RotatingFileHandler
+from typing import Iterable, List, Optional, Set, Tuple
+from PySide2.QtWidgets import QStyledItemDelegate
+from PySide2.QtCore import Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel, Signal
+from PySide2.QtGui import QBrush, QColor
+
+# Niveaux de gravité des messages du registre, du moins grave au plus grave (voir RegistryFilterModel)
+INFO = "info"
+WARNING = "warning"
+ERROR = "error"
+SEVERITIES = [INFO, WARNING, ERROR]
+LOGGING_LEVELS = {INFO: logging.INFO, WARNING: logging.WARNING, ERROR: logging.ERROR}
+
+# Rôles personnalisés du modèle, utilisés par le filtre
+HOTEL_ROLE = Qt.UserRole
+SEVERITY_ROLE = Qt.UserRole + 1
+SEPARATOR_ROLE = Qt.UserRole + 2
+
+
+@functools.lru_cache(maxsize=None)
+def foreground_brush(color: str) -> QBrush:
+    return QBrush(QColor(color))
+
+
+@dataclass
+class RegistryEntry:
+    """
+    Message of the registry (or separator between two runs when 'is_separator')
+    """
+
+    time: dt.datetime
+    message: str = ""
+    color: Optional[str] = None
+    severity: str = INFO
+    hotel_name: Optional[str] = None
+    is_separator: bool = False
+
+    @property
+    def text(self) -> str:
+        return "[{}]   {}".format(self.time.strftime("%H:%M"), self.message)
+
+
+def severity_of(color: Optional[str]) -> str:
+    """
+    Severity of a message from its style: errors are displayed in red, any other color highlights a warning
+    """
+    if color is None:
+        return INFO
+    return ERROR if color == "red" else WARNING
+
+
+def build_registry_logger(log_path: str, max_mb: float = 5, backup_count: int = 5) -> logging.Logger:
+    """
+    Logger writing the full history of the registry to rotating log files (the window only keeps the latest messages)
+    """
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    logger = logging.getLogger("hpm.registry")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = RotatingFileHandler(
+            log_path, maxBytes=int(max_mb * 1024 * 1024), backupCount=backup_count, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+class RegistryModel(QAbstractListModel):
+    """
+    Bounded list model of the registry: the latest 'max_entries' entries are kept in a ring buffer, every message being
+    also written to 'logger' (if provided) so that the full history stays available on disk
+
+    The hotel of a message is read from its "hotel_name : ..." prefix, among the hotels given to set_known_hotels
+    """
+
+    hotel_seen = Signal(str)  # Premier message d'un hôtel (ajout de l'hôtel au filtre du registre)
+
+    def __init__(self, max_entries: int = 5000, logger: Optional[logging.Logger] = None, parent=None) -> None:
+        super().__init__(parent)
+        self.entries = deque()
+        self.max_entries = max(1, int(max_entries))
+        self.logger = logger
+        self.known_hotels: Set[str] = set()
+        self.seen_hotels: Set[str] = set()
+
+    def set_known_hotels(self, hotel_names: Iterable[str]) -> None:
+        self.known_hotels = set(hotel_names)
+
+    def hotel_of(self, message: str) -> Optional[str]:
+        prefix = message.split(" : ", 1)[0]
+        return prefix if prefix in self.known_hotels else None
+
+    # Qt model interface
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self.entries):
+            return None
+        entry = self.entries[index.row()]
+        if role == Qt.DisplayRole:
+            return "" if entry.is_separator else entry.text
+        if role == Qt.ForegroundRole and entry.color is not None:
+            return foreground_brush(entry.color)
+        if role == HOTEL_ROLE:
+            return entry.hotel_name
+        if role == SEVERITY_ROLE:
+            return entry.severity
+        if role == SEPARATOR_ROLE:
+            return entry.is_separator
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if index.isValid() and self.entries[index.row()].is_separator:
+            return Qt.NoItemFlags
+        return super().flags(index)
+
+    # Ajout de messages
+    def add_messages(self, messages: List[Tuple[str, dict]]) -> None:
+        """
+        Append a batch of (message, style_dict) to the registry, 'style_dict' only accepting the 'color' key
+        """
+        now = dt.datetime.now()
+        entries = []
+        for message, style_dict in messages:
+            for key in style_dict:
+                if key != "color":
+                    raise KeyError(
+                        "Le mot clé '{}' choisi pour le style du dernier item du registre est invalide".format(key)
+                    )
+            color = style_dict.get("color")
+            entries.append(RegistryEntry(now, message, color, severity_of(color), self.hotel_of(message)))
+        self.append_entries(entries)
+
+    def add_separator(self) -> None:
+        self.append_entries([RegistryEntry(dt.datetime.now(), is_separator=True)])
+
+    def append_entries(self, entries: List[RegistryEntry]) -> None:
+        entries = entries[-self.max_entries :]
+        if not entries:
+            return
+
+        for entry in entries:
+            if self.logger is not None and not entry.is_separator:
+                self.logger.log(LOGGING_LEVELS[entry.severity], entry.message)
+            if entry.hotel_name is not None and entry.hotel_name not in self.seen_hotels:
+                self.seen_hotels.add(entry.hotel_name)
+                self.hotel_seen.emit(entry.hotel_name)
+
+        # Les plus anciennes entrées sont supprimées du buffer en une seule opération pour faire de la place au lot
+        nb_removed = len(self.entries) + len(entries) - self.max_entries
+        if nb_removed > 0:
+            self.beginRemoveRows(QModelIndex(), 0, nb_removed - 1)
+            for _ in range(nb_removed):
+                self.entries.popleft()
+            self.endRemoveRows()
+
+        first_row = len(self.entries)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(entries) - 1)
+        self.entries.extend(entries)
+        self.endInsertRows()
+
+
+class RegistryFilterModel(QSortFilterProxyModel):
+    """
+    Filter of the registry by hotel and by minimal severity (separators are always displayed)
+    """
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.hotel_name = None  # None : tous les hôtels
+        self.min_severity = INFO
+
+    def set_hotel_name(self, hotel_name: Optional[str]) -> None:
+        self.hotel_name = hotel_name
+        self.invalidateFilter()
+
+    def set_min_severity(self, min_severity: str) -> None:
+        self.min_severity = min_severity
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        # Accès direct aux entrées du modèle source (plus rapide que data() pour chaque rôle)
+        entry = self.sourceModel().entries[source_row]
+        if entry.is_separator:
+            return True
+        if self.hotel_name is not None and entry.hotel_name != self.hotel_name:
+            return False
+        return SEVERITIES.index(entry.severity) >= SEVERITIES.index(self.min_severity)
+
+
+class RegistryDelegate(QStyledItemDelegate):
+    """
+    Delegate drawing the separators of the registry as horizontal lines
+    """
+
+    def paint(self, painter, option, index) -> None:
+        if not index.data(SEPARATOR_ROLE):
+            super().paint(painter, option, index)
+            return
+        painter.save()
+        painter.setPen(option.palette.mid().color())
+        y = option.rect.center().y()
+        painter.drawLine(option.rect.left(), y, option.rect.right(), y)
+        painter.restore()
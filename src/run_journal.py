@@ -0,0 +1,152 @@
+import os
+import json
+import threading
+import datetime as dt
+from typing import List, Optional
+
+# Statuts d'un run
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+
+
+class RunJournal:
+    """
+    Durable journal of the last "edit" run, used to resume it after a failure (browser crash, network error...)
+
+    For every hotel line of the run, the journal records the dates of the windows whose prices are confirmed on D-Edge
+    (saved, or already identical to the Excel prices) and whether the hotel is finished. Resuming a run that did not
+    complete skips the finished hotels and the recorded dates (see pricing.price_hotel)
+
+    NB: passwords are never written in the journal, they are read again from the ids when resuming
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()  # Le journal est mis à jour en parallèle par toutes les sessions du pool de bots
+        self.journal = None  # Chargé à la première utilisation
+
+    @staticmethod
+    def key(information: tuple) -> str:
+        username, _, hotel_name, _, room_type, price_type, beg_date, end_date, _ = information
+        return "|".join([username, hotel_name, room_type, price_type, beg_date.isoformat(), end_date.isoformat()])
+
+    def load(self) -> Optional[dict]:
+        if self.journal is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as journal_file:
+                    self.journal = json.load(journal_file)
+            except (OSError, ValueError):
+                self.journal = None
+        return self.journal
+
+    def start(self, method: str, information_list: list) -> None:
+        """
+        Start the journal of a new run (the journal of the previous run is replaced)
+        """
+        with self.lock:
+            self.journal = {
+                "started_at": dt.datetime.now().isoformat(timespec="seconds"),
+                "method": method,
+                "status": RUNNING,
+                "hotels": [
+                    {
+                        "key": self.key(information),
+                        "username": information[0],
+                        "hotel_name": information[2],
+                        "room_type": information[4],
+                        "price_type": information[5],
+                        "beg_date": information[6].isoformat(),
+                        "end_date": information[7].isoformat(),
+                        "done": False,
+                        "synced_dates": [],
+                    }
+                    for information in information_list
+                ],
+            }
+            self.save()
+
+    def resumable_run(self) -> Optional[dict]:
+        """
+        Get the journal of the last run if it did not complete, None otherwise
+        """
+        with self.lock:
+            journal = self.load()
+            if journal is None or journal["status"] == COMPLETED:
+                return None
+            return journal
+
+    def resume(self) -> List[dict]:
+        """
+        Mark the last run as running again and return its hotel lines (see resumable_run)
+        """
+        with self.lock:
+            journal = self.load()
+            if journal is None or journal["status"] == COMPLETED:
+                raise Exception("Aucun pricing interrompu à reprendre")
+            journal["status"] = RUNNING
+            self.save()
+            return journal["hotels"]
+
+    def hotel(self, key: str) -> Optional[dict]:
+        journal = self.load()
+        if journal is None:
+            return None
+        return next((hotel for hotel in journal["hotels"] if hotel["key"] == key), None)
+
+    def is_hotel_done(self, key: str) -> bool:
+        with self.lock:
+            hotel = self.hotel(key)
+            return hotel is not None and hotel["done"]
+
+    def synced_dates(self, key: str) -> set:
+        """
+        Get the dates already confirmed on D-Edge during the run
+        """
+        with self.lock:
+            hotel = self.hotel(key)
+            if hotel is None:
+                return set()
+            return {dt.date.fromisoformat(date) for date in hotel["synced_dates"]}
+
+    def record_window(self, key: str, dates) -> None:
+        """
+        Record the dates of a window whose prices have just been confirmed on D-Edge
+        """
+        with self.lock:
+            hotel = self.hotel(key)
+            if hotel is None:
+                return
+            synced_dates = set(hotel["synced_dates"])
+            synced_dates.update(date.isoformat() for date in dates)
+            hotel["synced_dates"] = sorted(synced_dates)
+            self.save()
+
+    def finish_hotel(self, key: str) -> None:
+        with self.lock:
+            hotel = self.hotel(key)
+            if hotel is None:
+                return
+            hotel["done"] = True
+            hotel["synced_dates"] = []  # Inutile de conserver les dates d'un hôtel terminé
+            self.save()
+
+    def finish(self, status: str) -> None:
+        with self.lock:
+            if self.load() is None:
+                return
+            self.journal["status"] = status
+            self.journal["finished_at"] = dt.datetime.now().isoformat(timespec="seconds")
+            self.save()
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Ecriture atomique : le journal doit rester lisible même après un arrêt brutal du logiciel
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as journal_file:
+            json.dump(self.journal, journal_file, ensure_ascii=False)
+        os.replace(temp_path, self.path)
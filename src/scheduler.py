@@ -0,0 +1,481 @@
+import os
+import json
+import queue
+import sqlite3
+import threading
+import datetime as dt
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+from . import pricing
+from . import run_journal
+from .dedge_bot import DedgeBot
+from .run_journal import RunJournal
+
+# Statuts d'une exécution de job
+PENDING = "pending"  # En attente de sa date d'exécution (première tentative ou nouvelle tentative après un échec)
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"  # Echec définitif (nombre maximum de tentatives atteint)
+CANCELLED = "cancelled"  # Job supprimé du fichier de jobs avant son exécution
+
+
+@dataclass
+class JobDefinition:
+    """
+    Pricing job read from the jobs file, e.g.:
+    {"name": "hotel-90j", "hotel": "Mon Hôtel", "horizon_days": 90, "method": "edit", "at": "02:30"}
+
+    - the priced period starts 'offset_days' after the day of the run and lasts 'horizon_days' days (rolling horizon)
+    - the cadence is either a daily time ('at', "HH:MM") or a period in minutes ('every_minutes')
+    - a failed run is retried with an exponential backoff, up to 'max_attempts' attempts
+    """
+
+    name: str
+    hotel: str
+    horizon_days: int
+    method: str = "edit"
+    username: Optional[str] = None
+    offset_days: int = 0
+    at: Optional[str] = None
+    every_minutes: Optional[int] = None
+    max_attempts: int = 3
+    full_pass: bool = False
+
+    @classmethod
+    def from_dict(cls, job_dict: dict) -> "JobDefinition":
+        try:
+            job = cls(**job_dict)
+        except TypeError as e:
+            raise ValueError("Job invalide {} : {}".format(job_dict, e))
+
+        # Types vérifiés avant toute comparaison : un champ mal typé dans le JSON (ex : "horizon_days": "3") doit lever une
+        # ValueError (fichier de jobs ignoré par Scheduler.reload_jobs) et non une TypeError qui arrêterait le daemon
+        for field_name, field_type, optional in [
+            ("name", str, False),
+            ("hotel", str, False),
+            ("method", str, False),
+            ("username", str, True),
+            ("at", str, True),
+            ("horizon_days", int, False),
+            ("offset_days", int, False),
+            ("every_minutes", int, True),
+            ("max_attempts", int, False),
+            ("full_pass", bool, False),
+        ]:
+            value = getattr(job, field_name)
+            if value is None and optional:
+                continue
+            # bool est une sous-classe de int : true/false n'est pas accepté comme nombre
+            if not isinstance(value, field_type) or (field_type is int and isinstance(value, bool)):
+                raise ValueError(
+                    "Job '{}' : type invalide pour '{}' ({}, {} attendu)".format(
+                        job.name, field_name, type(value).__name__, field_type.__name__
+                    )
+                )
+
+        if job.method not in ["edit", "no-edit"]:
+            raise ValueError("Job '{}' : méthode invalide '{}' (edit ou no-edit)".format(job.name, job.method))
+        if (job.at is None) == (job.every_minutes is None):
+            raise ValueError("Job '{}' : renseigner soit 'at' (HH:MM), soit 'every_minutes'".format(job.name))
+        if job.at is not None:
+            dt.datetime.strptime(job.at, "%H:%M")
+        if job.horizon_days < 1 or (job.every_minutes is not None and job.every_minutes < 1) or job.max_attempts < 1:
+            raise ValueError(
+                "Job '{}' : horizon_days, every_minutes et max_attempts doivent être positifs".format(job.name)
+            )
+        return job
+
+    def next_run_at(self, last_scheduled_at: Optional[dt.datetime], now: dt.datetime) -> dt.datetime:
+        """
+        Get the date of the next run, the runs missed while the scheduler was stopped being replaced by a single run
+        """
+        if self.at is not None:
+            period = dt.timedelta(days=1)
+            at_time = dt.datetime.strptime(self.at, "%H:%M").time()
+            if last_scheduled_at is None:
+                next_run = dt.datetime.combine(now.date(), at_time)
+                return next_run if next_run >= now else next_run + period
+            next_run = dt.datetime.combine(last_scheduled_at.date() + period, at_time)
+        else:
+            period = dt.timedelta(minutes=self.every_minutes)
+            if last_scheduled_at is None:
+                return now
+            next_run = last_scheduled_at + period
+
+        while next_run + period <= now:
+            next_run += period
+        return next_run
+
+    def period(self, run_date: dt.date) -> tuple:
+        beg_date = run_date + dt.timedelta(days=self.offset_days)
+        return beg_date, beg_date + dt.timedelta(days=self.horizon_days - 1)
+
+
+def load_jobs(jobs_path: str) -> List[JobDefinition]:
+    with open(jobs_path, "r", encoding="utf-8") as jobs_file:
+        jobs = [JobDefinition.from_dict(job_dict) for job_dict in json.load(jobs_file)]
+
+    names = [job.name for job in jobs]
+    duplicated_names = sorted({name for name in names if names.count(name) > 1})
+    if duplicated_names:
+        raise ValueError("Noms de jobs en double dans {} : {}".format(jobs_path, ", ".join(duplicated_names)))
+    return jobs
+
+
+class JobQueue:
+    """
+    Persistent queue of the job runs (SQLite), which is also the status history of every job
+    """
+
+    def __init__(self, db_path: str, history_size: int = 100) -> None:
+        self.db_path = db_path
+        self.history_size = history_size  # Nombre d'exécutions terminées conservées par job
+        self.lock = threading.Lock()  # Mis à jour par les threads d'exécution des jobs
+
+    def connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.db_path)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, job_name TEXT NOT NULL, scheduled_at TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at TEXT NOT NULL, "
+            "started_at TEXT, finished_at TEXT, error TEXT, result TEXT)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS runs_by_status ON runs (status, next_attempt_at)")
+        return connection
+
+    def execute(self, query: str, parameters: tuple = ()) -> list:
+        with self.lock, closing(self.connect()) as connection, connection:
+            return connection.execute(query, parameters).fetchall()
+
+    def recover(self) -> None:
+        """
+        Put back in the queue the runs interrupted by a stop of the scheduler (without counting a new attempt)
+        """
+        self.execute(
+            "UPDATE runs SET status = ?, attempts = MAX(attempts - 1, 0), started_at = NULL WHERE status = ?",
+            (PENDING, RUNNING),
+        )
+
+    def release(self, run_id: int) -> None:
+        """
+        Put back in the queue a run interrupted by a stop of the scheduler (same as recover, for a single run)
+        """
+        self.execute(
+            "UPDATE runs SET status = ?, attempts = MAX(attempts - 1, 0), started_at = NULL "
+            "WHERE id = ? AND status = ?",
+            (PENDING, run_id, RUNNING),
+        )
+
+    def cancel_obsolete_runs(self, job_names: List[str]) -> List[str]:
+        """
+        Cancel the pending runs of the jobs that are not in 'job_names' anymore and return the names of these jobs
+        """
+        with self.lock, closing(self.connect()) as connection, connection:
+            where = "status = ? AND job_name NOT IN ({})".format(", ".join("?" * len(job_names)))
+            obsolete_job_names = [
+                row[0]
+                for row in connection.execute(
+                    "SELECT DISTINCT job_name FROM runs WHERE {}".format(where), (PENDING, *job_names)
+                )
+            ]
+            connection.execute(
+                "UPDATE runs SET status = ?, finished_at = ?, error = ? WHERE {}".format(where),
+                (CANCELLED, dt.datetime.now().isoformat(), "Job supprimé du fichier de jobs", PENDING, *job_names),
+            )
+        return obsolete_job_names
+
+    def has_active_run(self, job_name: str) -> bool:
+        return bool(
+            self.execute("SELECT 1 FROM runs WHERE job_name = ? AND status IN (?, ?)", (job_name, PENDING, RUNNING))
+        )
+
+    def last_scheduled_at(self, job_name: str) -> Optional[dt.datetime]:
+        row = self.execute("SELECT MAX(scheduled_at) FROM runs WHERE job_name = ?", (job_name,))[0]
+        return dt.datetime.fromisoformat(row[0]) if row[0] is not None else None
+
+    def enqueue(self, job_name: str, scheduled_at: dt.datetime) -> None:
+        self.execute(
+            "INSERT INTO runs (job_name, scheduled_at, status, next_attempt_at) VALUES (?, ?, ?, ?)",
+            (job_name, scheduled_at.isoformat(), PENDING, scheduled_at.isoformat()),
+        )
+
+    def take_due_runs(self, now: dt.datetime, limit: int, job_names: List[str]) -> List[tuple]:
+        """
+        Mark as running and return the (id, job name, attempt) of the due runs, oldest first, at most 'limit' runs
+        """
+        if limit <= 0 or not job_names:
+            return []
+        with self.lock, closing(self.connect()) as connection, connection:
+            rows = connection.execute(
+                "SELECT id, job_name, attempts FROM runs WHERE status = ? AND next_attempt_at <= ? "
+                "AND job_name IN ({}) ORDER BY next_attempt_at LIMIT ?".format(", ".join("?" * len(job_names))),
+                (PENDING, now.isoformat(), *job_names, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE runs SET status = ?, attempts = attempts + 1, started_at = ? WHERE id = ?",
+                [(RUNNING, now.isoformat(), run_id) for run_id, _, _ in rows],
+            )
+        return [(run_id, job_name, attempts + 1) for run_id, job_name, attempts in rows]
+
+    def finish(self, run_id: int, status: str, error: str = None, result: dict = None, retry_at=None) -> None:
+        """
+        Record the end of a run: succeeded, failed for good, or failed and put back in the queue until 'retry_at'
+        """
+        now = dt.datetime.now().isoformat()
+        with self.lock, closing(self.connect()) as connection, connection:
+            if retry_at is not None:
+                connection.execute(
+                    "UPDATE runs SET status = ?, next_attempt_at = ?, error = ? WHERE id = ?",
+                    (PENDING, retry_at.isoformat(), error, run_id),
+                )
+                return
+            connection.execute(
+                "UPDATE runs SET status = ?, finished_at = ?, error = ?, result = ? WHERE id = ?",
+                (status, now, error, json.dumps(result, ensure_ascii=False) if result else None, run_id),
+            )
+
+            # Seules les dernières exécutions terminées de chaque job sont conservées
+            connection.execute(
+                "DELETE FROM runs WHERE status IN (?, ?) AND id NOT IN ("
+                "SELECT id FROM runs WHERE job_name = (SELECT job_name FROM runs WHERE id = ?) AND status IN (?, ?) "
+                "ORDER BY id DESC LIMIT ?) AND job_name = (SELECT job_name FROM runs WHERE id = ?)",
+                (SUCCEEDED, FAILED, run_id, SUCCEEDED, FAILED, self.history_size, run_id),
+            )
+
+    def history(self, job_name: Optional[str] = None, limit: int = 10) -> List[dict]:
+        columns = ["id", "job_name", "scheduled_at", "status", "attempts", "next_attempt_at", "started_at"]
+        columns += ["finished_at", "error", "result"]
+        where = "WHERE job_name = ? " if job_name is not None else ""
+        rows = self.execute(
+            "SELECT {} FROM runs {}ORDER BY id DESC LIMIT ?".format(", ".join(columns), where),
+            (job_name, limit) if job_name is not None else (limit,),
+        )
+        history = [dict(zip(columns, row)) for row in rows]
+        for run in history:
+            run["result"] = json.loads(run["result"]) if run["result"] else None
+        return history
+
+
+class Scheduler:
+    """
+    Long-running process executing the jobs of the jobs file unattended, on a limited number of browser sessions
+
+    The jobs file is reloaded as soon as it changes. Each session (headless DedgeBot) runs one job at a time
+    """
+
+    def __init__(
+        self,
+        jobs_path: str,
+        job_queue: JobQueue,
+        config_store,
+        price_cache=None,
+        price_snapshots=None,
+        max_concurrent_jobs: int = 1,
+        poll_interval: float = 30,
+        retry_delay: float = 300,
+        max_retry_delay: float = 7200,
+        reporter_stream=None,
+        journal_dir: Optional[str] = None,
+    ) -> None:
+        self.jobs_path = jobs_path
+        self.job_queue = job_queue
+        self.config_store = config_store
+        self.price_cache = price_cache
+        self.price_snapshots = price_snapshots
+        self.max_concurrent_jobs = max(1, int(max_concurrent_jobs))
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay  # Délai avant la 1ère nouvelle tentative (en secondes), doublé à chaque échec
+        self.max_retry_delay = max_retry_delay
+        # Journaux des exécutions "edit" (un fichier par exécution) : une nouvelle tentative reprend là où la précédente s'est arrêtée
+        self.journal_dir = journal_dir
+        self.reporter = pricing.ConsoleReporter(stream=reporter_stream)  # Son stop_event arrête aussi les jobs en cours
+
+        self.jobs = {}
+        self.jobs_signature = None
+        self.free_bots = queue.Queue()
+        self.bots = []
+        self.nb_running_jobs = 0
+        self.running_lock = threading.Lock()
+
+    @property
+    def stop_event(self) -> threading.Event:
+        return self.reporter.stop_event
+
+    def log(self, message: str) -> None:
+        self.reporter.emit_signals(log_list_widget_message=message)
+
+    def reload_jobs(self) -> None:
+        try:
+            stat = os.stat(self.jobs_path)
+        except OSError:
+            stat = None
+        signature = (stat.st_size, stat.st_mtime_ns) if stat is not None else None
+        if signature == self.jobs_signature:
+            return
+
+        self.jobs_signature = signature
+        try:
+            jobs = load_jobs(self.jobs_path) if stat is not None else []
+        except (OSError, ValueError) as e:
+            # Un fichier de jobs invalide n'arrête pas le daemon : les jobs précédents sont conservés
+            self.log("Erreur : fichier de jobs ignoré : {}".format(e))
+            return
+        self.jobs = {job.name: job for job in jobs}
+        self.log("{} job(s) chargé(s) depuis {}".format(len(self.jobs), self.jobs_path))
+
+        # Les exécutions en attente des jobs supprimés du fichier ne seraient jamais lancées (voir take_due_runs)
+        for job_name in self.job_queue.cancel_obsolete_runs(list(self.jobs)):
+            self.log("{} : job supprimé du fichier de jobs, exécution en attente annulée".format(job_name))
+
+    def schedule_jobs(self, now: dt.datetime) -> None:
+        for job in self.jobs.values():
+            if not self.job_queue.has_active_run(job.name):
+                next_run = job.next_run_at(self.job_queue.last_scheduled_at(job.name), now)
+                self.job_queue.enqueue(job.name, next_run)
+                self.log("{} : prochaine exécution le {}".format(job.name, next_run.strftime("%d/%m/%Y à %H:%M")))
+
+    def retry_at(self, attempt: int) -> dt.datetime:
+        delay = min(self.retry_delay * 2 ** (attempt - 1), self.max_retry_delay)
+        return dt.datetime.now() + dt.timedelta(seconds=delay)
+
+    def journal_path(self, run_id: int, job: JobDefinition) -> Optional[str]:
+        if self.journal_dir is None or job.method != "edit":
+            return None
+        return os.path.join(self.journal_dir, "{}-{}.json".format(job.name, run_id))
+
+    def open_journal(self, run_id: int, job: JobDefinition, information: tuple) -> Optional[RunJournal]:
+        """
+        Get the journal of the run, resumed if a previous attempt of the same run did not complete
+        """
+        journal_path = self.journal_path(run_id, job)
+        if journal_path is None:
+            return None
+        journal = RunJournal(journal_path)
+        previous_attempt = journal.resumable_run()
+        key = RunJournal.key(information)
+        if previous_attempt is not None and any(hotel["key"] == key for hotel in previous_attempt["hotels"]):
+            journal.resume()
+            self.log("{} : reprise là où la tentative précédente s'est arrêtée".format(job.name))
+        else:
+            journal.start(job.method, [information])
+        return journal
+
+    def remove_journal(self, run_id: int, job: JobDefinition) -> None:
+        # Exécution terminée (succès ou échec définitif) : son journal ne servira plus
+        journal_path = self.journal_path(run_id, job)
+        if journal_path is not None and os.path.exists(journal_path):
+            os.remove(journal_path)
+
+    def run_job(self, run_id: int, job: JobDefinition, attempt: int) -> None:
+        bot = self.free_bots.get()
+        journal = None
+        try:
+            beg_date, end_date = job.period(dt.date.today())
+            self.log(
+                "{} : tentative {}/{} ({} -> {})".format(
+                    job.name, attempt, job.max_attempts, beg_date.strftime("%d/%m/%Y"), end_date.strftime("%d/%m/%Y")
+                )
+            )
+            self.config_store.load()
+            config = self.config_store.find(job.hotel, job.username)
+            information = (
+                config.username,
+                config.password,
+                config.hotel_name,
+                config.is_alone,
+                config.room_type,
+                config.price_type,
+                beg_date,
+                end_date,
+                config.path,
+            )
+            if not bot.driver_has_been_prepared:
+                bot.prepare_driver()
+
+            journal = self.open_journal(run_id, job, information)
+            results = []
+            pricing.price_account(
+                bot,
+                [information],
+                job.method,
+                self.reporter,
+                self.price_cache,
+                self.price_snapshots,
+                job.full_pass,
+                results,
+                journal,
+            )
+            self.job_queue.finish(run_id, SUCCEEDED, result=results[-1])
+            self.remove_journal(run_id, job)
+            self.log("{} : succès".format(job.name))
+
+        except KeyboardInterrupt:
+            # Arrêt du daemon : l'exécution est remise en attente sans compter de tentative, et sera reprise au prochain démarrage
+            if journal is not None:
+                journal.finish(run_journal.INTERRUPTED)
+            self.job_queue.release(run_id)
+            self.log("{} : interrompu".format(job.name))
+
+        except Exception as e:
+            if journal is not None:
+                journal.finish(run_journal.FAILED)
+            if attempt < job.max_attempts:
+                retry_at = self.retry_at(attempt)
+                self.job_queue.finish(run_id, PENDING, error=str(e), retry_at=retry_at)
+                self.log("{} : échec ({}), nouvelle tentative à {}".format(job.name, e, retry_at.strftime("%H:%M")))
+            else:
+                self.job_queue.finish(run_id, FAILED, error=str(e))
+                self.remove_journal(run_id, job)
+                self.log("Erreur : {} : échec définitif après {} tentative(s) : {}".format(job.name, attempt, e))
+
+        finally:
+            self.free_bots.put(bot)
+            with self.running_lock:
+                self.nb_running_jobs -= 1
+
+    def run(self, once: bool = False) -> None:
+        """
+        Execute the due jobs until stop_event is set ('once': only the jobs due at startup, then stop)
+        """
+        for _ in range(self.max_concurrent_jobs):
+            bot = DedgeBot()
+            bot.headless = True  # Exécution sans surveillance
+            self.bots.append(bot)
+            self.free_bots.put(bot)
+
+        self.job_queue.recover()
+        self.log("Démarrage du planificateur ({} job(s) en parallèle au maximum)".format(self.max_concurrent_jobs))
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrent_jobs) as executor:
+                try:
+                    while not self.stop_event.is_set():
+                        now = dt.datetime.now()
+                        self.reload_jobs()
+                        self.schedule_jobs(now)
+
+                        with self.running_lock:
+                            free_slots = self.max_concurrent_jobs - self.nb_running_jobs
+                            due_runs = self.job_queue.take_due_runs(now, free_slots, list(self.jobs))
+                            self.nb_running_jobs += len(due_runs)
+                        for run_id, job_name, attempt in due_runs:
+                            executor.submit(self.run_job, run_id, self.jobs[job_name], attempt)
+
+                        if once and not due_runs:
+                            with self.running_lock:
+                                if self.nb_running_jobs == 0:
+                                    break
+                        self.stop_event.wait(1 if once else self.poll_interval)
+                finally:
+                    # Arrêt demandé (ou erreur du planificateur) : les jobs en cours s'interrompent avant la fermeture du pool
+                    self.stop_event.set()
+        finally:
+            # Exécutions restées "running" (arrêt brutal d'un job) : remises en attente dès maintenant plutôt qu'au prochain démarrage
+            self.job_queue.recover()
+            for bot in self.bots:
+                bot.close()
+            self.log("Arrêt du planificateur")
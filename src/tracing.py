@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import threading
+import functools
+import datetime as dt
+from typing import Callable
+
+
+class NullSpan:
+    """
+    Span returned while tracing is disabled: entering and leaving it does nothing
+    """
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+    def set(self, **attributes) -> None:
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> "Span":
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.start_time, **self.attributes)
+        return False
+
+    def set(self, **attributes) -> None:
+        """
+        Add attributes known only once the span has started (e.g. number of prices written)
+        """
+        self.attributes.update(attributes)
+
+
+class Tracer:
+    """
+    Timing spans of a run, written to a trace file as JSON lines (one Chrome trace event per line)
+
+    - while the tracer is stopped, span() returns NULL_SPAN and record() returns at once (a single test per span)
+    - at the end of the run, a Chrome trace file (chrome://tracing, Perfetto) and a summary per span name are written
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.lock = threading.Lock()  # Spans enregistrés en parallèle par les sessions du pool de bots
+        self.trace_file = None
+        self.trace_path = None
+        self.events = []
+
+    def start(self, trace_dir: str, run_name: str = "run") -> str:
+        """
+        Start tracing a run and return the path of its trace file
+        """
+        os.makedirs(trace_dir, exist_ok=True)
+        with self.lock:
+            self.trace_path = os.path.join(
+                trace_dir, "{}_{}.jsonl".format(run_name, dt.datetime.now().strftime("%Y%m%d_%H%M%S"))
+            )
+            self.trace_file = open(self.trace_path, "w", encoding="utf-8")
+            self.events = []
+            self.run_start_time = time.perf_counter()
+            self.enabled = True
+        return self.trace_path
+
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attributes)
+
+    def record(self, name: str, start_time: float, **attributes) -> None:
+        """
+        Record a span that started at 'start_time' (time.perf_counter) and ends now
+        """
+        if not self.enabled:
+            return
+        end_time = time.perf_counter()
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": round((start_time - self.run_start_time) * 1e6),
+            "dur": round((end_time - start_time) * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.current_thread().name,
+            "args": attributes,
+        }
+        with self.lock:
+            if self.trace_file is None:
+                return
+            self.events.append(event)
+            self.trace_file.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+    def summary(self) -> list:
+        """
+        Get, per span name, the number of spans and their total, mean and max durations (in seconds)
+        """
+        durations = {}
+        for event in self.events:
+            durations.setdefault(event["name"], []).append(event["dur"] / 1e6)
+        rows = [
+            {
+                "name": name,
+                "count": len(span_durations),
+                "total_s": round(sum(span_durations), 3),
+                "mean_s": round(sum(span_durations) / len(span_durations), 3),
+                "max_s": round(max(span_durations), 3),
+            }
+            for name, span_durations in durations.items()
+        ]
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def stop(self) -> list:
+        """
+        Stop tracing, write the summary and the Chrome trace file, then return the summary
+        """
+        with self.lock:
+            if not self.enabled:
+                return []
+            self.enabled = False
+            summary = self.summary()
+            run_duration = time.perf_counter() - self.run_start_time
+            self.trace_file.write(
+                json.dumps({"name": "summary", "run_duration_s": round(run_duration, 3), "spans": summary}) + "\n"
+            )
+            self.trace_file.close()
+            self.trace_file = None
+
+            with open(os.path.splitext(self.trace_path)[0] + ".trace.json", "w", encoding="utf-8") as chrome_file:
+                json.dump({"traceEvents": self.events}, chrome_file, default=str)
+            self.events = []
+        return summary
+
+    @staticmethod
+    def summary_table(summary: list) -> list:
+        """
+        Format a summary as the lines of a text table
+        """
+        lines = ["{:<20} {:>6} {:>10} {:>10} {:>10}".format("Etape", "Nb", "Total (s)", "Moy. (s)", "Max (s)")]
+        for row in summary:
+            lines.append(
+                "{:<20} {:>6} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+                    row["name"], row["count"], row["total_s"], row["mean_s"], row["max_s"]
+                )
+            )
+        return lines
+
+
+# Tracer unique du programme (l'interface, la ligne de commande et le planificateur n'exécutent qu'un run tracé à la fois)
+TRACER = Tracer()
+
+
+def span(name: str, **attributes):
+    return TRACER.span(name, **attributes)
+
+
+def clock() -> float:
+    return time.perf_counter()
+
+
+def record(name: str, start_time: float, **attributes) -> None:
+    TRACER.record(name, start_time, **attributes)
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorator timing every call of a function in a span named 'name'
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            with Span(TRACER, name, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,5 +1,12 @@
+from __future__ import annotations
 import json
-import pandas as pd
+import datetime as dt
+from typing import TYPE_CHECKING
+from . import tracing
+
+# pandas et openpyxl ne sont importés qu'à leur première utilisation : ce module est importé dès le lancement (via constants)
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def fetch_json_data(path: str) -> dict:
@@ -11,7 +18,84 @@ def fetch_json_data(path: str) -> dict:
         return data_dict
 
 
-def fetch_prices(prices_path: str, hotel_name: str = None, worker=None) -> pd.DataFrame:
+@tracing.traced("excel parse")
+def read_price_sheet(prices_path: str, beg_date=None, end_date=None) -> pd.DataFrame:
+    """
+    Read the Date/Price columns of a price workbook, keeping only the rows of [beg_date, end_date] if provided
+
+    .xlsx/.xlsm workbooks are streamed row by row (openpyxl read-only mode), so that multi-year historical sheets are never
+    fully loaded in memory. As long as the dates met are sorted, the reading stops at the first date after end_date
+    """
+    import pandas as pd
+
+    if not prices_path.lower().endswith((".xlsx", ".xlsm")):
+        df_prices = pd.read_excel(prices_path)
+        df_prices.dropna(inplace=True)
+        df_prices["Date"] = df_prices["Date"].dt.date
+        df_prices = df_prices[["Date", "Price"]]
+        if beg_date is not None:
+            df_prices = df_prices.loc[df_prices["Date"] >= beg_date]
+        if end_date is not None:
+            df_prices = df_prices.loc[df_prices["Date"] <= end_date]
+        return df_prices
+
+    import openpyxl
+
+    dates, prices = [], []
+    workbook = openpyxl.load_workbook(prices_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+        if "Date" not in header or "Price" not in header:
+            raise ValueError("Le fichier de prix {} doit contenir les colonnes 'Date' et 'Price'".format(prices_path))
+        date_idx, price_idx = header.index("Date"), header.index("Price")
+
+        previous_date = None
+        is_sorted = True
+        for row_idx, row in enumerate(rows, start=2):
+            date = row[date_idx] if date_idx < len(row) else None
+            price = row[price_idx] if price_idx < len(row) else None
+            if date is None or price is None:
+                continue
+
+            if isinstance(date, dt.datetime):
+                date = date.date()
+            elif not isinstance(date, dt.date):
+                raise ValueError(
+                    "La cellule Date de la ligne {} du fichier de prix {} n'est pas une date : {}".format(
+                        row_idx, prices_path, date
+                    )
+                )
+
+            if previous_date is not None and date < previous_date:
+                is_sorted = False
+            previous_date = date
+
+            if end_date is not None and date > end_date:
+                if is_sorted:
+                    break
+                continue
+            if beg_date is not None and date < beg_date:
+                continue
+
+            dates.append(date)
+            prices.append(price)
+    finally:
+        workbook.close()
+
+    return pd.DataFrame({"Date": dates, "Price": pd.Series(prices, dtype=object)})
+
+
+@tracing.traced("fetch_prices")
+def fetch_prices(
+    prices_path: str, beg_date=None, end_date=None, hotel_name: str = None, worker=None, cache=None
+) -> pd.Series:
+    """
+    Get the price calendar of a hotel: Series of prices indexed by date (O(1) lookup per day)
+
+    NB: the calendar is restricted to [beg_date, end_date] if provided, and the parsed workbook is read from 'cache'
+    (see price_cache.PriceCache) when the file has not changed since the last run
+    """
     hotel_name = hotel_name if hotel_name else "NO-HOTEL-NAME"
     message = f"{hotel_name} : Récupération du positionnement tarifaire"
     if worker is not None:
@@ -20,12 +104,76 @@ def fetch_prices(prices_path: str, hotel_name: str = None, worker=None) -> pd.Da
         print(message)
 
     # Open and format the df containing prices
-    df_prices = pd.read_excel(prices_path)
-    df_prices.dropna(inplace=True)
-    df_prices["Date"] = df_prices["Date"].dt.date
-    df_prices = df_prices[["Date", "Price"]]
+    if cache is not None:
+        df_prices = cache.get(prices_path, read_price_sheet, beg_date, end_date)
+    else:
+        df_prices = read_price_sheet(prices_path, beg_date, end_date)
+
+    # Keep only the requested period (a cached calendar may cover a wider period)
+    if beg_date is not None:
+        df_prices = df_prices.loc[df_prices["Date"] >= beg_date]
+    if end_date is not None:
+        df_prices = df_prices.loc[df_prices["Date"] <= end_date]
+
+    # A date must have a single price
+    duplicated_dates = sorted(set(df_prices.loc[df_prices["Date"].duplicated(), "Date"]))
+    if duplicated_dates:
+        raise ValueError(
+            "{} : Les dates suivantes ont plusieurs prix. Veuillez vérifier votre fichier Excel : {}".format(
+                hotel_name, ", ".join(date.strftime("%d/%m/%Y") for date in duplicated_dates)
+            )
+        )
+
+    # Normalization of the whole calendar in one pass: the run either starts clean or fails at once with every invalid price
+    prices, invalid_prices = normalize_prices(df_prices.set_index("Date")["Price"])
+    if invalid_prices:
+        raise ValueError(
+            "{} : Les prix suivants ne sont pas des nombres entiers. Veuillez vérifier votre fichier Excel : {}".format(
+                hotel_name,
+                ", ".join("{} ({})".format(date.strftime("%d/%m/%Y"), raw_price) for date, raw_price in invalid_prices),
+            )
+        )
+
+    return prices
+
+
+def normalize_prices(raw_prices: pd.Series) -> tuple:
+    """
+    Vectorized conversion of a price calendar (int, float or str values) into integer price strings
+
+    - comma decimals are accepted ("120,0" -> "120")
+    - floats produced by Excel or pandas from integers are rounded back ("120.0" or "119.999999999" -> "120")
+    - zero and negative integers are kept as is (a zero price closes a rate on some extranets)
+    - any other value (real decimal, text, date, infinity...) is invalid
 
-    return df_prices
+    Return the normalized prices and the list of every invalid (date, raw price) couple
+    """
+    import pandas as pd
+
+    numeric_prices = pd.to_numeric(
+        raw_prices.astype(str).str.strip().str.replace(",", ".", regex=False), errors="coerce"
+    )
+    rounded_prices = numeric_prices.round()
+    is_valid = numeric_prices.notna() & ((numeric_prices - rounded_prices).abs() < 0.00001)
+
+    # Conversion vectorisée en int64, sauf pour les (rares) entiers hors de sa plage qui déborderaient silencieusement
+    valid_prices = rounded_prices[is_valid]
+    fits_int64 = valid_prices.abs() < 2**63
+    prices = valid_prices.astype(object)
+    prices[fits_int64] = valid_prices[fits_int64].astype("int64").astype(str)
+    prices[~fits_int64] = valid_prices[~fits_int64].map(lambda price: str(int(price)))
+    invalid_prices = list(raw_prices[~is_valid].items())
+
+    return prices, invalid_prices
+
+
+def find_missing_dates(prices: pd.Series, beg_date, end_date) -> list:
+    """
+    Get the sorted list of dates between beg_date and end_date that have no price in the price calendar
+    """
+    nb_days = (end_date - beg_date).days + 1
+    all_dates = {beg_date + dt.timedelta(days=i) for i in range(nb_days)}
+    return sorted(all_dates.difference(prices.index))
 
 
 # def try_to_open_file(path: str, mode: str):
@@ -1,25 +1,79 @@
+import threading
+import datetime as dt
 from PySide2.QtCore import QObject, Signal
 from constants import STANDARD_STYLE_DICT, ERROR_STYLE_DICT
-from . import utils
+from . import pricing
+from . import tracing
+from . import run_journal
+from .bot_pool import ABORT_GRACE_PERIOD
+
+
+# Intervalle de rafraîchissement de l'interface pendant le pricing (label, barre de progression et registre), soit 10 images/s
+UI_REFRESH_INTERVAL_MS = 100
 
 
 # Classe pour exécuter des fonctions dans un thread à part, et ainsi éviter le freezing de la GUI
+# Les mises à jour de l'interface ne sont pas émises une par une : elles sont mises en attente, puis appliquées par l'interface
+# à intervalle fixe (voir take_updates et Hpm.apply_worker_updates). Seuls le dernier label et la dernière progression comptent,
+# alors que tous les messages du registre sont conservés, dans l'ordre
 class Worker(QObject):
-    update_progressbar = Signal(int)
-    update_label = Signal(str, dict)
-    update_log_list_widget = Signal(str, dict)
     finished = Signal()
 
-    def __init__(self, ui):
+    def __init__(self, ui, resume=False):
         super().__init__()
         self.ui = ui
+        self.resume = resume  # Reprise du dernier pricing interrompu (voir run_journal.RunJournal) au lieu des lignes du paramétrage
+
+        # Etat partagé par toutes les sessions du pool de bots
+        self.progress_lock = threading.Lock()
+        self.stop_event = threading.Event()  # Levé par le pool dès qu'une session échoue, pour arrêter toutes les autres
+        self.cancel_event = threading.Event()  # Annulation demandée par l'utilisateur
+        self.done_event = threading.Event()  # Fin de run_pricing (succès ou erreur)
+
+        # Mises à jour de l'interface en attente (écrites par les sessions du pool, lues par le thread de l'interface)
+        self.updates_lock = threading.Lock()
+        self.pending_label = None  # (message, style_dict)
+        self.pending_progressbar_value = None
+        self.pending_log_messages = []  # [(message, style_dict), ...]
 
-    # Gestion de l'interruption du pricing par l'utilisateur
+    # Gestion de l'interruption du pricing par l'utilisateur (ou par l'échec d'une autre session du pool)
     def exit_if_interruption_requested(self):
-        if self.ui.thread.isInterruptionRequested():
+        if self.ui.thread.isInterruptionRequested() or self.stop_event.is_set():
             raise KeyboardInterrupt("Programme interrompu par l'utilisateur")
 
-    # Emission des signals
+    # Annulation du pricing (appelée depuis le thread de l'interface) : toutes les sessions sont réveillées aussitôt via stop_event.
+    # Si le pricing tourne encore après ABORT_GRACE_PERIOD, une session est bloquée dans une commande WebDriver : les navigateurs
+    # sont alors tués pour la débloquer (voir BotPool.abort)
+    def cancel(self):
+        self.cancel_event.set()
+        self.stop_event.set()
+        timer = threading.Timer(ABORT_GRACE_PERIOD, self.abort_blocked_sessions)
+        timer.daemon = True
+        timer.start()
+
+    def abort_blocked_sessions(self):
+        if not self.done_event.is_set():
+            self.ui.bot_pool.abort()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set() or self.ui.thread.isInterruptionRequested()
+
+    # Pages saisies mais dont l'enregistrement n'a pas été confirmé au moment de l'arrêt : leurs prix sont à vérifier sur D-Edge
+    def report_unsaved_windows(self):
+        for hotel_name, window_start, nb_prices in self.ui.bot_pool.unsaved_windows():
+            message = "{} : Page du {} : {} prix saisi(s) sans confirmation de l'enregistrement, à vérifier sur D-Edge".format(
+                hotel_name, window_start.strftime("%d/%m/%Y"), nb_prices
+            )
+            self.emit_signals(log_list_widget_message=message, style_dict=ERROR_STYLE_DICT)
+
+    # Avancement de nb_days jours dans la progression globale (appelé en parallèle par les sessions du pool)
+    def advance_progress(self, label_message=None, nb_days=1):
+        with self.progress_lock:
+            self.date_idx += nb_days
+            pct = int(self.date_idx / self.total_nb_days * 100)
+            self.emit_signals(label_message, progressbar_value=pct)
+
+    # Mise en attente des mises à jour de l'interface (seul le signal de fin est émis directement)
     def emit_signals(
         self,
         label_message=None,
@@ -28,21 +82,68 @@ class Worker(QObject):
         progressbar_value=None,
         finished=False,
     ):
-        if label_message is not None:
-            self.update_label.emit(label_message, style_dict)
-        if log_list_widget_message is not None:
-            self.update_log_list_widget.emit(log_list_widget_message, style_dict)
-        if progressbar_value is not None:
-            self.update_progressbar.emit(progressbar_value)
+        with self.updates_lock:
+            if label_message is not None:
+                self.pending_label = (label_message, style_dict)
+            if log_list_widget_message is not None:
+                self.pending_log_messages.append((log_list_widget_message, style_dict))
+            if progressbar_value is not None:
+                self.pending_progressbar_value = progressbar_value
         if finished:
             self.finished.emit()
 
+    # Récupération (et remise à zéro) des mises à jour en attente : (label, valeur de la barre de progression, messages du registre)
+    def take_updates(self):
+        with self.updates_lock:
+            updates = (self.pending_label, self.pending_progressbar_value, self.pending_log_messages)
+            self.pending_label, self.pending_progressbar_value, self.pending_log_messages = None, None, []
+        return updates
+
+    # Fin du traçage du pricing (s'il est activé) et affichage du résumé des durées par étape dans le registre
+    def report_trace(self):
+        if not tracing.TRACER.enabled:
+            return
+        trace_path = tracing.TRACER.trace_path
+        for line in tracing.Tracer.summary_table(tracing.TRACER.stop()):
+            self.emit_signals(log_list_widget_message=line)
+        self.emit_signals(log_list_widget_message=f"Trace du pricing : {trace_path}")
+
+    # Hôtels du dernier pricing interrompu, avec les identifiants et chemins actuels des ids (absents du journal)
+    def resumed_information_list(self):
+        information_list = []
+        for hotel in self.ui.run_journal.resume():
+            config = self.ui.config_store.get(hotel["username"], hotel["hotel_name"])
+            information_list.append(
+                (
+                    hotel["username"],
+                    config.password,
+                    hotel["hotel_name"],
+                    config.is_alone,
+                    hotel["room_type"],
+                    hotel["price_type"],
+                    dt.date.fromisoformat(hotel["beg_date"]),
+                    dt.date.fromisoformat(hotel["end_date"]),
+                    config.path,
+                )
+            )
+        return information_list
+
     def run_pricing(self):
+        journal = None
         try:
             # Initialisation des widgets
-            beg_message = "Lancement du pricing"
+            beg_message = "Reprise du pricing interrompu" if self.resume else "Lancement du pricing"
             self.emit_signals(beg_message, beg_message, progressbar_value=0)
 
+            if self.resume:
+                # Les hôtels et pages déjà confirmés lors de la tentative précédente sont ignorés (voir pricing.price_hotel)
+                journal = self.ui.run_journal
+                information_list = self.resumed_information_list()
+                self.date_idx = 0
+                self.total_nb_days = sum((information[7] - information[6]).days + 1 for information in information_list)
+                self.price(information_list, "edit", self.ui.full_pass_option.isChecked(), journal)
+                return
+
             # Cas où aucune ligne n'a été créée dans la section "Paramétrage" (aucun hôtel à pricer)
             hotels_to_price_nb = self.ui.param_widget_vlayout.count() - 1
             if not hotels_to_price_nb:
@@ -60,6 +161,9 @@ class Worker(QObject):
                 self.emit_signals(error_message, error_message, ERROR_STYLE_DICT, finished=True)
                 return
 
+            # Passage complet forcé : les pages dont les prix n'ont pas changé depuis le dernier envoi sont tout de même visitées
+            full_pass = self.ui.full_pass_option.isChecked()
+
             information_list = []
             # On calcule le nombre total de jours à pricer afin de calculer le pourcentage de progression
             self.date_idx = 0
@@ -68,29 +172,15 @@ class Worker(QObject):
                 hlayout = self.ui.param_widget_vlayout.itemAt(i)
                 # On stocke toutes les informations de l'hôtel
                 username = hlayout.itemAt(0).widget().currentText()
-                password = self.ui.df_ids.loc[self.ui.df_ids["username"] == username, "password"].iloc[0]
                 hotel_name = hlayout.itemAt(1).widget().currentText()
-                hotel_is_alone = (
-                    True
-                    if self.ui.df_ids.loc[
-                        (self.ui.df_ids["username"] == username) & (self.ui.df_ids["hotel_name"] == hotel_name),
-                        "is_alone",
-                    ].item()
-                    == "yes"
-                    else False
-                )
-                room_type = self.ui.df_ids.loc[
-                    (self.ui.df_ids["username"] == username) & (self.ui.df_ids["hotel_name"] == hotel_name), "room_type"
-                ].item()
-                price_type = self.ui.df_ids.loc[
-                    (self.ui.df_ids["username"] == username) & (self.ui.df_ids["hotel_name"] == hotel_name),
-                    "price_type",
-                ].item()
+                config = self.ui.config_store.get(username, hotel_name)
+                password = config.password
+                hotel_is_alone = config.is_alone
+                room_type = config.room_type
+                price_type = config.price_type
                 beg_date = hlayout.itemAt(2).widget().date().toPython()
                 end_date = hlayout.itemAt(3).widget().date().toPython()
-                prices_path = self.ui.df_ids.loc[
-                    (self.ui.df_ids["username"] == username) & (self.ui.df_ids["hotel_name"] == hotel_name), "path"
-                ].item()
+                prices_path = config.path
 
                 information_list.append(
                     (
@@ -107,71 +197,72 @@ class Worker(QObject):
                 )
                 self.total_nb_days += (end_date - beg_date).days + 1
 
-            # Préparation du driver
-            if not self.ui.bot.driver_has_been_prepared:
-                message = "Installation du driver"
-                self.emit_signals(message, message)
-                self.ui.bot.prepare_driver()
-
-            # Récupération de la liste des onglets/fenêtres du navigateur pour s'assurer que ce dernier est bien ouvert
-            try:
-                tabs = self.ui.bot.driver.window_handles
-
-                # Récupération de l'onglet ciblé par le driver pour s'assurer que cet onglet n'a pas été fermé par l'utilisateur
-                try:
-                    self.ui.bot.driver.current_window_handle
-
-                # Si l'onglet ciblé a été fermé, on ouvre un nouvel onglet et on le cible
-                except:
-                    # On ne peut ouvrir un nouvel onglet qu'à partir d'un onglet ouvert ciblé, donc on cible le premier onglet de la liste des onglets actuellement ouverts
-                    self.ui.bot.driver.switch_to.window(tabs[0])
-
-                    # Ne fonctionne qu'à partir de selenium 4.
-                    # Sous selenium < 4, il faudrait utiliser : self.ui.bot.driver.execute_script("window.open('');") puis new_tabs = self.ui.bot.driver.window_handles pour
-                    # switch vers le seul onglet dans new_tabs qui n'est pas dans tabs
-                    self.ui.bot.driver.switch_to.new_window("tab")
-
-            # Si le navigateur n'a jamais été ouvert (i.e. l'attribut driver n'existe pas) ou a été fermé par l'utilisateur, on ouvre
-            # une nouvelle fenêtre de navigateur (et donc on crée une nouvelle instance de driver)
-            # NB : si l'erreur est différente, on est plutôt confiant sur le fait qu'une nouvelle erreur interrompra le programme
-            except Exception:
-                message = "Ouverture du navigateur"
-                self.emit_signals(message, message)
-                self.ui.bot.create_driver()
-
-            # On aurait pu ne faire qu'une boucle mais en faire 2 permet de voir s'il y a un problème dans la récupération des inputs avant même de lancer le pricing
-            for (
-                username,
-                password,
-                hotel_name,
-                hotel_is_alone,
-                room_type,
-                price_type,
-                beg_date,
-                end_date,
-                prices_path,
-            ) in information_list:
-                self.exit_if_interruption_requested()
-                self.ui.bot.go_to_home_page()
-                self.ui.bot.login(username, password, create_cookie=True, worker=self)
-                df_prices = utils.fetch_prices(prices_path, beg_date, end_date, hotel_name, worker=self)
-                self.ui.bot.check_prices(
-                    hotel_is_alone,
-                    room_type,
-                    price_type,
-                    beg_date,
-                    end_date,
-                    df_prices,
-                    method,
-                    hotel_name,
-                    worker=self,
-                )
+            # Journal du run (méthode "edit") : en cas d'échec, le pricing pourra être repris là où il s'est arrêté
+            if method == "edit":
+                journal = self.ui.run_journal
+                journal.start(method, information_list)
 
-            success_message = "Pricing terminé"
-            self.emit_signals(success_message, success_message, finished=True)
+            self.price(information_list, method, full_pass, journal)
 
         except (KeyboardInterrupt, Exception) as e:
-            label_error_message = "Erreur : Voir registre"
-            log_list_widget_error_message = "Erreur : " + str(e)
+            self.done_event.set()
+            self.report_trace()
+            # Après une annulation, l'erreur levée peut venir d'un navigateur tué pendant une commande (voir cancel)
+            cancelled = self.is_cancelled()
+            if journal is not None:
+                interrupted = cancelled or isinstance(e, KeyboardInterrupt)
+                journal.finish(run_journal.INTERRUPTED if interrupted else run_journal.FAILED)
+            self.report_unsaved_windows()
+            if cancelled:
+                label_error_message = "Pricing annulé"
+                log_list_widget_error_message = "Pricing annulé par l'utilisateur"
+            else:
+                label_error_message = "Erreur : Voir registre"
+                log_list_widget_error_message = "Erreur : " + str(e)
+            if journal is not None:
+                log_list_widget_error_message += " (bouton 'Reprendre' pour continuer là où le pricing s'est arrêté)"
             self.emit_signals(label_error_message, log_list_widget_error_message, ERROR_STYLE_DICT, -1, True)
             return
+
+    # Pricing (une seule connexion par compte, comptes répartis sur les sessions du pool de bots)
+    def price(self, information_list, method, full_pass, journal=None):
+        self.ui.bot_pool.resize(self.ui.pool_size)
+        if self.ui.tracing_enabled:
+            tracing.TRACER.start(self.ui.trace_dir, "pricing")
+        pricing.run(
+            self.ui.bot_pool,
+            information_list,
+            method,
+            self,
+            price_cache=self.ui.price_cache,
+            price_snapshots=self.ui.price_snapshots,
+            full_pass=full_pass,
+            journal=journal,
+        )
+        self.done_event.set()
+        if journal is not None:
+            journal.finish(run_journal.COMPLETED)
+
+        self.report_trace()
+        success_message = "Pricing terminé"
+        self.emit_signals(success_message, success_message, finished=True)
+
+
+# Chargement des ids en arrière-plan : la fenêtre s'affiche sans attendre la lecture des ids (et l'import de pandas si le fichier a changé)
+class IdsLoader(QObject):
+    loaded = Signal()
+    failed = Signal(str)
+    finished = Signal()
+
+    def __init__(self, config_store):
+        super().__init__()
+        self.config_store = config_store
+
+    def run(self):
+        try:
+            self.config_store.load()
+            self.loaded.emit()
+        except Exception as e:
+            self.failed.emit(f"Erreur lors du chargement des ids ({self.config_store.ids_path}) : {e}")
+        finally:
+            self.finished.emit()
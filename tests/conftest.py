@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules du logiciel sont importés depuis la racine du projet (src, constants), comme par main.py et cli.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
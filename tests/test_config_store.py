@@ -0,0 +1,58 @@
+import os
+import pandas as pd
+from src.config_store import ConfigStore, HotelConfig
+
+
+def config(hotel_name, username="user", path="prices.xlsx"):
+    return HotelConfig("ABR", username, "password", hotel_name, True, "Double", "Standard", path)
+
+
+def write_ids(path, configs):
+    pd.DataFrame([c.to_row() for c in configs], columns=HotelConfig.columns()).to_excel(path, index=False)
+
+
+def hotel_names(configs):
+    return [c.hotel_name for c in configs]
+
+
+def test_ids_file_is_imported_then_read_from_the_database(tmp_path, monkeypatch):
+    ids_path = str(tmp_path / "ids.xlsx")
+    write_ids(ids_path, [config("Hôtel A"), config("Hôtel B")])
+    db_path = str(tmp_path / "ids.sqlite3")
+    assert hotel_names(ConfigStore(db_path, ids_path).load()) == ["Hôtel A", "Hôtel B"]
+
+    # Fichier inchangé : aucune relecture du fichier Excel
+    store = ConfigStore(db_path, ids_path)
+    monkeypatch.setattr(store, "read_ids_file", lambda: [])
+    assert hotel_names(store.load()) == ["Hôtel A", "Hôtel B"]
+
+
+def test_ids_files_with_the_same_size_and_date_are_not_confused(tmp_path):
+    first_path, second_path = str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx")
+    write_ids(first_path, [config("Hôtel A")])
+    write_ids(second_path, [config("Hôtel B")])
+    first_stat = os.stat(first_path)
+    os.utime(second_path, ns=(first_stat.st_atime_ns, first_stat.st_mtime_ns))
+    db_path = str(tmp_path / "ids.sqlite3")
+
+    assert hotel_names(ConfigStore(db_path, first_path).load()) == ["Hôtel A"]
+    assert hotel_names(ConfigStore(db_path, second_path).load()) == ["Hôtel B"]
+    assert hotel_names(ConfigStore(db_path, first_path).load()) == ["Hôtel A"]
+
+
+def test_save_writes_the_differences_and_exports_the_ids_file(tmp_path):
+    ids_path = str(tmp_path / "ids.xlsx")
+    write_ids(ids_path, [config("Hôtel A"), config("Hôtel B"), config("Hôtel C")])
+    db_path = str(tmp_path / "ids.sqlite3")
+    store = ConfigStore(db_path, ids_path)
+    store.load()
+
+    assert not store.save(list(store.configs))
+    new_configs = [config("Hôtel C"), config("Hôtel A", path="other.xlsx"), config("Hôtel D")]
+    assert store.save(new_configs)
+    assert store.get("user", "Hôtel A").path == "other.xlsx"
+
+    # Base et fichier exporté identiques, sans réimportation au chargement suivant
+    reloaded_store = ConfigStore(db_path, ids_path)
+    assert reloaded_store.load() == new_configs
+    assert ConfigStore(str(tmp_path / "other.sqlite3"), ids_path).load() == new_configs
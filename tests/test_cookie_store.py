@@ -0,0 +1,30 @@
+import time
+from src.cookie_store import CookieStore
+
+
+def test_expired_cookies_are_filtered_on_load(tmp_path):
+    store = CookieStore(str(tmp_path))
+    now = time.time()
+    store.save(
+        "User",
+        [
+            {"name": "session", "value": "1", "domain": ".availpro.com"},
+            {"name": "valid", "value": "2", "expires": now + 3600, "size": 10},
+            {"name": "expired", "value": "3", "expires": now - 3600},
+        ],
+    )
+
+    jar = store.load(" user ")
+    assert [cookie["name"] for cookie in jar["cookies"]] == ["session", "valid"]
+    assert "size" not in jar["cookies"][1]
+    assert jar["expires_at"] == now + 3600
+    assert CookieStore.is_valid(jar)
+
+
+def test_missing_or_fully_expired_jar(tmp_path):
+    store = CookieStore(str(tmp_path))
+    assert store.load("user") is None
+    assert not CookieStore.is_valid(store.load("user"))
+
+    store.save("user", [{"name": "expired", "value": "1", "expires": time.time() - 1}])
+    assert not CookieStore.is_valid(store.load("user"))
@@ -0,0 +1,56 @@
+import os
+import datetime as dt
+from src.price_cache import PriceCache
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, path, beg_date, end_date):
+        self.calls.append((beg_date, end_date))
+        with open(path, encoding="utf-8") as workbook:
+            return workbook.read()
+
+
+def test_entry_is_reused_until_the_workbook_changes(tmp_path):
+    path = tmp_path / "prices.xlsx"
+    path.write_text("v1", encoding="utf-8")
+    cache, load = PriceCache(str(tmp_path / "cache")), CountingLoader()
+
+    assert cache.get(str(path), load) == "v1"
+    assert cache.get(str(path), load) == "v1"
+    assert len(load.calls) == 1
+
+    # Même taille, date de modification différente
+    path.write_text("v2", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.get(str(path), load) == "v2"
+    assert len(load.calls) == 2
+
+
+def test_entry_is_rebuilt_for_a_period_it_does_not_cover(tmp_path):
+    path = tmp_path / "prices.xlsx"
+    path.write_text("v1", encoding="utf-8")
+    cache, load = PriceCache(str(tmp_path / "cache")), CountingLoader()
+
+    cache.get(str(path), load, dt.date(2024, 1, 1), dt.date(2024, 3, 31))
+    cache.get(str(path), load, dt.date(2024, 2, 1), dt.date(2024, 2, 28))
+    assert len(load.calls) == 1
+
+    cache.get(str(path), load, dt.date(2024, 2, 1), dt.date(2024, 4, 30))
+    cache.get(str(path), load)
+    assert load.calls[1:] == [(dt.date(2024, 2, 1), dt.date(2024, 4, 30)), (None, None)]
+
+
+def test_workbooks_have_separate_entries(tmp_path):
+    first_path, second_path = tmp_path / "a.xlsx", tmp_path / "b.xlsx"
+    first_path.write_text("a", encoding="utf-8")
+    second_path.write_text("b", encoding="utf-8")
+    cache, load = PriceCache(str(tmp_path / "cache")), CountingLoader()
+
+    assert cache.get(str(first_path), load) == "a"
+    assert cache.get(str(second_path), load) == "b"
+    assert cache.get(str(first_path), load) == "a"
+    assert len(load.calls) == 2
@@ -0,0 +1,60 @@
+import datetime as dt
+import pandas as pd
+import pytest
+from src import utils
+
+
+def normalize(values):
+    return utils.normalize_prices(pd.Series(values, index=range(len(values)), dtype=object))
+
+
+def test_integer_prices_are_normalized():
+    prices, invalid_prices = normalize([120, 120.0, "120", " 120 ", "120,0", 119.999999999])
+    assert list(prices) == ["120"] * 6
+    assert invalid_prices == []
+
+
+def test_zero_negative_and_huge_integers_are_kept():
+    prices, invalid_prices = normalize([0, -5, 1e20, 10**20])
+    assert list(prices) == ["0", "-5", "100000000000000000000", "100000000000000000000"]
+    assert invalid_prices == []
+
+
+def test_invalid_prices_are_all_reported():
+    prices, invalid_prices = normalize([100, "abc", 120.5, "119.99999", float("nan"), float("inf"), None, 110])
+    assert prices.to_dict() == {0: "100", 7: "110"}
+    assert [idx for idx, _ in invalid_prices] == [1, 2, 3, 4, 5, 6]
+
+
+def test_find_missing_dates():
+    beg_date = dt.date(2024, 1, 1)
+    prices = pd.Series(["100", "100"], index=[beg_date, dt.date(2024, 1, 3)])
+    assert utils.find_missing_dates(prices, beg_date, dt.date(2024, 1, 4)) == [dt.date(2024, 1, 2), dt.date(2024, 1, 4)]
+    assert utils.find_missing_dates(prices, beg_date, beg_date) == []
+
+
+def write_workbook(path, rows):
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Date", "Price"])
+    for date, price in rows:
+        sheet.append([dt.datetime.combine(date, dt.time()), price])
+    workbook.save(path)
+
+
+def test_fetch_prices_reports_every_invalid_price(tmp_path):
+    path = str(tmp_path / "prices.xlsx")
+    write_workbook(path, [(dt.date(2024, 1, 1), 100), (dt.date(2024, 1, 2), "cent"), (dt.date(2024, 1, 3), 99.5)])
+    with pytest.raises(ValueError) as error:
+        utils.fetch_prices(path, hotel_name="Hôtel")
+    assert "02/01/2024 (cent)" in str(error.value)
+    assert "03/01/2024 (99.5)" in str(error.value)
+
+
+def test_fetch_prices_restricts_the_period(tmp_path):
+    path = str(tmp_path / "prices.xlsx")
+    write_workbook(path, [(dt.date(2024, 1, day), 100 + day) for day in range(1, 11)])
+    prices = utils.fetch_prices(path, dt.date(2024, 1, 3), dt.date(2024, 1, 5))
+    assert prices.to_dict() == {dt.date(2024, 1, 3): "103", dt.date(2024, 1, 4): "104", dt.date(2024, 1, 5): "105"}
@@ -0,0 +1,63 @@
+import json
+import datetime as dt
+import pytest
+from src import run_journal
+from src.run_journal import RunJournal
+
+BEG_DATE, END_DATE = dt.date(2024, 1, 1), dt.date(2024, 1, 28)
+FIRST_HOTEL = ("user", "password", "Hôtel A", True, "Double", "Standard", BEG_DATE, END_DATE, "a.xlsx")
+SECOND_HOTEL = ("user", "password", "Hôtel B", False, "Double", "Standard", BEG_DATE, END_DATE, "b.xlsx")
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "run_journal.json")
+
+
+def test_progress_survives_a_restart(journal_path):
+    journal = RunJournal(journal_path)
+    journal.start("edit", [FIRST_HOTEL, SECOND_HOTEL])
+    journal.record_window(RunJournal.key(FIRST_HOTEL), [dt.date(2024, 1, 1), dt.date(2024, 1, 2)])
+    journal.record_window(RunJournal.key(FIRST_HOTEL), [dt.date(2024, 1, 2), dt.date(2024, 1, 3)])
+    journal.finish_hotel(RunJournal.key(SECOND_HOTEL))
+    journal.finish(run_journal.INTERRUPTED)
+
+    reloaded_journal = RunJournal(journal_path)
+    assert reloaded_journal.resumable_run()["status"] == run_journal.INTERRUPTED
+    assert [hotel["hotel_name"] for hotel in reloaded_journal.resume()] == ["Hôtel A", "Hôtel B"]
+    assert reloaded_journal.resumable_run()["status"] == run_journal.RUNNING
+    assert reloaded_journal.synced_dates(RunJournal.key(FIRST_HOTEL)) == {dt.date(2024, 1, day) for day in (1, 2, 3)}
+    assert not reloaded_journal.is_hotel_done(RunJournal.key(FIRST_HOTEL))
+    assert reloaded_journal.is_hotel_done(RunJournal.key(SECOND_HOTEL))
+
+
+def test_passwords_are_not_written(journal_path):
+    RunJournal(journal_path).start("edit", [FIRST_HOTEL])
+    with open(journal_path, encoding="utf-8") as journal_file:
+        assert "password" not in json.dumps(json.load(journal_file))
+
+
+def test_completed_run_cannot_be_resumed(journal_path):
+    journal = RunJournal(journal_path)
+    assert journal.resumable_run() is None
+    journal.start("edit", [FIRST_HOTEL])
+    journal.finish(run_journal.COMPLETED)
+    assert RunJournal(journal_path).resumable_run() is None
+    with pytest.raises(Exception):
+        RunJournal(journal_path).resume()
+
+
+def test_unknown_hotels_are_ignored(journal_path):
+    journal = RunJournal(journal_path)
+    journal.start("edit", [FIRST_HOTEL])
+    other_key = RunJournal.key(SECOND_HOTEL)
+    journal.record_window(other_key, [dt.date(2024, 1, 1)])
+    journal.finish_hotel(other_key)
+    assert journal.synced_dates(other_key) == set()
+    assert not journal.is_hotel_done(other_key)
+
+
+def test_corrupted_journal_is_treated_as_missing(journal_path):
+    with open(journal_path, "w", encoding="utf-8") as journal_file:
+        journal_file.write("{")
+    assert RunJournal(journal_path).resumable_run() is None
@@ -0,0 +1,141 @@
+import io
+import datetime as dt
+import pytest
+from src import scheduler
+from src.scheduler import JobDefinition, JobQueue
+
+
+def job(**fields):
+    return JobDefinition.from_dict({"name": "job", "hotel": "Hôtel", "horizon_days": 30, "at": "02:30", **fields})
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"method": "check"},
+        {"at": None},
+        {"every_minutes": 60},
+        {"at": "2h30"},
+        {"horizon_days": 0},
+        {"horizon_days": "3"},
+        {"at": 930},
+        {"max_attempts": True},
+        {"unknown": 1},
+    ],
+)
+def test_invalid_jobs_are_rejected_with_value_error(fields):
+    with pytest.raises(ValueError):
+        job(**fields)
+
+
+def test_daily_job_next_run():
+    daily_job = job()
+    now = dt.datetime(2024, 1, 10, 12, 0)
+    assert daily_job.next_run_at(None, now) == dt.datetime(2024, 1, 11, 2, 30)
+    assert daily_job.next_run_at(None, dt.datetime(2024, 1, 10, 1, 0)) == dt.datetime(2024, 1, 10, 2, 30)
+    # Exécutions manquées pendant l'arrêt du planificateur : une seule exécution de rattrapage
+    assert daily_job.next_run_at(dt.datetime(2024, 1, 5, 2, 30), now) == dt.datetime(2024, 1, 10, 2, 30)
+
+
+def test_periodic_job_next_run_and_period():
+    periodic_job = job(at=None, every_minutes=60, offset_days=1, horizon_days=7)
+    now = dt.datetime(2024, 1, 10, 12, 0)
+    assert periodic_job.next_run_at(None, now) == now
+    assert periodic_job.next_run_at(dt.datetime(2024, 1, 10, 11, 30), now) == dt.datetime(2024, 1, 10, 12, 30)
+    assert periodic_job.period(dt.date(2024, 1, 10)) == (dt.date(2024, 1, 11), dt.date(2024, 1, 17))
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), history_size=2)
+
+
+def statuses(job_queue, job_name=None):
+    return [(run["job_name"], run["status"], run["attempts"]) for run in job_queue.history(job_name)]
+
+
+def test_due_runs_are_taken_once(job_queue):
+    now = dt.datetime(2024, 1, 10, 12, 0)
+    job_queue.enqueue("a", now)
+    job_queue.enqueue("b", now + dt.timedelta(hours=1))
+    job_queue.enqueue("c", now)
+
+    assert [job_name for _, job_name, _ in job_queue.take_due_runs(now, 5, ["a", "b"])] == ["a"]
+    assert job_queue.take_due_runs(now, 5, ["a", "b"]) == []
+    assert job_queue.has_active_run("a") and job_queue.has_active_run("b")
+
+
+def test_failed_run_is_retried_then_fails_for_good(job_queue):
+    now = dt.datetime(2024, 1, 10, 12, 0)
+    job_queue.enqueue("a", now)
+    (run_id, _, attempt), = job_queue.take_due_runs(now, 1, ["a"])
+    assert attempt == 1
+
+    retry_at = now + dt.timedelta(minutes=5)
+    job_queue.finish(run_id, scheduler.PENDING, error="erreur", retry_at=retry_at)
+    assert job_queue.take_due_runs(now, 1, ["a"]) == []
+    (_, _, attempt), = job_queue.take_due_runs(retry_at, 1, ["a"])
+    assert attempt == 2
+
+    job_queue.finish(run_id, scheduler.FAILED, error="erreur")
+    assert statuses(job_queue) == [("a", scheduler.FAILED, 2)]
+    assert not job_queue.has_active_run("a")
+
+
+def test_interrupted_runs_are_put_back_without_counting_an_attempt(job_queue):
+    now = dt.datetime(2024, 1, 10, 12, 0)
+    job_queue.enqueue("a", now)
+    job_queue.enqueue("b", now)
+    (first_id, _, _), (second_id, _, _) = job_queue.take_due_runs(now, 2, ["a", "b"])
+
+    job_queue.release(first_id)
+    assert statuses(job_queue, "a") == [("a", scheduler.PENDING, 0)]
+    job_queue.recover()
+    assert statuses(job_queue, "b") == [("b", scheduler.PENDING, 0)]
+    assert len(job_queue.take_due_runs(now, 2, ["a", "b"])) == 2
+
+
+def test_pending_runs_of_removed_jobs_are_cancelled(job_queue):
+    now = dt.datetime(2024, 1, 10, 12, 0)
+    job_queue.enqueue("a", now)
+    job_queue.enqueue("b", now)
+
+    assert job_queue.cancel_obsolete_runs(["a"]) == ["b"]
+    assert statuses(job_queue, "b") == [("b", scheduler.CANCELLED, 0)]
+    assert not job_queue.has_active_run("b")
+    assert job_queue.cancel_obsolete_runs([]) == ["a"]
+
+
+def test_history_keeps_the_latest_finished_runs(job_queue):
+    now = dt.datetime(2024, 1, 10, 12, 0)
+    for hour in range(4):
+        job_queue.enqueue("a", now + dt.timedelta(hours=hour))
+        (run_id, _, _), = job_queue.take_due_runs(now + dt.timedelta(hours=hour), 1, ["a"])
+        job_queue.finish(run_id, scheduler.SUCCEEDED, result={"hour": hour})
+    assert [run["result"] for run in job_queue.history("a")] == [{"hour": 3}, {"hour": 2}]
+
+
+def test_retry_resumes_the_journal_of_the_failed_attempt(tmp_path, job_queue):
+    edit_job = job(method="edit")
+    job_scheduler = scheduler.Scheduler(
+        str(tmp_path / "jobs.json"),
+        job_queue,
+        None,
+        reporter_stream=io.StringIO(),
+        journal_dir=str(tmp_path / "journals"),
+    )
+    beg_date, end_date = dt.date(2024, 1, 1), dt.date(2024, 1, 28)
+    information = ("user", "password", "Hôtel", True, "Double", "Standard", beg_date, end_date, "prices.xlsx")
+    key = scheduler.RunJournal.key(information)
+
+    journal = job_scheduler.open_journal(1, edit_job, information)
+    journal.record_window(key, [dt.date(2024, 1, 1)])
+    journal.finish(scheduler.run_journal.FAILED)
+
+    assert job_scheduler.open_journal(1, edit_job, information).synced_dates(key) == {dt.date(2024, 1, 1)}
+    # Autre exécution du job : nouveau journal
+    assert job_scheduler.open_journal(2, edit_job, information).synced_dates(key) == set()
+    assert job_scheduler.open_journal(3, job(method="no-edit"), information) is None
+
+    job_scheduler.remove_journal(1, edit_job)
+    assert not (tmp_path / "journals" / "job-1.json").exists()